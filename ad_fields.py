@@ -0,0 +1,218 @@
+"""
+Shared field parsing for Ad Library cards.
+
+Every extraction backend (live WebDriver, in-browser script, saved snapshots)
+collects the same raw strings from an ad card - the "Started running on" line,
+icon style attributes, the link href and so on. The helpers below turn those
+raw strings into the `ads_data` record shape the API expects, so all backends
+produce identical records.
+
+The regexes are compiled once at import time, and the date and icon-style
+lookups are memoized: a page has thousands of cards but only a handful of
+distinct icon styles and start dates. benchmarks/bench_ad_fields.py times them.
+"""
+import logging
+import re
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import unquote, urlparse
+
+logger = logging.getLogger(__name__)
+
+# Platform identification mapping (unchanged)
+PLATFORM_MAPPING = {
+    ("https://static.xx.fbcdn.net/rsrc.php/v4/yW/r/TP7nCDju1B-.png", "0px -1171px"): "Facebook",
+    ("https://static.xx.fbcdn.net/rsrc.php/v4/yj/r/0dseWS3_nMM.png", "-34px -353px"): "Instagram",
+    ("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png", "-16px -528px"): "Audience Network",
+    ("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png", "-29px -528px"): "Messenger",
+    ("https://static.xx.fbcdn.net/rsrc.php/v4/yW/r/TP7nCDju1B-.png", "0px -1184px"): "Thread"
+}
+CATEGORY_MAPPING = {
+    ("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png", "-65px -557px"): "Employment",
+    ("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png", "0px -544px"): "Housing",
+    ("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png", "-13px -557px"): "Financial products and services",
+}
+
+# ============== SELECTORS =====================
+# Class strings and XPaths for the ad cards. They are shared by every backend
+# so a markup change only has to be fixed in one place.
+AD_GROUP_CLASS = "xrvj5dj x18m771g x1p5oq8j xp48ta0 x18d9i69 xtssl2i xtqikln x1na6gtj x1jr1mh3 x15h0gye x7sq92a xlxr9qa"
+AD_CARD_XPATH = './div[contains(@class, "xh8yej3")]'
+MAIN_CONTAINER_XPATH = './/div[contains(@class, "x78zum5 xdt5ytf x2lwn1j xeuugli")]'
+LIBRARY_ID_XPATH = './/div[contains(@class, "x1rg5ohu x67bb7w")]/span[contains(text(), "Library ID:")]'
+STARTED_RUNNING_XPATH = './/span[contains(text(), "Started running on")]'
+PLATFORMS_XPATH = './/span[contains(text(), "Platforms")]/following-sibling::div[1]'
+PLATFORM_ICON_XPATH = './/div[contains(@class, "xtwfq29")]'
+CATEGORIES_XPATH = './/span[contains(text(), "Categories")]'
+CATEGORY_DIV_XPATH = './following-sibling::div[contains(@class, "x1rg5ohu") and contains(@class, "x67bb7w")]'
+ADS_COUNT_XPATH = './/div[contains(@class, "x6s0dn4 x78zum5 xsag5q8")]//strong'
+AD_TEXT_XPATH = './/div[@data-ad-preview="message" or contains(@style, "white-space: pre-wrap")]'
+LINK_CONTAINER_XPATH = './/a[contains(@class, "x1hl2dhg") and contains(@class, "x1lku1pv")]'
+VIDEO_XPATH = './/video'
+IMAGE_XPATH = './/img[contains(@class, "x168nmei") or contains(@class, "_8nqq")]'
+ANY_IMAGE_XPATH = './/img'
+CTA_CONTAINER_XPATH = ('.//div[contains(@class, "x6s0dn4 x2izyaf x78zum5 x1qughib '
+                       'x15mokao x1ga7v0g xde0f50 x15x8krk xexx8yu xf159sx xwib8y2 xmzvs34")]')
+HEADLINE_CONTAINER_XPATH = './/div[contains(@class, "x1iyjqo2 x2fvf9 x6ikm8r x10wlt62 xt0b8zv")]'
+CTA_DIV_XPATH = './/div[contains(@class, "x2lah0s")]'
+CTA_TEXT_XPATH = ('.//div[contains(@class, "x8t9es0 x1fvot60 xxio538 x1heor9g '
+                  'xuxw1ft x6ikm8r x10wlt62 xlyipyv x1h4wwuj x1pd3egz xeuugli")]')
+HEADLINE_XPATH = './/div[contains(@class, "x6ikm8r x10wlt62 xlyipyv x1mcwxda")]'
+
+
+# ============== FIELD PARSERS =====================
+STARTED_RUNNING_RE = re.compile(r'Started running on (.*?)(?:·|$)')
+ACTIVE_TIME_RE = re.compile(r'Total active time\s+(.+?)(?:$|\s*·)')
+MASK_IMAGE_RE = re.compile(r'mask-image: url\("([^"]+)"\)')
+MASK_POSITION_RE = re.compile(r'mask-position: ([^;]+)')
+NUMBER_RE = re.compile(r'(\d+)')
+
+# "Mar 5, 2024" first, then "5 Mar 2024"
+STARTED_RUNNING_FORMATS = ("%b %d, %Y", "%d %b %Y")
+
+
+@lru_cache(maxsize=4096)
+def parse_started_date(started_running_text):
+    """Converts the date of the "Started running on" line to YYYY-MM-DD. Raises ValueError if unknown."""
+    try:
+        return datetime.strptime(started_running_text, STARTED_RUNNING_FORMATS[0]).strftime("%Y-%m-%d")
+    except ValueError:
+        return datetime.strptime(started_running_text, STARTED_RUNNING_FORMATS[1]).strftime("%Y-%m-%d")
+
+
+def parse_started_running(full_text):
+    """
+    Parses the "Started running on ... · Total active time ..." line.
+    Returns a (started_running, total_active_time) tuple; either may be None.
+    """
+    started_running = None
+    started_running_match = STARTED_RUNNING_RE.search(full_text)
+    if started_running_match:
+        started_running = parse_started_date(started_running_match.group(1).strip())
+
+    total_active_time = None
+    active_time_match = ACTIVE_TIME_RE.search(full_text)
+    if active_time_match:
+        total_active_time = active_time_match.group(1).strip()
+
+    return started_running, total_active_time
+
+
+@lru_cache(maxsize=256)
+def parse_icon_style(style):
+    """Returns the (mask_image, mask_position) pair of a platform/category icon style."""
+    mask_image_match = MASK_IMAGE_RE.search(style)
+    mask_pos_match = MASK_POSITION_RE.search(style)
+    mask_image = mask_image_match.group(1) if mask_image_match else None
+    mask_position = mask_pos_match.group(1).strip() if mask_pos_match else None
+    return mask_image, mask_position
+
+
+@lru_cache(maxsize=256)
+def resolve_platform(style):
+    """Platform name of an icon style, None if the icon is unknown."""
+    return PLATFORM_MAPPING.get(parse_icon_style(style))
+
+
+@lru_cache(maxsize=256)
+def resolve_category(style):
+    """Category name of an icon style, "Unknown" if the icon is unknown."""
+    return CATEGORY_MAPPING.get(parse_icon_style(style), "Unknown")
+
+
+def parse_ads_count(text):
+    """Extracts the number from the 'N ads use this creative and text.' label."""
+    number_match = NUMBER_RE.search(text.strip())
+    return number_match.group(1) if number_match else None
+
+
+def unwrap_destination_url(link_url):
+    """Unwraps the l.facebook.com redirect and returns the real landing page URL."""
+    decoded_url = unquote(link_url)
+
+    # Parse the URL to get the 'u' parameter value
+    query_params = urlparse(decoded_url).query
+    if 'u=' in query_params:
+        # Get the full URL from the u parameter (properly decoded)
+        actual_url = unquote(query_params.split('u=')[1].split('&')[0])
+    else:
+        # Try another method if u= isn't in the query params
+        actual_url = unquote(decoded_url.split('u=')[1].split('&')[0]) if 'u=' in decoded_url else decoded_url
+    return actual_url if actual_url else None
+
+
+# ============== RECORD BUILDING =====================
+def build_ad_record(raw):
+    """
+    Builds an `ads_data` record from the raw strings collected for one ad card.
+
+    `raw` is a dict with the keys produced by the extraction backends:
+    library_id_text, started_text, platform_styles, category_styles,
+    ads_count_text, ad_text, link_href, has_video, video_src, video_poster,
+    image_src, has_cta, cta_text, headline_text. Missing sections are None.
+    Returns None if the card has no Library ID.
+    """
+    if not raw.get("library_id_text"):
+        return None
+    library_id = raw["library_id_text"].replace("Library ID: ", "").strip()
+    ad_data = {"library_id": library_id}
+
+    ad_data["started_running"] = None
+    ad_data["total_active_time"] = None
+    if raw.get("started_text"):
+        try:
+            ad_data["started_running"], ad_data["total_active_time"] = parse_started_running(raw["started_text"].strip())
+        except Exception as e:
+            logger.warning(f"⚠️ Error parsing started running date for ad {library_id}: {str(e)}")
+            ad_data["started_running"] = None
+            ad_data["total_active_time"] = None
+
+    ad_data["platforms"] = [resolve_platform(style) for style in raw.get("platform_styles") or [] if style]
+    ad_data["categories"] = [resolve_category(style) for style in raw.get("category_styles") or [] if style]
+
+    ads_count_text = raw.get("ads_count_text")
+    ad_data["ads_count"] = parse_ads_count(ads_count_text) if ads_count_text is not None else None
+
+    ad_text = raw.get("ad_text")
+    ad_data["ad_text"] = ad_text.strip() if ad_text is not None else None
+
+    link_href = raw.get("link_href")
+    if link_href:
+        ad_data["destination_url"] = unwrap_destination_url(link_href)
+    ad_data["media_type"] = None
+    ad_data["media_url"] = None
+    ad_data["thumbnail_url"] = None
+    if link_href:
+        if raw.get("has_video"):
+            if raw.get("video_src"):
+                ad_data["media_type"] = "video"
+                ad_data["media_url"] = raw["video_src"]
+            if raw.get("video_poster"):
+                ad_data["thumbnail_url"] = raw["video_poster"]
+        elif raw.get("image_src"):
+            ad_data["media_type"] = "image"
+            ad_data["media_url"] = raw["image_src"]
+
+    if raw.get("has_cta"):
+        cta_text = raw.get("cta_text")
+        headline_text = raw.get("headline_text")
+        ad_data["cta_button_text"] = cta_text.strip() if cta_text is not None else None
+        ad_data["headline_text"] = headline_text.strip() if headline_text is not None else None
+    else:
+        ad_data["cta_button_text"] = None
+        ad_data["headline_text"] = None
+
+    return ad_data
+
+
+def limit_ads(ads_data, limit, newest=False):
+    """
+    Keeps the first `limit` ads of `ads_data` in page order, or with `newest`
+    the `limit` ads that started running most recently (undated ones last).
+    """
+    if not limit or len(ads_data) <= limit:
+        return ads_data
+    ads = list(ads_data.items())
+    if newest:
+        ads.sort(key=lambda item: item[1].get("started_running") or "", reverse=True)
+    return dict(ads[:limit])
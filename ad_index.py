@@ -0,0 +1,97 @@
+"""
+Local index of the ads already sent to the API, for delta uploads.
+
+Every ad is stored by `library_id` with a hash of its content. Comparing a
+freshly scraped page against the index gives the ads that are new, the ads
+whose content changed and the ads that are no longer shown, so only those
+have to be uploaded instead of deleting and re-importing everything daily.
+
+Signed fbcdn media URLs change on every visit, so only their path is hashed.
+None and "" hash the same in the fields the upload sends as "" (see
+sanitize_payload in ad_nova_script.py).
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit
+
+VOLATILE_URL_FIELDS = ("media_url", "thumbnail_url")
+# Fields uploaded as "" when missing
+BLANKED_FIELDS = ("thumbnail_url", "total_active_time", "cta_button_text")
+
+
+def content_hash(ad_data):
+    """Stable hash of an ad record, ignoring the signature/expiry query of media URLs."""
+    stable = dict(ad_data)
+    for field in BLANKED_FIELDS:
+        if stable.get(field) is None:
+            stable[field] = ""
+    for field in VOLATILE_URL_FIELDS:
+        if stable.get(field):
+            parts = urlsplit(stable[field])
+            stable[field] = f"{parts.netloc}{parts.path}"
+    return hashlib.sha256(json.dumps(stable, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class AdIndex:
+    """SQLite-backed `library_id -> content hash` index, safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ads (
+                    library_id   TEXT PRIMARY KEY,
+                    page_key     TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    active       INTEGER NOT NULL DEFAULT 1,
+                    first_seen   TEXT NOT NULL,
+                    last_seen    TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ads_page_key ON ads (page_key, active)")
+
+    def diff(self, page_key, ads_data):
+        """
+        Compares a scraped page against the index.
+        Returns (new_ids, changed_ids, gone_ids): gone ads are active in the index
+        for this page but missing from `ads_data`.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT library_id, content_hash, active FROM ads WHERE page_key = ?", (page_key,)
+            ).fetchall()
+        known = {library_id: (stored_hash, active) for library_id, stored_hash, active in rows}
+
+        new_ids, changed_ids = [], []
+        for library_id, ad_data in ads_data.items():
+            if library_id not in known:
+                new_ids.append(library_id)
+            elif known[library_id][0] != content_hash(ad_data) or not known[library_id][1]:
+                changed_ids.append(library_id)
+        gone_ids = [library_id for library_id, (_, active) in known.items() if active and library_id not in ads_data]
+        return new_ids, changed_ids, gone_ids
+
+    def commit(self, page_key, ads_data, gone_ids=()):
+        """Records an uploaded page: stores the current hashes and marks gone ads inactive."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        rows = [(library_id, page_key, content_hash(ad_data), today, today) for library_id, ad_data in ads_data.items()]
+        with self._lock, self._conn:
+            self._conn.executemany("""
+                INSERT INTO ads (library_id, page_key, content_hash, active, first_seen, last_seen)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (library_id) DO UPDATE SET
+                    page_key = excluded.page_key,
+                    content_hash = excluded.content_hash,
+                    active = 1,
+                    last_seen = excluded.last_seen
+            """, rows)
+            self._conn.executemany("UPDATE ads SET active = 0 WHERE library_id = ?", [(i,) for i in gone_ids])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,16 +1,15 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
 import json
 import re
+import gzip
+import hashlib
+import uuid
 from datetime import datetime
-from urllib.parse import unquote, urlparse
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
 import random  # [Human behavior: for random delays]
@@ -19,40 +18,248 @@ import json
 import requests
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from dotenv import load_dotenv
 import os
 import sys
+import argparse
+import logging
 from functools import partial
 
+import api_client
+
+from ad_fields import (parse_started_running, parse_ads_count, resolve_platform, resolve_category,
+                       unwrap_destination_url, limit_ads)
+from browser_extract import extract_ads_js, IncrementalExtractor, count_ad_cards
+from snapshot_parser import parse_snapshot
+from browser_pool import BrowserPool, blocked_url_patterns
+from network_capture import NetworkAdCollector
+from scroll_controller import ScrollController
+from scrape_pipeline import run_pipeline
+from ad_index import AdIndex
+import scrape_metrics
+from scrape_metrics import FieldTimer
+from scrape_logging import setup_logging, set_page, reset_page, page_context, page_label, ProgressLogger
+from scrape_scheduler import ScrapeHistory, LongestFirstScheduler, order_longest_first
+from run_journal import RunJournal, SCRAPED, UPLOADED, default_journal_path
+from sharding import shard_urls, merge_shard_outputs
+from isolated_scraper import IsolatedScraper
+from creative_registry import CreativeRegistry
+from media_store import MediaStore, MediaPrefetcher
+from concurrency_controller import ConcurrencyController, RetryQueue
+from page_output import NDJSON_SUFFIX, RunArchive, default_archive_path, write_page
+
 # ============== CONFIGURATION =====================
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Logging: level, "text" or "json" lines (one JSON object per line), where the log file goes,
+# and the minimum number of seconds between two progress lines of the same loop
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+LOG_PROGRESS_INTERVAL = float(os.getenv("LOG_PROGRESS_INTERVAL", "10"))
+
 # The base URL of your FastAPI application
 API_BASE_URL = os.getenv("API_BASE_URL", "https://17e48ce0d095.ngrok-free.app")
 
-# Platform identification mapping (unchanged)
-PLATFORM_MAPPING = {
-    ("https://static.xx.fbcdn.net/rsrc.php/v4/yW/r/TP7nCDju1B-.png", "0px -1171px"): "Facebook",
-    ("https://static.xx.fbcdn.net/rsrc.php/v4/yj/r/0dseWS3_nMM.png", "-34px -353px"): "Instagram",
-    ("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png", "-16px -528px"): "Audience Network",
-    ("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png", "-29px -528px"): "Messenger",
-    ("https://static.xx.fbcdn.net/rsrc.php/v4/yW/r/TP7nCDju1B-.png", "0px -1184px"): "Thread"
-}
-CATEGORY_MAPPING = {
-    ("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png", "-65px -557px"): "Employment",
-    ("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png", "0px -544px"): "Housing",
-    ("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png", "-13px -557px"): "Financial products and services",
-}
+# Uploads to /api/ad-details: ads per request (0 = whole page in one request), parallel
+# requests per page and gzip request bodies (the API must accept Content-Encoding: gzip).
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", "500"))
+UPLOAD_PARALLELISM = int(os.getenv("UPLOAD_PARALLELISM", "2"))
+UPLOAD_GZIP = os.getenv("UPLOAD_GZIP", "0") == "1"
+# Resends of a chunk after a read timeout or a 500/502/504, when the API may already have
+# stored it. Every chunk carries an Idempotency-Key header (the same for all its attempts in
+# this run), so only turn this on once the API answers a repeated key without storing the ads
+# again, as dev_api_server.py does. 0 (default) leaves the retries to api_client, which never
+# resends a POST the API may have received.
+UPLOAD_RETRIES = int(os.getenv("UPLOAD_RETRIES", "0"))
+UPLOAD_RETRY_STATUS_CODES = (500, 502, 504)
+
+# Delta uploads: keep a local index of uploaded ads (AD_INDEX_PATH) and only send new/changed
+# ads plus "no longer active" markers, instead of deleting today's data and re-importing everything.
+# The index must persist between runs (e.g. cache it in the workflow).
+DELTA_UPLOAD = os.getenv("DELTA_UPLOAD", "0") == "1"
+AD_INDEX_PATH = os.getenv("AD_INDEX_PATH", "ad_index.sqlite3")
+# Only mark missing ads inactive when the scrape found at least this share of the page's ad count
+DELTA_MIN_COVERAGE = float(os.getenv("DELTA_MIN_COVERAGE", "0.9"))
+
+# Run journal (one JSON line per URL state change) so a crashed or timed-out run can be
+# restarted: uploaded URLs are skipped, scraped ones re-uploaded from their JSON file, and
+# the cleanup isn't repeated. Off by default: with RUN_JOURNAL=1 every later run of the same
+# day resumes from run_journal_<date>.jsonl (or RUN_JOURNAL_PATH) until that file is deleted.
+RUN_JOURNAL = os.getenv("RUN_JOURNAL", "0") == "1"
+RUN_JOURNAL_PATH = os.getenv("RUN_JOURNAL_PATH") or default_journal_path()
+
+# Extraction backend for the ad cards:
+#   "dom" - walk every card with WebDriver calls (original behaviour)
+#   "js"  - extract all fields in-browser with one execute_script per batch of ad groups
+#   "snapshot" - grab page_source once, quit the browser and parse the HTML in a process pool
+#   "network" - read the ads from the page's GraphQL responses via Chrome's performance log
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "dom").lower()
+
+# Number of ad groups extracted per execute_script call in "js" mode (0 = whole page at once)
+JS_EXTRACT_BATCH_SIZE = int(os.getenv("JS_EXTRACT_BATCH_SIZE", "200"))
+
+# Number of processes parsing page snapshots in "snapshot" mode
+SNAPSHOT_PARSER_WORKERS = int(os.getenv("SNAPSHOT_PARSER_WORKERS", str(os.cpu_count() or 2)))
+
+# Extract newly rendered ads after every scroll instead of once at the end
+# (always uses the in-browser extraction, whatever EXTRACTION_MODE says)
+INCREMENTAL_EXTRACTION = os.getenv("INCREMENTAL_EXTRACTION", "0") == "1"
+
+# Bounded-memory mode for very large advertisers: replace already extracted ad cards
+# with empty fixed-height placeholders once they scroll out of view (implies incremental extraction)
+PRUNE_EXTRACTED_ADS = os.getenv("PRUNE_EXTRACTED_ADS", "0") == "1"
+
+# How the scroll loop waits for new ads:
+#   "fixed" - fixed sleeps and 0.5 s end-of-list probes (original behaviour)
+#   "event" - MutationObserver-based waits that move on as soon as new ads land
+SCROLL_MODE = os.getenv("SCROLL_MODE", "fixed").lower()
+SCROLL_LOAD_TIMEOUT = float(os.getenv("SCROLL_LOAD_TIMEOUT", "5"))      # seconds to wait for new ads after a scroll
+SCROLL_SETTLE_MS = int(os.getenv("SCROLL_SETTLE_MS", "200"))            # DOM quiet time before new ads count as loaded
+SCROLL_JITTER_MIN = float(os.getenv("SCROLL_JITTER_MIN", "0.2"))        # human-like delay between scrolls (event mode)
+SCROLL_JITTER_MAX = float(os.getenv("SCROLL_JITTER_MAX", "0.6"))
+
+# Stop scrolling as soon as the loaded ad cards reach the "~490 results" count of the page
+# instead of waiting for the height to stop changing
+SCROLL_STOP_AT_TOTAL = os.getenv("SCROLL_STOP_AT_TOTAL", "0") == "1"
+# Monitoring runs: keep MAX_ADS_PER_PAGE ads per page; 0 = no cap.
+#   "page"   - the first ones in page order; scrolling stops once that many cards are loaded
+#   "newest" - the most recently started ones; the page is scrolled to the end first, since
+#              the Ad Library does not list ads by start date
+# Capped pages never mark missing ads inactive in delta mode.
+MAX_ADS_PER_PAGE = int(os.getenv("MAX_ADS_PER_PAGE", "0"))
+MAX_ADS_ORDER = os.getenv("MAX_ADS_ORDER", "page").lower()
+
+# Resource types the browsers must not download while scraping (comma separated: image,media,font).
+# The media URLs are still read from the DOM; only the bytes are skipped. e.g. BLOCK_RESOURCES=image,media,font
+BLOCK_RESOURCES = [t.strip().lower() for t in os.getenv("BLOCK_RESOURCES", "").split(",") if t.strip()]
+# Extra URL patterns to block (comma separated, Network.setBlockedURLs wildcard syntax)
+BLOCKED_URL_PATTERNS = [p.strip() for p in os.getenv("BLOCKED_URL_PATTERNS", "").split(",") if p.strip()]
+
+# How a run is orchestrated:
+#   "threads" - one thread per browser scrapes, saves and uploads each URL in turn (original behaviour)
+#   "async"   - asyncio pipeline with bounded queues between the scrape, write and upload stages
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "threads").lower()
+WRITE_CONCURRENCY = int(os.getenv("WRITE_CONCURRENCY", "1"))
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "2"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+
+# Pooled browsers are quit and restarted after this many pages (or after any error)
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "10"))
+
+# Scrape each URL in a supervised worker process with its own browser. The worker (with
+# chromedriver and Chrome) is killed and replaced when a page runs longer than
+# PAGE_TIMEOUT_SECONDS or its process tree exceeds PAGE_MAX_RSS_MB (needs psutil); 0 disables a limit
+ISOLATE_PAGES = os.getenv("ISOLATE_PAGES", "0") == "1"
+PAGE_TIMEOUT_SECONDS = float(os.getenv("PAGE_TIMEOUT_SECONDS", "5400"))
+PAGE_MAX_RSS_MB = float(os.getenv("PAGE_MAX_RSS_MB", "4000"))
+
+# Adaptive number of concurrent browsers (replaces MAX_WORKERS): starts at ADAPTIVE_MIN_WORKERS and
+# moves between that and ADAPTIVE_MAX_WORKERS every ADAPTIVE_INTERVAL seconds, shrinking when CPU use
+# exceeds ADAPTIVE_CPU_HIGH %, free memory drops below ADAPTIVE_MIN_FREE_MB or pages get slower than
+# usual, growing while the runner has headroom (see concurrency_controller.py)
+ADAPTIVE_WORKERS = os.getenv("ADAPTIVE_WORKERS", "0") == "1"
+ADAPTIVE_MIN_WORKERS = int(os.getenv("ADAPTIVE_MIN_WORKERS", "1"))
+ADAPTIVE_MAX_WORKERS = int(os.getenv("ADAPTIVE_MAX_WORKERS", str(max(2, os.cpu_count() or 2))))
+ADAPTIVE_INTERVAL = float(os.getenv("ADAPTIVE_INTERVAL", "30"))
+ADAPTIVE_CPU_HIGH = float(os.getenv("ADAPTIVE_CPU_HIGH", "85"))
+ADAPTIVE_MIN_FREE_MB = float(os.getenv("ADAPTIVE_MIN_FREE_MB", "1000"))
+# URLs whose scrape failed are scraped again after the main pass, up to this many rounds
+RETRY_FAILED_ROUNDS = int(os.getenv("RETRY_FAILED_ROUNDS", "1" if ADAPTIVE_WORKERS else "0"))
+
+# Order in which the URLs are scraped:
+#   "api"     - the order the API returns them in (original behaviour)
+#   "longest" - longest expected scrape first, from the durations of earlier runs in SCRAPE_HISTORY_PATH
+# Every run records its page durations in SCRAPE_HISTORY_PATH, whatever the order
+# (sharding and adaptive concurrency use them too).
+SCRAPE_ORDER = os.getenv("SCRAPE_ORDER", "api").lower()
+SCRAPE_HISTORY_PATH = os.getenv("SCRAPE_HISTORY_PATH", "scrape_history.json")
+# With SCRAPE_ORDER=longest, once all URLs are started, an idle browser re-runs a page that takes
+# longer than STRAGGLER_FACTOR x its usual time (and at least STRAGGLER_MIN_SECONDS more).
+# 0 (default) disables it. Both attempts of a re-run page count in that page's metrics.
+STRAGGLER_FACTOR = float(os.getenv("STRAGGLER_FACTOR", "0"))
+STRAGGLER_MIN_SECONDS = float(os.getenv("STRAGGLER_MIN_SECONDS", "600"))
+
+# Sharding across runners (job matrix / several machines): each runner scrapes shard
+# SHARD_INDEX (0-based) of SHARD_COUNT. Shards never run the cleanup themselves: it must
+# run once in a separate `--cleanup-only` job the shards depend on, and every shard needs
+# SKIP_CLEANUP=1 (or --skip-cleanup), otherwise it refuses to start.
+#   SHARD_BALANCE="ads"  - balanced by no_of_ads in SCRAPE_HISTORY_PATH (all shards need the same file)
+#   SHARD_BALANCE="hash" - by URL hash only
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", "0"))
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+SHARD_BALANCE = os.getenv("SHARD_BALANCE", "ads").lower()
+SKIP_CLEANUP = os.getenv("SKIP_CLEANUP", "0") == "1"
+
+# Upload each distinct creative (text, headline, landing page, media) once per run: ads reference
+# it by `creative_id` and the payload's `creatives` map carries the ones the API hasn't got yet.
+# Needs an API that resolves creative IDs (dev_api_server.py does).
+DEDUPE_CREATIVES = os.getenv("DEDUPE_CREATIVES", "0") == "1"
+
+# Download the videos of every scraped page into the content-addressed store MEDIA_STORE_DIR
+# (read by transcript_bot.py) on MEDIA_PREFETCH_WORKERS threads while scraping goes on,
+# limited to MEDIA_PREFETCH_MAX_MBPS megabits per second in total (0 = unlimited)
+MEDIA_PREFETCH = os.getenv("MEDIA_PREFETCH", "0") == "1"
+MEDIA_STORE_DIR = os.getenv("MEDIA_STORE_DIR", "media_store")
+MEDIA_PREFETCH_WORKERS = int(os.getenv("MEDIA_PREFETCH_WORKERS", "2"))
+MEDIA_PREFETCH_MAX_MBPS = float(os.getenv("MEDIA_PREFETCH_MAX_MBPS", "50"))
+
+# Every page is appended to the run archive RUN_ARCHIVE_PATH (default ads_data_<date>.ndjson.gz),
+# the file the workflow uploads as artifact; RUN_ARCHIVE=0 disables it.
+RUN_ARCHIVE = os.getenv("RUN_ARCHIVE", "1") == "1"
+RUN_ARCHIVE_PATH = os.getenv("RUN_ARCHIVE_PATH") or default_archive_path()
+# Per-page output files (read back on resume and by --merge): "json" (ad_data_<id>.json, indented)
+# or "ndjson" (ad_data_<id>.ndjson.gz, one ad per line, gzipped). Defaults to the compact "ndjson"
+# while the run archive keeps a copy of every page anyway, "json" without it.
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "ndjson" if RUN_ARCHIVE else "json").lower()
+
+# Where the run's metrics (JSON summary + Prometheus textfile) are written
+METRICS_DIR = os.getenv("METRICS_DIR", LOG_DIR)
+
+_snapshot_pool = None
+_snapshot_pool_lock = threading.Lock()
+_ad_index = None
+_run_archive = None
+_creative_registry = CreativeRegistry()
+_media_prefetcher = None
+_ad_index_lock = threading.Lock()
+
+
+def get_snapshot_pool():
+    """
+    Returns the process pool shared by all scraping threads for parsing page snapshots.
+    Uses 'spawn' so the workers don't inherit the browser threads of this process.
+    """
+    global _snapshot_pool
+    with _snapshot_pool_lock:
+        if _snapshot_pool is None:
+            _snapshot_pool = ProcessPoolExecutor(max_workers=SNAPSHOT_PARSER_WORKERS,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return _snapshot_pool
+
+
+def shutdown_snapshot_pool():
+    global _snapshot_pool
+    with _snapshot_pool_lock:
+        if _snapshot_pool is not None:
+            _snapshot_pool.shutdown()
+            _snapshot_pool = None
 
 
 def sanitize_payload(payload):
     """
-    Iterates through ads_data and replaces None in specific string fields with an empty string.
-    This prevents validation errors if the API is strict.
+    Returns a copy of the payload where None in specific string fields of ads_data is replaced
+    with an empty string. This prevents validation errors if the API is strict.
+    The scraped records are left untouched, so the ad index hashes what was scraped.
     """
     if "ads_data" in payload and isinstance(payload["ads_data"], dict):
+        ads_data = {}
         for ad_id, ad_data in payload["ads_data"].items():
+            ad_data = dict(ad_data)
             # If thumbnail_url is None, set it to an empty string
             if ad_data.get("thumbnail_url") is None:
                 ad_data["thumbnail_url"] = ""
@@ -65,6 +272,8 @@ def sanitize_payload(payload):
             # For example, cta_button_text
             if ad_data.get("cta_button_text") is None:
                 ad_data["cta_button_text"] = ""
+            ads_data[ad_id] = ad_data
+        payload = {**payload, "ads_data": ads_data}
 
     return payload
 
@@ -81,63 +290,162 @@ def cleanup_existing_data():
         current_date = datetime.now().strftime("%Y-%m-%d")
         cleanup_url = f"{full_api_url}/api/cleanup-ads?delete_date={current_date}"
         
-        print(f"\nCleaning up existing data for date: {current_date}")
-        response = requests.delete(cleanup_url, timeout=30)
+        logger.info(f"Cleaning up existing data for date: {current_date}")
+        response = api_client.delete(cleanup_url, timeout=30)
         response.raise_for_status()
         
         result = response.json()
-        print(f"Cleanup completed: {result.get('message')}")
-        print(f"Deleted records: {result.get('deleted_records')}")
+        logger.info(f"Cleanup completed: {result.get('message')}")
+        logger.info(f"Deleted records: {result.get('deleted_records')}")
         return True
         
     except requests.exceptions.HTTPError as http_err:
-        print(f"Cleanup failed with HTTP error: {http_err}")
+        logger.error(f"Cleanup failed with HTTP error: {http_err}")
         if 'response' in locals():
-            print(f"Status Code: {response.status_code}")
+            logger.error(f"Status Code: {response.status_code}")
             try:
-                print("Error Details:", response.json())
+                logger.error(f"Error Details: {response.json()}")
             except json.JSONDecodeError:
-                print("Response Body:", response.text)
+                logger.error(f"Response Body: {response.text}")
     except requests.exceptions.RequestException as req_err:
-        print(f"An error occurred during cleanup: {req_err}")
+        logger.error(f"An error occurred during cleanup: {req_err}")
     
     return False
 
 
-def send_data_to_api(api_url, payload):
+def split_payload(payload, chunk_size):
     """
-    Sends the processed ad data to the FastAPI endpoint.
-    First cleans up existing data for the current date.
+    Splits a page payload into payloads of at most `chunk_size` ads each.
+    Every chunk keeps the page-level fields; chunk_size <= 0 means no splitting.
+    """
+    ads = list(payload.get("ads_data", {}).items())
+    if chunk_size <= 0 or len(ads) <= chunk_size:
+        return [payload]
+    return [
+        {**payload, "ads_data": dict(ads[i:i + chunk_size])}
+        for i in range(0, len(ads), chunk_size)
+    ]
+
+
+# Scopes the idempotency keys to this run, so identical chunks of a later run are stored again
+_upload_run_id = uuid.uuid4().hex
+
+
+def idempotency_key(payload):
+    """Returns the Idempotency-Key of an upload: the same for every attempt at the same payload in this run."""
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(_upload_run_id.encode("ascii") + body).hexdigest()
+
+
+def _post_json(api_url, payload, timeout, key=None):
+    headers = {"Idempotency-Key": key} if key else {}
+    if UPLOAD_GZIP:
+        body = gzip.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        headers.update({"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        return api_client.post(api_url, data=body, headers=headers, timeout=timeout)
+    return api_client.post(api_url, json=payload, headers=headers, timeout=timeout)
+
+
+def _post_chunk(api_url, payload, metrics, label):
+    """
+    Posts one chunk, resending it up to UPLOAD_RETRIES times with the same Idempotency-Key
+    when the API may or may not have stored it (read timeout, 500/502/504).
+    Returns the last response; raises the last request error.
     """
+    key = idempotency_key(payload)
+    for attempt in range(UPLOAD_RETRIES + 1):
+        if attempt:
+            delay = api_client.API_BACKOFF_FACTOR * 2 ** (attempt - 1)
+            logger.warning(f"Resending{label} with the same Idempotency-Key in {delay:g}s "
+                           f"(attempt {attempt + 1}/{UPLOAD_RETRIES + 1})...")
+            time.sleep(delay)
+            metrics.incr("upload_retries")
+        request_start = time.time()
+        try:
+            response = _post_json(api_url, payload, timeout=60, key=key) # Increased timeout
+        except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError) as e:
+            if attempt == UPLOAD_RETRIES:
+                raise
+            logger.warning(f"Upload{label} failed: {e}")
+            continue
+        finally:
+            metrics.add_time("upload", time.time() - request_start)
+            metrics.incr("upload_requests")
+        metrics.incr("upload_bytes", len(response.request.body or b""))
+        if response.status_code not in UPLOAD_RETRY_STATUS_CODES or attempt == UPLOAD_RETRIES:
+            return response
+        logger.warning(f"Upload{label} answered {response.status_code}.")
+
+
+def _send_chunk(api_url, payload, label):
+    """
+    Posts one (chunk of a) payload. Returns True on success.
+    api_client only resends a POST the API cannot have received; the resends after a timeout
+    or gateway error are up to UPLOAD_RETRIES and rely on the Idempotency-Key.
+    """
+    metrics = scrape_metrics.page(payload["page_link"])
+    response = None
     try:
-        print("\nSending data to API...")
-        # Sanitize the payload before sending
-        sanitized_payload = sanitize_payload(payload)
-        
-        response = requests.post(api_url, json=sanitized_payload, timeout=60) # Increased timeout
+        response = _post_chunk(api_url, payload, metrics, label)
         response.raise_for_status()
+        if DEDUPE_CREATIVES:
+            _creative_registry.mark_sent(payload)
 
         api_response = response.json()
-        print("API Response:")
-        print(f"  Status: {api_response.get('status')}")
-        print(f"  Message: {api_response.get('message')}")
-        print(f"  Total Processed by API: {api_response.get('total_processed')}")
+        logger.info(f"API Response{label}: status={api_response.get('status')}, "
+                    f"message={api_response.get('message')!r}, "
+                    f"total processed by API={api_response.get('total_processed')}")
+        return True
 
     except requests.exceptions.HTTPError as http_err:
-        print(f"HTTP error occurred: {http_err}")
-        print(f"Status Code: {response.status_code}")
+        logger.error(f"HTTP error occurred{label}: {http_err}")
+        logger.error(f"Status Code: {response.status_code}")
         # Use response.json() if possible for cleaner error output from FastAPI
         try:
-            print("Error Details:", response.json())
+            logger.error(f"Error Details: {response.json()}")
         except json.JSONDecodeError:
-            print("Response Body:", response.text)
+            logger.error(f"Response Body: {response.text}")
     except requests.exceptions.RequestException as req_err:
-        print(f"An error occurred during the request: {req_err}")
+        logger.error(f"An error occurred during the request{label}: {req_err}")
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        logger.error(f"An unexpected error occurred{label}: {e}")
 
+    metrics.incr("upload_failures")
+    return False
 
 
+def send_data_to_api(api_url, payload):
+    """
+    Sends the processed ad data to the FastAPI endpoint.
+    Large payloads are split into chunks of UPLOAD_CHUNK_SIZE ads (optionally gzipped)
+    and sent UPLOAD_PARALLELISM at a time; each chunk is retried on its own (see _post_chunk).
+    Returns True if everything was accepted.
+    """
+    logger.info("Sending data to API...")
+    # Sanitize the payload before sending
+    sanitized_payload = sanitize_payload(payload)
+
+    chunks = split_payload(sanitized_payload, UPLOAD_CHUNK_SIZE)
+    if DEDUPE_CREATIVES and sanitized_payload.get("ads_data"):
+        # Each chunk carries the creatives it needs, until one upload of them has been accepted
+        chunks, shared = zip(*(_creative_registry.dedupe(chunk) for chunk in chunks))
+        chunks = list(chunks)
+        scrape_metrics.page(payload["page_link"]).incr("ads_sharing_creative", sum(shared))
+        logger.info(f"{sum(shared)}/{len(sanitized_payload['ads_data'])} ads reference an already uploaded creative.")
+    if len(chunks) == 1:
+        return _send_chunk(api_url, chunks[0], "")
+
+    logger.info(f"Uploading {len(sanitized_payload['ads_data'])} ads in {len(chunks)} chunks "
+                f"({UPLOAD_PARALLELISM} in parallel{', gzip' if UPLOAD_GZIP else ''})...")
+    with ThreadPoolExecutor(max_workers=UPLOAD_PARALLELISM) as executor:
+        results = list(executor.map(
+            lambda numbered: _send_chunk(api_url, numbered[1], f" [chunk {numbered[0]}/{len(chunks)}]"),
+            enumerate(chunks, 1),
+        ))
+    failed = results.count(False)
+    if failed:
+        logger.warning(f"⚠️ {failed}/{len(chunks)} chunks could not be uploaded.")
+    return not failed
 
 
 def extract_page_id(url):
@@ -145,11 +453,455 @@ def extract_page_id(url):
     match = re.search(r'view_all_page_id=(\d+)', url)
     return match.group(1) if match else 'output'
 
-def scrape_ads(url, driver_path):
-    print(f"\nNavigating to {url}...")
+def extract_ads_dom(driver, metrics=None):
+    """
+    Extracts the ads on the current page by walking every ad card with WebDriver
+    calls (one round trip per field). The time spent per field group is added to
+    `metrics` (a scrape_metrics.PageMetrics) when given.
+    Returns a (ads_data, total_child_ads_found) tuple.
+    """
+    field_timer = FieldTimer()
+    progress = ProgressLogger(logger, LOG_PROGRESS_INTERVAL)
+    # Count divs with the first class (unchanged selector logic)
+    target_class_1 = "x6s0dn4 x78zum5 xdt5ytf xl56j7k x1n2onr6 x1ja2u2z x19gl646 xbumo9q"
+    try:
+        divs_1 = driver.find_elements(By.CSS_SELECTOR, f'div[class="{target_class_1}"]')
+        logger.debug(f"Total <div> elements with target class 1: {len(divs_1)}")
+    except Exception as e:
+        logger.error(f"Error finding elements with target class 1: {e}")
+        divs_1 = []
+
+    # Count divs with the second class (unchanged selector logic)
+    # target_class_2 = "xrvj5dj x18m771g x1p5oq8j xbxaen2 x18d9i69 x1u72gb5 xtqikln x1na6gtj x1jr1mh3 xm39877 x7sq92a xxy4fzi"
+    target_class_2 = "xrvj5dj x18m771g x1p5oq8j xp48ta0 x18d9i69 xtssl2i xtqikln x1na6gtj x1jr1mh3 x15h0gye x7sq92a xlxr9qa"
+    try:
+        divs_2 = driver.find_elements(By.CSS_SELECTOR, f'div[class="{target_class_2}"]')
+        logger.debug(f"Total <div> elements (ad groups) with target class 2: {len(divs_2)}")
+    except Exception as e:
+        logger.error(f"Error finding elements with target class 2: {e}")
+        divs_2 = []
+
+
+    # Dictionary to store all ads data (unchanged)
+    ads_data = {}
+
+    # For each target_class_2 div, count xh8yej3 children and process them (unchanged logic, potential speedup from faster page load/scrolling)
+    logger.debug("Processing ads...")
+    total_processed = 0
+    total_child_ads_found = 0
+
+    # --- Optimization: Process elements already found, minimize waits inside loop ---
+    for i, div in enumerate(divs_2, 1):
+        try:
+            child_divs = div.find_elements(By.XPATH, './div[contains(@class, "xh8yej3")]')
+            num_children = len(child_divs)
+            logger.debug(f"Ad group {i}/{len(divs_2)}: {num_children} ads")
+            total_child_ads_found += num_children
+
+            # Process each xh8yej3 child
+            for j, child_div in enumerate(child_divs, 1):
+                current_ad_id_for_logging = f"Group {i}, Ad {j}"
+                library_id = None # Initialize library_id for potential error logging
+                field_timer.start()
+                try:
+                    main_container = child_div.find_element(By.XPATH, './/div[contains(@class, "x78zum5 xdt5ytf x2lwn1j xeuugli")]')
+
+                    # Extract Library ID
+                    library_id_element = main_container.find_element(By.XPATH, './/div[contains(@class, "x1rg5ohu x67bb7w")]/span[contains(text(), "Library ID:")]')
+                    library_id = library_id_element.text.replace("Library ID: ", "").strip()
+                    current_ad_id_for_logging = library_id # Update logging ID once found
+
+                    # if library_id in ads_data:
+                    #     # print(f"Skipping duplicate Library ID: {library_id}")
+                    #     continue
+
+                    # Initialize ad data with library_id
+                    ad_data = {"library_id": library_id}
+
+                    field_timer.lap("library_id")
+
+                    # Extract started_running, total_active_time
+                    try:
+                        started_running_element = main_container.find_element(By.XPATH, './/span[contains(text(), "Started running on")]')
+                        full_text = started_running_element.text.strip()
+
+                        # Extract the started running date and the total active time if present
+                        ad_data["started_running"], ad_data["total_active_time"] = parse_started_running(full_text)
+
+                    except NoSuchElementException:
+                        # print(f"Started running date not found for ad {current_ad_id_for_logging}")
+                        ad_data["started_running"] = None
+                        ad_data["total_active_time"] = None
+                    except Exception as e:
+                        logger.warning(f"⚠️ Error parsing started running date for ad {current_ad_id_for_logging}: {str(e)}")
+                        ad_data["started_running"] = None
+                        ad_data["total_active_time"] = None
+
+                    field_timer.lap("started_running")
+
+                    # Extract Platforms icons
+                    platforms_data = []
+                    try:
+                        platforms_div = main_container.find_element(By.XPATH, './/span[contains(text(), "Platforms")]/following-sibling::div[1]') # Use [1] for immediate sibling
+                        platform_icons = platforms_div.find_elements(By.XPATH, './/div[contains(@class, "xtwfq29")]')
+
+                        for icon in platform_icons:
+                            try:
+                                style = icon.get_attribute("style")
+                                if not style: continue # Skip if no style attribute
+
+                                # Identify platform name
+                                platform_name = resolve_platform(style)
+
+                                # platforms_data.append({
+                                #     # "style": style, # Usually not needed in final data
+                                #     "mask_image": mask_image,
+                                #     "mask_position": mask_position,
+                                #     "platform_name": platform_name if platform_name else "Unknown"
+                                # })
+                                platforms_data.append(
+                                    # "style": style, # Usually not needed in final data
+                                    platform_name 
+                                )
+                            except Exception as e:
+                                # print(f"Could not process a platform icon for ad {current_ad_id_for_logging}: {str(e)}")
+                                continue
+                    except NoSuchElementException:
+                        # print(f"Platforms section not found for ad {current_ad_id_for_logging}")
+                        pass # okay if this section is missing
+                    except Exception as e:
+                        logger.warning(f"Error extracting platforms for ad {current_ad_id_for_logging}: {str(e)}")
+
+                    ad_data["platforms"] = platforms_data
+
+                    field_timer.lap("platforms")
+
+                    # Extract Categories icon
+                    category_data = []
+                    try:
+                        # Find the Categories span first
+                        categories_span = main_container.find_element(By.XPATH, './/span[contains(text(), "Categories")]')
+
+                        # Find all sibling divs with class x1rg5ohu x67bb7w that come after the Categories span
+                        category_divs = categories_span.find_elements(By.XPATH, './following-sibling::div[contains(@class, "x1rg5ohu") and contains(@class, "x67bb7w")]')
+
+                        for category_div in category_divs:
+                            try:
+                                # Find the icon div within each category div
+                                icon_div = category_div.find_element(By.XPATH, './/div[contains(@class, "xtwfq29")]')
+                                style = icon_div.get_attribute("style")
+
+                                if style:
+                                    # Identify category name from mapping
+                                    category_name = resolve_category(style)
+
+                                    # category_data.append({
+                                    #     "mask_image": mask_image,
+                                    #     "mask_position": mask_position,
+                                    #     "category_name": category_name
+                                    # })
+                                    category_data.append(
+                                        category_name
+                                    )
+                            except Exception as e:
+                                logger.warning(f"Could not process a category icon: {str(e)}")
+                                continue
+
+                    except NoSuchElementException:
+                        pass  # No categories section found
+                    except Exception as e:
+                        logger.warning(f"Error extracting categories: {str(e)}")
+
+                    ad_data["categories"] = category_data
+
+                    field_timer.lap("categories")
+
+                    # Extract Ads count
+                    try:
+                        # Adjusted XPath to be more specific to the 'N ads use this creative and text.' structure
+                        ads_count_element = main_container.find_element(By.XPATH, './/div[contains(@class, "x6s0dn4 x78zum5 xsag5q8")]//strong')
+                        ad_data["ads_count"] = parse_ads_count(ads_count_element.text) # This will be just "4"
+
+                    except NoSuchElementException:
+                        ad_data["ads_count"] = None
+                    except Exception as e:
+                        logger.warning(f"Error extracting ads count for ad {current_ad_id_for_logging}: {str(e)}")
+                        ad_data["ads_count"] = None
+
+                    # Add to main dictionary with library_id as key
+                    ads_data[library_id] = ad_data
+                    total_processed += 1
+
+                    field_timer.lap("ads_count")
+
+                    # Extract Ad Text Content
+                    try:
+                        # Find the parent div containing the text first, more reliable
+                        ad_text_container = child_div.find_element(By.XPATH, './/div[@data-ad-preview="message" or contains(@style, "white-space: pre-wrap")]')
+                        # Get all text within, handles cases with multiple spans or line breaks better
+                        ad_data["ad_text"] = ad_text_container.text.strip()
+                    except NoSuchElementException:
+                        # print(f"Ad text not found for ad {current_ad_id_for_logging}")
+                        ad_data["ad_text"] = None
+                    except Exception as e:
+                        logger.warning(f"Error extracting ad text for ad {current_ad_id_for_logging}: {str(e)}")
+                        ad_data["ad_text"] = None
+
+                    field_timer.lap("ad_text")
+
+                    # extract media
+                    try:
+                        # First find the xh8yej3 div inside child_div if we're not already looking at it
+                        # xh8yej3_div = child_div
+                        # if "xh8yej3" not in child_div.get_attribute("class"):
+
+                        # Try to find the link container first as it often contains both media and CTA
+                        link_container = child_div.find_element(By.XPATH, './/a[contains(@class, "x1hl2dhg") and contains(@class, "x1lku1pv")]')
+
+                        # Extract and store the link URL
+                        link_url = link_container.get_attribute('href')
+                        ad_data["destination_url"] = unwrap_destination_url(link_url)
+
+                        # Extract media from this link container
+                        ad_data["media_type"] = None
+                        ad_data["media_url"] = None
+                        ad_data["thumbnail_url"] = None
+
+                        # Check for video within the link container
+                        try:
+                            video_element = child_div.find_element(By.XPATH, './/video')
+                            media_url = video_element.get_attribute('src')
+                            if media_url: # Ensure src is not empty
+                                ad_data["media_type"] = "video"
+                                ad_data["media_url"] = media_url
+                            poster_url = video_element.get_attribute('poster')
+                            if poster_url:
+                                ad_data["thumbnail_url"] = poster_url
+                        except NoSuchElementException:
+                            # If no video, try image with more specific targeting
+                            try:
+                                img_element = link_container.find_element(By.XPATH, './/img[contains(@class, "x168nmei") or contains(@class, "_8nqq")]')
+                                media_url = img_element.get_attribute('src')
+                                if media_url:
+                                    ad_data["media_type"] = "image"
+                                    ad_data["media_url"] = media_url
+                            except NoSuchElementException:
+                                # Fallback to any image within the link container
+                                try:
+                                    img_element = link_container.find_element(By.XPATH, './/img')
+                                    media_url = img_element.get_attribute('src')
+                                    if media_url:
+                                        ad_data["media_type"] = "image"
+                                        ad_data["media_url"] = media_url
+                                except NoSuchElementException:
+                                    pass  # No media found
+
+                    except Exception as e:
+                        logger.warning(f"Error extracting media or CTA for ad {current_ad_id_for_logging}: {str(e)}")
+                        # Initialize with None if not already set
+                        if "media_type" not in ad_data:
+                            ad_data["media_type"] = None
+                        if "media_url" not in ad_data:
+                            ad_data["media_url"] = None
+                        if "thumbnail_url" not in ad_data:
+                            ad_data["thumbnail_url"] = None
+
+                    except Exception as e:
+                        logger.warning(f"Error extracting media for ad {current_ad_id_for_logging}: {str(e)}")
+
+                    field_timer.lap("media")
+                    try:
+                        # ① container that wraps headline + CTA area
+                        cta_container = child_div.find_element(
+                            By.XPATH,
+                            './/div[contains(@class, "x6s0dn4 x2izyaf x78zum5 x1qughib '
+                            'x15mokao x1ga7v0g xde0f50 x15x8krk xexx8yu xf159sx xwib8y2 xmzvs34")]'
+                        )
+
+                        # ② sub‑container that holds headline + legal copy
+                        head_line_container = cta_container.find_element(
+                            By.XPATH,
+                            './/div[contains(@class, "x1iyjqo2 x2fvf9 x6ikm8r x10wlt62 xt0b8zv")]'
+                        )
+
+                        # ③ CTA button div
+                        cta_div = cta_container.find_element(
+                            By.XPATH,
+                            './/div[contains(@class, "x2lah0s")]'
+                        )
+
+                        # -- CTA TEXT (existing)
+                        cta_text_element = cta_div.find_element(
+                            By.XPATH,
+                            './/div[contains(@class, "x8t9es0 x1fvot60 xxio538 x1heor9g '
+                            'xuxw1ft x6ikm8r x10wlt62 xlyipyv x1h4wwuj x1pd3egz xeuugli")]'
+                        )
+                        ad_data["cta_button_text"] = cta_text_element.text.strip()
+
+                        # -- HEADLINE TEXT (NEW) -----------------------------------------------
+                        try:
+                            headline_element = head_line_container.find_element(
+                                By.XPATH,
+                                './/div[contains(@class, "x6ikm8r x10wlt62 xlyipyv x1mcwxda")]'
+                            )
+                            ad_data["headline_text"] = headline_element.text.strip()
+                        except NoSuchElementException:
+                            ad_data["headline_text"] = None
+                        # ----------------------------------------------------------------------
+
+                    except NoSuchElementException:
+                        # No CTA container found ⇒ keep previous behaviour
+                        ad_data["cta_button_text"] = None
+                        ad_data["headline_text"] = None
+                    except Exception as e:
+                        logger.warning(f"Error extracting CTA or headline text for ad {current_ad_id_for_logging}: {str(e)}")
+                        ad_data["cta_button_text"] = None
+                        ad_data["headline_text"] = None
+                    field_timer.lap("cta_headline")
+                    # Add to main dictionary with library_id as key
+                    ads_data[library_id] = ad_data
+                    total_processed += 1
+                    # Reduce console noise: log progress periodically instead of every ad
+                    progress.update(f"Processed {total_processed}/{total_child_ads_found} ads...")
+
+                except NoSuchElementException as e:
+                    # This might happen if the structure is unexpected, often failure to find library ID
+                    logger.warning(f"Critical element missing for ad {current_ad_id_for_logging}, skipping. Error: {e.msg}")
+                    continue # Skip this child_div entirely if critical info (like ID) is missing
+                except Exception as e:
+                    logger.warning(f"Unexpected error processing ad {current_ad_id_for_logging}: {str(e)}")
+                    continue # Skip this child_div on unexpected errors
+
+        except Exception as e:
+            logger.warning(f"Error finding or processing xh8yej3 children for div group {i}: {str(e)}")
+            continue
+    if metrics:
+        metrics.add_field_times(field_timer.totals)
+    return ads_data, total_child_ads_found
+
+
+def scroll_page(driver, on_scroll=None, controller=None, target_ads=None, count_loaded=count_ad_cards):
+    """
+    Scrolls the ad list until the end-of-list marker shows up or the page height
+    stops changing. `on_scroll(driver)` is called after every scroll (e.g. to
+    extract the ads rendered so far), before the full human-like delay
+    between scrolls. With a `ScrollController`, the fixed
+    sleeps are replaced by waiting for the newly loaded ads to land.
+    With `target_ads`, scrolling also stops once `count_loaded(driver)` reaches it.
+    Returns the number of scrolls.
+    """
+    # Target XPaths for end-of-list marker (unchanged)
+
+    target_xpaths = [
+        "/html/body/div[1]/div/div/div/div/div/div/div[1]/div/div/div/div[5]/div[2]/div[9]/div[3]/div[2]/div",
+        "/html/body/div[1]/div/div/div/div/div/div[1]/div/div/div/div[6]/div[2]/div[9]/div[3]/div[2]/div"
+    ]
+
+    logger.info("Starting scroll loop to load all ads...")
+    scroll_count = 0
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    scroll_pause_time = 0.7 # Reduced pause time after scroll
+    max_scroll_attempts_at_bottom = 3 # How many times to scroll after height stops changing, just in case
+    attempts_at_bottom = 0
+    progress = ProgressLogger(logger, LOG_PROGRESS_INTERVAL)
+    if controller:
+        controller.install(driver)
+
+    def target_reached():
+        if not target_ads:
+            return False
+        loaded = count_loaded(driver)
+        if loaded >= target_ads:
+            logger.info(f"✅ {loaded} ads loaded (target {target_ads}) after {scroll_count} scrolls. Stopping scroll.")
+            return True
+        return False
+
+    if target_reached():
+        return scroll_count
+
+    # scrolling part
+    while attempts_at_bottom < max_scroll_attempts_at_bottom:
+        # Scroll down to bottom
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        scroll_count += 1
+
+        if controller:
+            # Move on as soon as the new ads have rendered
+            controller.wait_for_content(driver, last_height)
+        else:
+            # --- Optimization: Shorter, dynamic wait ---
+            time.sleep(scroll_pause_time) # Wait briefly for page to load
+
+        logger.debug("Hmm, loading...")
+
+        # Calculate new scroll height and compare with last scroll height
+        new_height = driver.execute_script("return document.body.scrollHeight")
+
+        element_found = False
+        # Let's only check for the end element when the height hasn't changed
+        if new_height == last_height and controller:
+            element_found = controller.end_marker_present(driver, target_xpaths)
+            if element_found:
+                logger.debug("✅ End-of-list element found.")
+        elif new_height == last_height:
+            for xpath in target_xpaths:
+                try:
+                    # Use a very short wait for the end element check
+                    WebDriverWait(driver, 0.5).until(EC.presence_of_element_located((By.XPATH, xpath)))
+                    logger.debug(f"✅ End-of-list element found using XPath: {xpath}")
+                    element_found = True
+                    break
+                except (NoSuchElementException, TimeoutException):
+                    continue
+
+        if element_found:
+            logger.info(f"✅ End-of-list element found after {scroll_count} scrolls. Stopping scroll.")
+            break
+
+        if new_height == last_height:
+            attempts_at_bottom += 1
+            logger.debug(f"Scroll height ({new_height}) hasn't changed. Attempt {attempts_at_bottom}/{max_scroll_attempts_at_bottom} at bottom...")
+        else:
+            attempts_at_bottom = 0 # Reset counter if height changed
+            logger.debug(f"Scrolled {scroll_count} time(s). New height: {new_height}")
+            progress.update(f"Scrolled {scroll_count} time(s), page height {new_height}...")
+
+        last_height = new_height
+
+        # Optional safety break: Prevent infinite loops
+        if scroll_count > 500: # Adjust limit as needed
+            logger.warning("⚠️ Reached maximum scroll limit (500). Stopping scroll.")
+            break
+
+        # Extract the newly rendered ads; the jitter floor between scrolls is kept in full
+        if on_scroll:
+            on_scroll(driver)
+        if target_reached():
+            break
+        if controller:
+            controller.sleep(controller.jitter())
+        else:
+            time.sleep(random.uniform(0.5, 1.5))  # Human-like delay
+
+    if not element_found and attempts_at_bottom >= max_scroll_attempts_at_bottom:
+        logger.info("🏁 Reached bottom of page (height stabilized).")
+    if controller:
+        logger.info(f"Scroll timing after {scroll_count} scrolls: {controller.summary()}")
+    return scroll_count
+
+
+def scrape_page(url, pool):
+    """
+    Scrapes all ads of one Ad Library URL with a browser from `pool`.
+    Returns the page payload for the API, or None if scraping failed.
+    """
+    logger.info(f"Navigating to {url}...")
     driver = None  # Initialize driver to None
+    driver_failed = False
     start_time = time.time()
     competitor_name_for_logging = urlparse(url).query # Fallback name for logging
+    metrics = scrape_metrics.page(url)
+    log_token = set_page(page_label(url))
 
     # --- Robust Main Execution Block ---
     try:
@@ -159,43 +911,33 @@ def scrape_ads(url, driver_path):
         total_ad_count_of_page = 0
         ads_data = {}
         total_child_ads_found = 0
-        print(f"\n[START] Navigating to {url}...")
+        logger.info(f"[START] Navigating to {url}...")
 
         # --- Driver Setup ---
-        import tempfile
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1920,1080")
-        options.add_argument("--log-level=3")
-        options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        options.add_argument(f'--user-data-dir={tempfile.mkdtemp()}')
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-
-        service = Service(executable_path=driver_path)
-        driver = webdriver.Chrome(service=service, options=options)
+        # Warm driver from the shared pool (state is reset between URLs)
+        with metrics.timer("browser_acquire"):
+            driver = pool.acquire()
         wait = WebDriverWait(driver, 10)
-        
-        # Set a timeout for the initial page load to prevent hangs
-        driver.set_page_load_timeout(60)
+        navigation_start = time.time()
         driver.get(url)
 
         # ... (The rest of your scraping logic goes inside this try block) ...
         # (I've copied your logic below, with improved logging)
         
-        print(f"[{url[-30:]}] Waiting for initial ad content to load...")
+        logger.debug("Waiting for initial ad content to load...")
         initial_content_locator = (By.CSS_SELECTOR, 'div[class="xrvj5dj x18m771g x1p5oq8j xp48ta0 x18d9i69 xtssl2i xtqikln x1na6gtj x1jr1mh3 x15h0gye x7sq92a xlxr9qa"]')
         try:
             wait.until(EC.presence_of_element_located(initial_content_locator))
-            print(f"[{url[-30:]}] ✅ Initial content loaded.")
+            metrics.add_time("navigation", time.time() - navigation_start)
+            logger.info("✅ Initial content loaded.")
         except TimeoutException:
-            print(f"[{url[-30:]}] Timeout waiting for initial content. Checking for '0 results' message...")
+            metrics.add_time("navigation", time.time() - navigation_start)
+            logger.warning("Timeout waiting for initial content. Checking for '0 results' message...")
             try:
                 # Check for the "0 results" element.
                 zero_results_locator = (By.XPATH, "//div[contains(text(), '0 results')]")
                 driver.find_element(*zero_results_locator)
-                print(f"[{url[-30:]}] ✅ Confirmed '0 results' on page. No ads to process.")
+                logger.info("✅ Confirmed '0 results' on page. No ads to process.")
 
                 # If no ads are found, prepare and send a payload to the API to update the count to 0.
                 parsed_url = urlparse(url)
@@ -217,7 +959,7 @@ def scrape_ads(url, driver_path):
                         except NoSuchElementException:
                             continue
                 except Exception as e:
-                    print(f"Could not fetch competitor name from search box for '0 ads' case: {e}")
+                    logger.warning(f"Could not fetch competitor name from search box for '0 ads' case: {e}")
 
                 if competitor_name == "Unknown" and current_page_id:
                     competitor_name = f"Competitor_{current_page_id}"
@@ -231,16 +973,16 @@ def scrape_ads(url, driver_path):
                     "total_ads_processed": 0,
                     "ads_data": {}
                 }
-                
-                api_url = f"{API_BASE_URL}/api/ad-details"
-                send_data_to_api(api_url, payload)
+                metrics.set_status("zero_results")
+                metrics.set("ads_found", 0)
+                metrics.set("ads_processed", 0)
                 
                 # Exit the function since there's nothing more to scrape.
-                return
+                return payload
 
             except NoSuchElementException:
                 # If "0 results" is not found, it was a genuine timeout. Re-raise it.
-                print(f"[{url[-30:]}] ❌ Timeout was not due to '0 results'. This is a genuine error.")
+                logger.error("❌ Timeout was not due to '0 results'. This is a genuine error.")
                 raise
 
         time.sleep(random.uniform(0.5, 1.5))  # Human-like delay
@@ -252,10 +994,9 @@ def scrape_ads(url, driver_path):
         
         # Use page_id or a snippet of the URL for logging prefix
         log_prefix = f"PageID: {current_page_id}" if current_page_id else f"Keyword: {query_params.get('q', ['unknown'])[0]}"
-        print(f"[{log_prefix}] Extracted page_id: {current_page_id}")
+        logger.debug(f"[{log_prefix}] Extracted page_id: {current_page_id}")
 
         
-        print("Extracted page_id:", current_page_id)
 
 
         # Robust selectors (based on stable attributes)
@@ -274,7 +1015,7 @@ def scrape_ads(url, driver_path):
         
         
         competitor_name_for_logging = competitor_name_from_search_box or log_prefix
-        print(f"[{competitor_name_for_logging}] Competitor name from search box: {competitor_name_from_search_box}")
+        logger.debug(f"[{competitor_name_for_logging}] Competitor name from search box: {competitor_name_from_search_box}")
         time.sleep(random.uniform(0.5, 1.5))  # Human-like delay
 
 
@@ -282,9 +1023,9 @@ def scrape_ads(url, driver_path):
         try:
             element = driver.find_element(By.XPATH, "(//div[contains(text(), 'results')])[1]")
             value_text = element.text.strip()
-            print(f"Found count text: {value_text}")
+            logger.debug(f"Found count text: {value_text}")
         except NoSuchElementException:
-            print("Ad count element not found.")
+            logger.warning("Ad count element not found.")
 
         # Parse the number from the string
         if value_text:
@@ -302,9 +1043,9 @@ def scrape_ads(url, driver_path):
                     total_ad_count_of_page = int(number * 1_000_000)
                 else:
                     total_ad_count_of_page = int(number)
-                print(f"Normalized count: {total_ad_count_of_page}")
+                logger.debug(f"Normalized count: {total_ad_count_of_page}")
             else:
-                print("Could not parse ad count text.")
+                logger.warning("Could not parse ad count text.")
                 
         time.sleep(random.uniform(0.5, 1.5))  # Human-like delay
         # The rest of the script from scroll to JSON save and driver.quit will go here, but will use the local driver variable
@@ -312,480 +1053,285 @@ def scrape_ads(url, driver_path):
         # At the end, return nothing (or could return stats if needed)
         # return driver, start_time
 
-        # Target XPaths for end-of-list marker (unchanged)
-
-        target_xpaths = [
-            "/html/body/div[1]/div/div/div/div/div/div/div[1]/div/div/div/div[5]/div[2]/div[9]/div[3]/div[2]/div",
-            "/html/body/div[1]/div/div/div/div/div/div[1]/div/div/div/div[6]/div[2]/div[9]/div[3]/div[2]/div"
-        ]
-
-        print("Starting scroll loop to load all ads...")
-        scroll_count = 0
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        scroll_pause_time = 0.7 # Reduced pause time after scroll
-        max_scroll_attempts_at_bottom = 3 # How many times to scroll after height stops changing, just in case
-        attempts_at_bottom = 0
-
-
-        # scrolling part
-        while attempts_at_bottom < max_scroll_attempts_at_bottom:
-            # Scroll down to bottom
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            scroll_count += 1
-            
-            # --- Optimization: Shorter, dynamic wait ---
-            time.sleep(scroll_pause_time) # Wait briefly for page to load
-
-            print("Hmm, loading...")
-
-            # Calculate new scroll height and compare with last scroll height
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            
-            element_found = False
-            # Let's only check for the end element when the height hasn't changed
-            if new_height == last_height:
-                for xpath in target_xpaths:
-                    try:
-                        # Use a very short wait for the end element check
-                        WebDriverWait(driver, 0.5).until(EC.presence_of_element_located((By.XPATH, xpath)))
-                        print(f"✅ End-of-list element found using XPath: {xpath}")
-                        element_found = True
-                        break
-                    except (NoSuchElementException, TimeoutException):
-                        continue
-
-            if element_found:
-                print(f"✅ End-of-list element found after {scroll_count} scrolls. Stopping scroll.")
-                break
-
-            if new_height == last_height:
-                attempts_at_bottom += 1
-                print(f"Scroll height ({new_height}) hasn't changed. Attempt {attempts_at_bottom}/{max_scroll_attempts_at_bottom} at bottom...")
-            else:
-                attempts_at_bottom = 0 # Reset counter if height changed
-                print(f"Scrolled {scroll_count} time(s). New height: {new_height}")
-
-            last_height = new_height
-
-            # Optional safety break: Prevent infinite loops
-            if scroll_count > 500: # Adjust limit as needed
-                print("⚠️ Reached maximum scroll limit (500). Stopping scroll.")
-                break
-
-            time.sleep(random.uniform(0.5, 1.5))  # Human-like delay
-
-        if not element_found and attempts_at_bottom >= max_scroll_attempts_at_bottom:
-            print("🏁 Reached bottom of page (height stabilized).")
+        # Live extraction while scrolling: network capture or incremental DOM extraction
+        if EXTRACTION_MODE == "network":
+            extractor = NetworkAdCollector()
+            extractor.collect_initial(driver.page_source)
+        elif INCREMENTAL_EXTRACTION or PRUNE_EXTRACTED_ADS:
+            extractor = IncrementalExtractor(prune=PRUNE_EXTRACTED_ADS)
+        else:
+            extractor = None
+        scroll_failed = False
+        scroll_start = time.time()
+        try:
+            controller = ScrollController(SCROLL_LOAD_TIMEOUT, SCROLL_SETTLE_MS, SCROLL_JITTER_MIN, SCROLL_JITTER_MAX) \
+                if SCROLL_MODE == "event" else None
+            # The newest ads can be anywhere on the page, so only a page-order cap stops scrolling early
+            targets = [total_ad_count_of_page if SCROLL_STOP_AT_TOTAL else 0,
+                       MAX_ADS_PER_PAGE if MAX_ADS_ORDER != "newest" else 0]
+            target_ads = min((target for target in targets if target), default=None)
+            # Pruned cards leave the DOM, so count what the extractor has collected
+            count_loaded = (lambda _: extractor.total_child_ads_found) if extractor else count_ad_cards
+            scroll_count = scroll_page(driver, on_scroll=extractor.collect if extractor else None, controller=controller,
+                                       target_ads=target_ads, count_loaded=count_loaded)
+            metrics.set("scroll_count", scroll_count)
+        except WebDriverException as e:
+            # Keep whatever was extracted before the page died
+            if not (extractor and extractor.ads_data):
+                raise
+            logger.warning(f"[{competitor_name_for_logging}] ⚠️ Browser failed while scrolling ({type(e).__name__}). "
+                           f"Keeping the {len(extractor.ads_data)} ads extracted so far.")
+            scroll_failed = True
+            driver_failed = True
 
         scroll_time = time.time()
-        print(f"Scrolling finished in {scroll_time - start_time:.2f} seconds.")
+        metrics.add_time("scroll", scroll_time - scroll_start)
+        logger.info(f"Scrolling finished in {scroll_time - start_time:.2f} seconds.")
 
-        print("Waiting briefly for final elements to render...")
-        time.sleep(1) # Short pause just in case rendering is slightly delayed
+        if scroll_failed:
+            ads_data, total_child_ads_found = extractor.ads_data, extractor.total_child_ads_found
+        else:
+            logger.debug("Waiting briefly for final elements to render...")
+            time.sleep(1) # Short pause just in case rendering is slightly delayed
 
-        # Count divs with the first class (unchanged selector logic)
-        target_class_1 = "x6s0dn4 x78zum5 xdt5ytf xl56j7k x1n2onr6 x1ja2u2z x19gl646 xbumo9q"
-        try:
-            divs_1 = driver.find_elements(By.CSS_SELECTOR, f'div[class="{target_class_1}"]')
-            print(f"Total <div> elements with target class 1: {len(divs_1)}")
-        except Exception as e:
-            print(f"Error finding elements with target class 1: {e}")
-            divs_1 = []
+            if extractor:
+                # Final sweep for the cards rendered after the last scroll
+                try:
+                    extractor.collect(driver)
+                except WebDriverException as e:
+                    logger.warning(f"[{competitor_name_for_logging}] ⚠️ Final extraction sweep failed ({type(e).__name__}). "
+                                   f"Keeping the {len(extractor.ads_data)} ads extracted so far.")
+                ads_data, total_child_ads_found = extractor.ads_data, extractor.total_child_ads_found
+            elif EXTRACTION_MODE == "js":
+                logger.info(f"[{competitor_name_for_logging}] Extracting ads in-browser (batch size {JS_EXTRACT_BATCH_SIZE})...")
+                ads_data, total_child_ads_found = extract_ads_js(driver, JS_EXTRACT_BATCH_SIZE)
+            elif EXTRACTION_MODE == "snapshot":
+                page_source = driver.page_source
+                logger.info(f"[{competitor_name_for_logging}] Captured page snapshot ({len(page_source) / 1_000_000:.1f} MB). Releasing browser...")
+                # The browser is no longer needed - free it before the (CPU heavy) parse
+                pool.release(driver)
+                driver = None
+                ads_data, total_child_ads_found = get_snapshot_pool().submit(parse_snapshot, page_source).result()
+                del page_source
+            else:
+                ads_data, total_child_ads_found = extract_ads_dom(driver, metrics)
 
-        # Count divs with the second class (unchanged selector logic)
-        # target_class_2 = "xrvj5dj x18m771g x1p5oq8j xbxaen2 x18d9i69 x1u72gb5 xtqikln x1na6gtj x1jr1mh3 xm39877 x7sq92a xxy4fzi"
-        target_class_2 = "xrvj5dj x18m771g x1p5oq8j xp48ta0 x18d9i69 xtssl2i xtqikln x1na6gtj x1jr1mh3 x15h0gye x7sq92a xlxr9qa"
-        try:
-            divs_2 = driver.find_elements(By.CSS_SELECTOR, f'div[class="{target_class_2}"]')
-            print(f"Total <div> elements (ad groups) with target class 2: {len(divs_2)}")
-        except Exception as e:
-            print(f"Error finding elements with target class 2: {e}")
-            divs_2 = []
+        # Hand the browser back before writing files and uploading
+        if driver:
+            pool.release(driver, failed=driver_failed)
+            driver = None
 
+        processing_time = time.time()
+        metrics.add_time("extraction", processing_time - scroll_time)
+        metrics.set("expected_ads", total_ad_count_of_page)
+        metrics.set("ads_found", total_child_ads_found)
+        if MAX_ADS_PER_PAGE and len(ads_data) > MAX_ADS_PER_PAGE:
+            logger.info(f"Keeping {MAX_ADS_PER_PAGE} of {len(ads_data)} ads ({MAX_ADS_ORDER} order).")
+            ads_data = limit_ads(ads_data, MAX_ADS_PER_PAGE, newest=MAX_ADS_ORDER == "newest")
+        metrics.set("ads_processed", len(ads_data))
+        metrics.set_status("partial" if scroll_failed else "scraped")
+        logger.info(f"Data extraction finished in {processing_time - scroll_time:.2f} seconds.")
 
-        # Dictionary to store all ads data (unchanged)
-        ads_data = {}
+        # Construct the final output using the REAL scraped variables
+        final_output = {
+            "competitor_name": competitor_name_from_search_box,
+            "no_of_ads": total_ad_count_of_page,
+            "page_id": current_page_id,
+            "total_ads_found": total_child_ads_found,
+            "total_ads_processed": len(ads_data), # The count of successfully processed ads
+            "ads_data": ads_data,                 # The REAL dictionary of scraped ads
+            "page_link": url,
+        }
+        # [END OF YOUR SCRAPING LOGIC]
+        return final_output
 
-        # For each target_class_2 div, count xh8yej3 children and process them (unchanged logic, potential speedup from faster page load/scrolling)
-        print("\nProcessing ads...")
-        total_processed = 0
-        total_child_ads_found = 0
+    except Exception as e:
+        # --- FIX #3: Catch All Other Errors ---
+        # This will catch timeouts, crashes, or any other Python error in the thread.
+        logger.exception(f"FATAL ERROR while processing URL: {url} ({type(e).__name__}: {e})")
+        driver_failed = True
+        metrics.set_status("failed")
+        return None
 
-        # --- Optimization: Process elements already found, minimize waits inside loop ---
-        for i, div in enumerate(divs_2, 1):
-            print("in loop")
-            try:
-                child_divs = div.find_elements(By.XPATH, './div[contains(@class, "xh8yej3")]')
-                num_children = len(child_divs)
-                print('num_children', num_children)
-                total_child_ads_found += num_children
-
-                # Process each xh8yej3 child
-                for j, child_div in enumerate(child_divs, 1):
-                    current_ad_id_for_logging = f"Group {i}, Ad {j}"
-                    library_id = None # Initialize library_id for potential error logging
-                    try:
-                        main_container = child_div.find_element(By.XPATH, './/div[contains(@class, "x78zum5 xdt5ytf x2lwn1j xeuugli")]')
+    finally:
+        metrics.add_time("total", time.time() - start_time)
+        # --- FIX #1: Guaranteed Cleanup ---
+        # This block will run ALWAYS, even if the 'try' block crashes.
+        if driver:
+            logger.debug(f"[CLEANUP] Releasing browser for {competitor_name_for_logging}.")
+            pool.release(driver, failed=driver_failed)
+        reset_page(log_token)
 
-                        # Extract Library ID
-                        library_id_element = main_container.find_element(By.XPATH, './/div[contains(@class, "x1rg5ohu x67bb7w")]/span[contains(text(), "Library ID:")]')
-                        library_id = library_id_element.text.replace("Library ID: ", "").strip()
-                        current_ad_id_for_logging = library_id # Update logging ID once found
 
-                        # if library_id in ads_data:
-                        #     # print(f"Skipping duplicate Library ID: {library_id}")
-                        #     continue
+def get_ad_index():
+    """Returns the shared index of uploaded ads used for delta uploads."""
+    global _ad_index
+    with _ad_index_lock:
+        if _ad_index is None:
+            _ad_index = AdIndex(AD_INDEX_PATH)
+        return _ad_index
 
-                        # Initialize ad data with library_id
-                        ad_data = {"library_id": library_id}
 
-                        # Extract started_running, total_active_time
-                        try:
-                            started_running_element = main_container.find_element(By.XPATH, './/span[contains(text(), "Started running on")]')
-                            full_text = started_running_element.text.strip()
-                            
-                            # Extract the started running date
-                            started_running_match = re.search(r'Started running on (.*?)(?:·|$)', full_text)
-                            if started_running_match:
-                                started_running_text = started_running_match.group(1).strip()
-                                # Try parsing with comma first, then without if that fails
-                                try:
-                                    started_running_date = datetime.strptime(started_running_text, "%b %d, %Y").strftime("%Y-%m-%d")
-                                except ValueError:
-                                    started_running_date = datetime.strptime(started_running_text, "%d %b %Y").strftime("%Y-%m-%d")
-                                ad_data["started_running"] = started_running_date
-                            else:
-                                ad_data["started_running"] = None
-                            
-                            # Extract the total active time if present
-                            active_time_match = re.search(r'Total active time\s+(.+?)(?:$|\s*·)', full_text)
-                            if active_time_match:
-                                active_time = active_time_match.group(1).strip()
-                                ad_data["total_active_time"] = active_time
-                            else:
-                                ad_data["total_active_time"] = None
-                                
-                        except NoSuchElementException:
-                            # print(f"Started running date not found for ad {current_ad_id_for_logging}")
-                            ad_data["started_running"] = None
-                            ad_data["total_active_time"] = None
-                        except Exception as e:
-                            print(f"⚠️ Error parsing started running date for ad {current_ad_id_for_logging}: {str(e)}")
-                            ad_data["started_running"] = None
-                            ad_data["total_active_time"] = None
-
-                        # Extract Platforms icons
-                        platforms_data = []
-                        try:
-                            platforms_div = main_container.find_element(By.XPATH, './/span[contains(text(), "Platforms")]/following-sibling::div[1]') # Use [1] for immediate sibling
-                            platform_icons = platforms_div.find_elements(By.XPATH, './/div[contains(@class, "xtwfq29")]')
+def upload_page_delta(final_output):
+    """
+    Sends only the new and changed ads of a page, plus the ads no longer shown
+    (`inactive_library_ids`). The index is updated once the API accepted the upload.
+    """
+    competitor_name_for_logging = final_output["competitor_name"] or final_output["page_link"]
+    ads_data = final_output["ads_data"]
+    page_key = final_output["page_id"] or final_output["page_link"]
+    index = get_ad_index()
+
+    new_ids, changed_ids, gone_ids = index.diff(page_key, ads_data)
+    # A partial scrape must not mark the ads it missed as inactive
+    expected = final_output["no_of_ads"]
+    if gone_ids and MAX_ADS_PER_PAGE and len(ads_data) >= MAX_ADS_PER_PAGE:
+        logger.info(f"[{competitor_name_for_logging}] Page capped at {MAX_ADS_PER_PAGE} ads; "
+                    f"not marking {len(gone_ids)} missing ads inactive.")
+        gone_ids = []
+    elif gone_ids and expected and len(ads_data) < expected * DELTA_MIN_COVERAGE:
+        logger.warning(f"[{competitor_name_for_logging}] Scrape covered {len(ads_data)}/{expected} ads; "
+                       f"not marking {len(gone_ids)} missing ads inactive.")
+        gone_ids = []
+
+    logger.info(f"[{competitor_name_for_logging}] Delta: {len(new_ids)} new, {len(changed_ids)} changed, "
+                f"{len(gone_ids)} no longer active, {len(ads_data) - len(new_ids) - len(changed_ids)} unchanged.")
+    if not (new_ids or changed_ids or gone_ids) and not is_zero_results_page(final_output):
+        index.commit(page_key, ads_data)  # refresh last_seen
+        return True
 
-                            for icon in platform_icons:
-                                try:
-                                    style = icon.get_attribute("style")
-                                    if not style: continue # Skip if no style attribute
-                                    mask_image_match = re.search(r'mask-image: url\("([^"]+)"\)', style)
-                                    mask_pos_match = re.search(r'mask-position: ([^;]+)', style)
-                                    mask_image = mask_image_match.group(1) if mask_image_match else None
-                                    mask_position = mask_pos_match.group(1).strip() if mask_pos_match else None # Added strip()
-
-                                    # Identify platform name
-                                    platform_name = PLATFORM_MAPPING.get((mask_image, mask_position)) # More direct lookup
-
-                                    # platforms_data.append({
-                                    #     # "style": style, # Usually not needed in final data
-                                    #     "mask_image": mask_image,
-                                    #     "mask_position": mask_position,
-                                    #     "platform_name": platform_name if platform_name else "Unknown"
-                                    # })
-                                    platforms_data.append(
-                                        # "style": style, # Usually not needed in final data
-                                        platform_name 
-                                    )
-                                except Exception as e:
-                                    # print(f"Could not process a platform icon for ad {current_ad_id_for_logging}: {str(e)}")
-                                    continue
-                        except NoSuchElementException:
-                            # print(f"Platforms section not found for ad {current_ad_id_for_logging}")
-                            pass # okay if this section is missing
-                        except Exception as e:
-                            print(f"Error extracting platforms for ad {current_ad_id_for_logging}: {str(e)}")
+    delta_payload = {
+        **final_output,
+        "ads_data": {library_id: ads_data[library_id] for library_id in new_ids + changed_ids},
+        "inactive_library_ids": gone_ids,
+    }
+    full_api_url = f"{API_BASE_URL}/api/ad-details"
+    if send_data_to_api(full_api_url, delta_payload):
+        index.commit(page_key, ads_data, gone_ids)
+        return True
+    return False
 
-                        ad_data["platforms"] = platforms_data
 
-                        # Extract Categories icon
-                        category_data = []
-                        try:
-                            # Find the Categories span first
-                            categories_span = main_container.find_element(By.XPATH, './/span[contains(text(), "Categories")]')
-                            
-                            # Find all sibling divs with class x1rg5ohu x67bb7w that come after the Categories span
-                            category_divs = categories_span.find_elements(By.XPATH, './following-sibling::div[contains(@class, "x1rg5ohu") and contains(@class, "x67bb7w")]')
-                            
-                            for category_div in category_divs:
-                                try:
-                                    # Find the icon div within each category div
-                                    icon_div = category_div.find_element(By.XPATH, './/div[contains(@class, "xtwfq29")]')
-                                    style = icon_div.get_attribute("style")
-                                    
-                                    if style:
-                                        mask_image_match = re.search(r'mask-image: url\("([^"]+)"\)', style)
-                                        mask_pos_match = re.search(r'mask-position: ([^;]+)', style)
-                                        mask_image = mask_image_match.group(1) if mask_image_match else None
-                                        mask_position = mask_pos_match.group(1).strip() if mask_pos_match else None
-                                        
-                                        # Identify category name from mapping
-                                        category_name = CATEGORY_MAPPING.get((mask_image, mask_position), "Unknown")
-                                        
-                                        # category_data.append({
-                                        #     "mask_image": mask_image,
-                                        #     "mask_position": mask_position,
-                                        #     "category_name": category_name
-                                        # })
-                                        category_data.append(
-                                            category_name
-                                        )
-                                except Exception as e:
-                                    print(f"Could not process a category icon: {str(e)}")
-                                    continue
-                                    
-                        except NoSuchElementException:
-                            pass  # No categories section found
-                        except Exception as e:
-                            print(f"Error extracting categories: {str(e)}")
+def is_zero_results_page(final_output):
+    """True for the payload of a page that shows '0 results'."""
+    return final_output["no_of_ads"] == 0 and final_output["total_ads_found"] == 0 and not final_output["ads_data"]
 
-                        ad_data["categories"] = category_data
-                        
-                        # Extract Ads count
-                        try:
-                            # Adjusted XPath to be more specific to the 'N ads use this creative and text.' structure
-                            ads_count_element = main_container.find_element(By.XPATH, './/div[contains(@class, "x6s0dn4 x78zum5 xsag5q8")]//strong')
-                            ads_count = ads_count_element.text.strip() # Should just be the number
-                            number_match = re.search(r'(\d+)', ads_count)
-                            if number_match:
-                                ads_count = number_match.group(1)  # This will be just "4"
-                            else:
-                                ads_count = None
-                                
-                            ad_data["ads_count"] = ads_count
 
-                        except NoSuchElementException:
-                            ad_data["ads_count"] = None
-                        except Exception as e:
-                            print(f"Error extracting ads count for ad {current_ad_id_for_logging}: {str(e)}")
-                            ad_data["ads_count"] = None
+def save_page_results(final_output):
+    """
+    Writes the page payload to ad_data_<page_id>.json (or .ndjson.gz) and appends
+    it to the run archive. Returns the file name, or None.
+    """
+    if is_zero_results_page(final_output):
+        return None
+    competitor_name_for_logging = final_output["competitor_name"] or final_output["page_link"]
 
-                        # Add to main dictionary with library_id as key
-                        ads_data[library_id] = ad_data
-                        total_processed += 1
+    # --- FIX #2: Unique JSON Filename ---
+    # Use the page ID or a timestamp to create a unique filename
+    output_id = final_output["page_id"] if final_output["page_id"] else f"keyword_{int(time.time())}"
+    output_file = f"ad_data_{output_id}{NDJSON_SUFFIX if OUTPUT_FORMAT == 'ndjson' else '.json'}"
 
-                        # Extract Ad Text Content
-                        try:
-                            # Find the parent div containing the text first, more reliable
-                            ad_text_container = child_div.find_element(By.XPATH, './/div[@data-ad-preview="message" or contains(@style, "white-space: pre-wrap")]')
-                            # Get all text within, handles cases with multiple spans or line breaks better
-                            ad_data["ad_text"] = ad_text_container.text.strip()
-                        except NoSuchElementException:
-                            # print(f"Ad text not found for ad {current_ad_id_for_logging}")
-                            ad_data["ad_text"] = None
-                        except Exception as e:
-                            print(f"Error extracting ad text for ad {current_ad_id_for_logging}: {str(e)}")
-                            ad_data["ad_text"] = None
+    try:
+        with scrape_metrics.page(final_output["page_link"]).timer("write"):
+            if OUTPUT_FORMAT == "ndjson":
+                write_page(output_file, final_output)
+            else:
+                with open(output_file, "w", encoding='utf-8') as f:
+                    json.dump(final_output, f, indent=4, ensure_ascii=False)
+            if _run_archive is not None:
+                _run_archive.append(final_output)
+        logger.info(f"[{competitor_name_for_logging}] Successfully processed data for {len(final_output['ads_data'])} unique ads.")
+        logger.info(f"[{competitor_name_for_logging}] Data saved to {output_file}")
+        return output_file
+    except Exception as e:
+        logger.error(f"[{competitor_name_for_logging}] ⚠️ Error saving data to JSON file: {e}")
+        return None
 
-                        # extract media
-                        try:
-                            # First find the xh8yej3 div inside child_div if we're not already looking at it
-                            # xh8yej3_div = child_div
-                            # if "xh8yej3" not in child_div.get_attribute("class"):
-                            
-                            # Try to find the link container first as it often contains both media and CTA
-                            link_container = child_div.find_element(By.XPATH, './/a[contains(@class, "x1hl2dhg") and contains(@class, "x1lku1pv")]')
-                            
-                            # Extract and store the link URL
-                            link_url = link_container.get_attribute('href')
-                            decoded_url = unquote(link_url)
-                            
-                            # Parse the URL to get the 'u' parameter value
-                            parsed_url = urlparse(decoded_url)
-                            query_params = parsed_url.query
-                            if 'u=' in query_params:
-                                # Get the full URL from the u parameter (properly decoded)
-                                actual_url = unquote(query_params.split('u=')[1].split('&')[0])
-                            else:
-                                # Try another method if u= isn't in the query params
-                                actual_url = unquote(decoded_url.split('u=')[1].split('&')[0]) if 'u=' in decoded_url else decoded_url
-                            
-                            ad_data["destination_url"] = actual_url if actual_url else None
-
-                            # Extract media from this link container
-                            ad_data["media_type"] = None
-                            ad_data["media_url"] = None
-                            ad_data["thumbnail_url"] = None
-                            
-                            # Check for video within the link container
-                            try:
-                                video_element = child_div.find_element(By.XPATH, './/video')
-                                media_url = video_element.get_attribute('src')
-                                if media_url: # Ensure src is not empty
-                                    ad_data["media_type"] = "video"
-                                    ad_data["media_url"] = media_url
-                                poster_url = video_element.get_attribute('poster')
-                                if poster_url:
-                                    ad_data["thumbnail_url"] = poster_url
-                            except NoSuchElementException:
-                                # If no video, try image with more specific targeting
-                                try:
-                                    img_element = link_container.find_element(By.XPATH, './/img[contains(@class, "x168nmei") or contains(@class, "_8nqq")]')
-                                    media_url = img_element.get_attribute('src')
-                                    if media_url:
-                                        ad_data["media_type"] = "image"
-                                        ad_data["media_url"] = media_url
-                                except NoSuchElementException:
-                                    # Fallback to any image within the link container
-                                    try:
-                                        img_element = link_container.find_element(By.XPATH, './/img')
-                                        media_url = img_element.get_attribute('src')
-                                        if media_url:
-                                            ad_data["media_type"] = "image"
-                                            ad_data["media_url"] = media_url
-                                    except NoSuchElementException:
-                                        pass  # No media found
-                            
-                        except Exception as e:
-                            print(f"Error extracting media or CTA for ad {current_ad_id_for_logging}: {str(e)}")
-                            # Initialize with None if not already set
-                            if "media_type" not in ad_data:
-                                ad_data["media_type"] = None
-                            if "media_url" not in ad_data:
-                                ad_data["media_url"] = None
-                            if "thumbnail_url" not in ad_data:
-                                ad_data["thumbnail_url"] = None
-
-                        except Exception as e:
-                            print(f"Error extracting media for ad {current_ad_id_for_logging}: {str(e)}")
 
-                        try:
-                            # ① container that wraps headline + CTA area
-                            cta_container = child_div.find_element(
-                                By.XPATH,
-                                './/div[contains(@class, "x6s0dn4 x2izyaf x78zum5 x1qughib '
-                                'x15mokao x1ga7v0g xde0f50 x15x8krk xexx8yu xf159sx xwib8y2 xmzvs34")]'
-                            )
+def upload_page_results(final_output):
+    """
+    Sends the page payload to the API (pages showing '0 results' are sent to reset their count).
+    Returns False if the upload failed.
+    """
+    competitor_name_for_logging = final_output["competitor_name"] or final_output["page_link"]
+
+    # --- API Submission ---
+    AD_DETAILS_ENDPOINT = "/api/ad-details"
+    full_api_url = f"{API_BASE_URL}{AD_DETAILS_ENDPOINT}"
+    if DELTA_UPLOAD:
+        return upload_page_delta(final_output)
+    elif final_output.get("ads_data") or is_zero_results_page(final_output):
+        return send_data_to_api(full_api_url, final_output)
+    else:
+        logger.info(f"[{competitor_name_for_logging}] No ad data to send to the API.")
+        return True
 
-                            # ② sub‑container that holds headline + legal copy
-                            head_line_container = cta_container.find_element(
-                                By.XPATH,
-                                './/div[contains(@class, "x1iyjqo2 x2fvf9 x6ikm8r x10wlt62 xt0b8zv")]'
-                            )
 
-                            # ③ CTA button div
-                            cta_div = cta_container.find_element(
-                                By.XPATH,
-                                './/div[contains(@class, "x2lah0s")]'
-                            )
+def save_and_record(final_output, journal=None):
+    """save_page_results() that also checkpoints the page in the run journal."""
+    with page_context(page_label(final_output["page_link"])):
+        if _media_prefetcher is not None:
+            # Start the downloads before the signed URLs expire
+            _media_prefetcher.submit_page(final_output)
+        output_file = save_page_results(final_output)
+    if journal is not None:
+        journal.mark_scraped(final_output, output_file)
+    return output_file
 
-                            # -- CTA TEXT (existing)
-                            cta_text_element = cta_div.find_element(
-                                By.XPATH,
-                                './/div[contains(@class, "x8t9es0 x1fvot60 xxio538 x1heor9g '
-                                'xuxw1ft x6ikm8r x10wlt62 xlyipyv x1h4wwuj x1pd3egz xeuugli")]'
-                            )
-                            ad_data["cta_button_text"] = cta_text_element.text.strip()
 
-                            # -- HEADLINE TEXT (NEW) -----------------------------------------------
-                            try:
-                                headline_element = head_line_container.find_element(
-                                    By.XPATH,
-                                    './/div[contains(@class, "x6ikm8r x10wlt62 xlyipyv x1mcwxda")]'
-                                )
-                                ad_data["headline_text"] = headline_element.text.strip()
-                            except NoSuchElementException:
-                                ad_data["headline_text"] = None
-                            # ----------------------------------------------------------------------
+def upload_and_record(final_output, journal=None):
+    """upload_page_results() that also marks the page as uploaded in the run journal."""
+    with page_context(page_label(final_output["page_link"])):
+        uploaded = upload_page_results(final_output)
+    if uploaded and journal is not None:
+        journal.mark_uploaded(final_output["page_link"])
+    return uploaded
 
-                        except NoSuchElementException:
-                            # No CTA container found ⇒ keep previous behaviour
-                            ad_data["cta_button_text"] = None
-                            ad_data["headline_text"] = None
-                        except Exception as e:
-                            print(f"Error extracting CTA or headline text for ad {current_ad_id_for_logging}: {str(e)}")
-                            ad_data["cta_button_text"] = None
-                            ad_data["headline_text"] = None
-                        # Add to main dictionary with library_id as key
-                        ads_data[library_id] = ad_data
-                        total_processed += 1
-                        # Reduce console noise: print progress periodically instead of every ad
-                        if total_processed % 50 == 0:
-                            print(f"Processed {total_processed}/{total_child_ads_found} ads...")
-
-                    except NoSuchElementException as e:
-                        # This might happen if the structure is unexpected, often failure to find library ID
-                        print(f"Critical element missing for ad {current_ad_id_for_logging}, skipping. Error: {e.msg}")
-                        continue # Skip this child_div entirely if critical info (like ID) is missing
-                    except Exception as e:
-                        print(f"Unexpected error processing ad {current_ad_id_for_logging}: {str(e)}")
-                        continue # Skip this child_div on unexpected errors
 
-            except Exception as e:
-                print(f"Error finding or processing xh8yej3 children for div group {i}: {str(e)}")
-                continue
+def resume_uploads(urls, journal):
+    """
+    Re-uploads the pages a previous attempt of this run scraped but didn't upload.
+    Pages whose saved payload can't be read are sent back to be scraped again.
+    """
+    for url in journal.urls_in_state(urls, SCRAPED):
+        final_output = journal.load_payload(url)
+        if final_output is None:
+            logger.warning(f"[RESUME] Saved data for {url} is missing; it will be scraped again.")
+            journal.reset(url)
+            continue
+        logger.info(f"[RESUME] Re-uploading {len(final_output['ads_data'])} saved ads for {url}")
+        upload_and_record(final_output, journal)
 
-        processing_time = time.time()
-        print(f"\nData extraction finished in {processing_time - scroll_time:.2f} seconds.")
 
-        # Construct the final output using the REAL scraped variables
-        final_output = {
-            "competitor_name": competitor_name_from_search_box,
-            "no_of_ads": total_ad_count_of_page,
-            "page_id": current_page_id,
-            "total_ads_found": total_child_ads_found,
-            "total_ads_processed": len(ads_data), # The count of successfully processed ads
-            "ads_data": ads_data,                 # The REAL dictionary of scraped ads
-            "page_link": url,
-        }
-        # [END OF YOUR SCRAPING LOGIC]
+def finish_page(final_output, journal=None):
+    """Saves a scraped page to JSON and sends it to the API."""
+    save_and_record(final_output, journal)
+    upload_and_record(final_output, journal)
 
-        # --- FIX #2: Unique JSON Filename ---
-        # Use the page ID or a timestamp to create a unique filename
-        output_id = current_page_id if current_page_id else f"keyword_{int(time.time())}"
-        output_file = f"ad_data_{output_id}.json"
-        
-        try:
-            with open(output_file, "w", encoding='utf-8') as f:
-                json.dump(final_output, f, indent=4, ensure_ascii=False)
-            print(f"[{competitor_name_for_logging}] Successfully processed data for {len(final_output['ads_data'])} unique ads.")
-            print(f"[{competitor_name_for_logging}] Data saved to {output_file}")
-        except Exception as e:
-            print(f"[{competitor_name_for_logging}] ⚠️ Error saving data to JSON file: {e}")
 
-        # --- API Submission ---
-        AD_DETAILS_ENDPOINT = "/api/ad-details"
-        full_api_url = f"{API_BASE_URL}{AD_DETAILS_ENDPOINT}"
-        if final_output.get("ads_data"):
-            send_data_to_api(full_api_url, final_output)
-        else:
-            print(f"[{competitor_name_for_logging}] No ad data to send to the API.")
+def scrape_ads(url, driver_path=None, pool=None, journal=None, scrape=None):
+    """
+    Scrapes all ads of one Ad Library URL, saves them to JSON and sends them to the API.
+    Browsers come from `pool`; without one, a single-use pool is created from `driver_path`.
+    `scrape(url)` replaces the in-process scrape_page (e.g. an IsolatedScraper).
+    Progress is checkpointed in `journal` when given.
+    """
+    owns_pool = pool is None and scrape is None
+    if owns_pool:
+        pool = BrowserPool(driver_path, max_size=1, capture_network=EXTRACTION_MODE == "network",
+                           blocked_urls=blocked_url_patterns(BLOCK_RESOURCES, BLOCKED_URL_PATTERNS))
+    start_time = time.time()
+    try:
+        final_output = scrape(url) if scrape is not None else scrape_page(url, pool)
+        if final_output is None:
+            return
+        finish_page(final_output, journal)
 
         total_time = time.time()
-        print(f"[COMPLETE] Total script execution time for {competitor_name_for_logging}: {total_time - start_time:.2f} seconds.")
-
-    except Exception as e:
-        # --- FIX #3: Catch All Other Errors ---
-        # This will catch timeouts, crashes, or any other Python error in the thread.
-        print(f"\n" + "="*60)
-        print(f"FATAL ERROR while processing URL: {url}")
-        print(f"Error Type: {type(e).__name__}")
-        print(f"Error Details: {e}")
-        import traceback
-        traceback.print_exc()
-        print("="*60 + "\n")
-
+        logger.info(f"[COMPLETE] Total script execution time for {final_output['competitor_name'] or url}: {total_time - start_time:.2f} seconds.")
     finally:
-        # --- FIX #1: Guaranteed Cleanup ---
-        # This block will run ALWAYS, even if the 'try' block crashes.
-        if driver:
-            print(f"[CLEANUP] Quitting browser for {competitor_name_for_logging}.")
-            driver.quit()
+        if owns_pool:
+            pool.close()
 
 
 def fetch_competitors_urls(api_url=f'{API_BASE_URL}/api/get_competitors_url_git'):
@@ -793,12 +1339,12 @@ def fetch_competitors_urls(api_url=f'{API_BASE_URL}/api/get_competitors_url_git'
     Fetches the list of competitor URLs from the API
     """
     try:
-        response = requests.get(api_url, timeout=30)
+        response = api_client.get(api_url, timeout=30)
         response.raise_for_status()
         data = response.json()
         return [item['page_link'] for item in data] if data else []
     except Exception as e:
-        print(f"Error fetching competitor URLs: {e}")
+        logger.error(f"Error fetching competitor URLs: {e}")
         return []
 
 def process_urls_in_parallel(urls):
@@ -817,59 +1363,111 @@ def split_list_into_two(lst):
     mid = (len(lst) + 1) // 2
     return lst[:mid], lst[mid:]
 
-def run_parallel_scraping():
+def run_parallel_scraping(shard_index=SHARD_INDEX, shard_count=SHARD_COUNT, skip_cleanup=SKIP_CLEANUP):
     """
     Fetches competitor URLs and runs the scraping process in a controlled parallel manner.
 
     This function is designed to be robust for CI/CD environments like GitHub Actions.
     It performs the following steps:
-    1. Fetches the list of URLs to be scraped from the API.
+    1. Fetches the list of URLs to be scraped from the API and keeps this runner's
+       shard of them (`shard_index` of `shard_count`, see sharding.py).
     2. Performs a pre-emptive cleanup of today's data to prevent duplicates.
        - If cleanup fails, the script will exit with an error status.
+       - With several shards the cleanup must have run in a `--cleanup-only` job
+         before them: without `skip_cleanup` the shard refuses to start.
     3. Uses a ThreadPoolExecutor to run the `scrape_ads` function for multiple URLs
        concurrently, significantly speeding up the total execution time.
     4. The number of concurrent browsers is configurable via an environment variable.
     """
+    if shard_count > 1 and not (skip_cleanup or DELTA_UPLOAD):
+        logger.critical(f"FATAL: Shard {shard_index} of {shard_count} would race the other shards' uploads with "
+                        f"its cleanup. Run the cleanup once with --cleanup-only before the shards and start "
+                        f"them with SKIP_CLEANUP=1 / --skip-cleanup.")
+        sys.exit(1)
+
     # --- Step 1: Fetch URLs to Process ---
-    print("\n" + "="*50)
-    print("--- Step 1: Fetching Competitor URLs from API ---")
-    print("="*50)
+    logger.info("--- Step 1: Fetching Competitor URLs from API ---")
     
     urls = fetch_competitors_urls()
     
     if not urls:
-        print("No URLs found to process. Exiting gracefully.")
+        logger.info("No URLs found to process. Exiting gracefully.")
         return
     # urls = ["https://www.facebook.com/ads/library/?active_status=all&ad_type=all&country=US&view_all_page_id=358831854864382&search_type=page&media_type=all"]
-    print(f"Successfully fetched {len(urls)} URLs to process.")
+    logger.info(f"Successfully fetched {len(urls)} URLs to process.")
+
+    global _run_archive, _media_prefetcher
+    history = ScrapeHistory(SCRAPE_HISTORY_PATH)
+    journal_path = RUN_JOURNAL_PATH
+    archive_path = RUN_ARCHIVE_PATH
+    if shard_count > 1:
+        urls = shard_urls(urls, shard_index, shard_count, history.expected_ads, balance=SHARD_BALANCE)
+        logger.info(f"Shard {shard_index + 1}/{shard_count}: {len(urls)} URLs "
+                    f"(~{sum(history.expected_ads(url) or 0 for url in urls)} ads by history).")
+        root, ext = os.path.splitext(RUN_JOURNAL_PATH)
+        journal_path = f"{root}_shard{shard_index}of{shard_count}{ext}"
+        archive_path = RUN_ARCHIVE_PATH.replace(NDJSON_SUFFIX, f"_shard{shard_index}of{shard_count}{NDJSON_SUFFIX}")
+        if not urls:
+            logger.info("No URLs in this shard. Exiting gracefully.")
+            return
+
+    if RUN_ARCHIVE:
+        _run_archive = RunArchive(archive_path)
+        logger.info(f"Appending all pages to the run archive {archive_path}")
+    if MEDIA_PREFETCH:
+        _media_prefetcher = MediaPrefetcher(MediaStore(MEDIA_STORE_DIR), MEDIA_PREFETCH_WORKERS, MEDIA_PREFETCH_MAX_MBPS)
+        logger.info(f"Prefetching videos into {MEDIA_STORE_DIR} ({MEDIA_PREFETCH_WORKERS} threads, "
+                    f"max {MEDIA_PREFETCH_MAX_MBPS:g} Mbit/s).")
+
+    journal = None
+    if RUN_JOURNAL:
+        journal = RunJournal(journal_path)
+        if journal.resumed:
+            logger.warning(f"[RESUME] Resuming the run recorded in {journal_path}: uploaded URLs are skipped and "
+                           f"the cleanup is not repeated if it already ran. For a fresh run, delete {journal_path} "
+                           f"or set RUN_JOURNAL=0.")
+        journal.start(urls)
+        logger.info(f"Run journal: {journal_path} ({journal.summary(urls)})")
 
     # --- Step 2: Pre-emptive Data Cleanup ---
-    print("\n" + "="*50)
-    print("--- Step 2: Cleaning up previous data for today ---")
-    print("="*50)
-
-    if not cleanup_existing_data():
-        print("\nFATAL: Cleanup of existing data failed. Aborting the script to prevent data duplication.")
+    logger.info("--- Step 2: Cleaning up previous data for today ---")
+
+    if DELTA_UPLOAD:
+        logger.info(f"Delta uploads enabled (index: {AD_INDEX_PATH}). Skipping the delete-and-reimport cleanup.")
+    elif skip_cleanup:
+        logger.info("Cleanup skipped (SKIP_CLEANUP / --skip-cleanup); it is expected to have run before this job.")
+    elif journal is not None and journal.cleanup_done:
+        logger.info("Cleanup already ran earlier in this run (see run journal). Skipping it on resume.")
+    elif not cleanup_existing_data():
+        logger.critical("FATAL: Cleanup of existing data failed. Aborting the script to prevent data duplication.")
         # Exit with a non-zero status code to signal an error in CI/CD pipelines
         sys.exit(1)
-    
-    print("Cleanup successful. Proceeding to scrape new data.")
+    else:
+        if journal is not None:
+            journal.record_cleanup()
+        logger.info("Cleanup successful. Proceeding to scrape new data.")
+
+    if journal is not None:
+        # Finish what a previous attempt of this run left half done
+        resume_uploads(urls, journal)
+        done = journal.urls_in_state(urls, UPLOADED)
+        if done:
+            logger.info(f"[RESUME] Skipping {len(done)} URLs already uploaded in this run.")
+        urls_to_scrape = [url for url in urls if journal.state(url) not in (SCRAPED, UPLOADED)]
+    else:
+        urls_to_scrape = urls
 
     # --- NEW: Pre-install the WebDriver ONCE ---
-    print("\n" + "="*50)
-    print("--- Pre-installing WebDriver ---")
-    print("="*50)
+    logger.info("--- Pre-installing WebDriver ---")
     try:
         driver_executable_path = ChromeDriverManager().install()
-        print(f"WebDriver cached successfully at: {driver_executable_path}")
+        logger.info(f"WebDriver cached successfully at: {driver_executable_path}")
     except Exception as e:
-        print(f"\nFATAL: Failed to install Chrome Driver. Error: {e}")
+        logger.critical(f"FATAL: Failed to install Chrome Driver. Error: {e}")
         sys.exit(1)
 
     # --- Step 3: Scrape Ads in Parallel ---
-    print("\n" + "="*50)
-    print("--- Step 3: Starting Parallel Scraping ---")
-    print("="*50)
+    logger.info("--- Step 3: Starting Parallel Scraping ---")
     
     # Control the maximum number of concurrent browsers.
     # For a standard GitHub Actions runner (2-core CPU), 2 is a safe starting point.
@@ -877,31 +1475,152 @@ def run_parallel_scraping():
     try:
         max_workers = int(os.getenv("MAX_WORKERS", "2"))
     except ValueError:
-        print("Warning: Invalid MAX_WORKERS environment variable. Defaulting to 2.")
+        logger.warning("Warning: Invalid MAX_WORKERS environment variable. Defaulting to 2.")
         max_workers = 2
         
-    print(f"Configured to run with a maximum of {max_workers} concurrent browsers.")
+    if ADAPTIVE_WORKERS:
+        max_workers = ADAPTIVE_MAX_WORKERS
+        logger.info(f"Adaptive concurrency: {ADAPTIVE_MIN_WORKERS} to {max_workers} concurrent browsers.")
+    else:
+        logger.info(f"Configured to run with a maximum of {max_workers} concurrent browsers.")
+
+    # Enough keep-alive API connections for every worker's parallel upload chunks
+    api_client.configure(pool_size=max(4, max_workers * max(UPLOAD_PARALLELISM, UPLOAD_CONCURRENCY)))
     
     start_time = time.time()
     
     # Use a single ThreadPoolExecutor to manage all scraping tasks directly.
-    # This is much simpler and more direct than the previous nested-thread model.
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # THE FIX: Create a partial function with the driver path already filled in
-        scrape_task_with_driver = partial(scrape_ads, driver_path=driver_executable_path)
-        
-        # Map the list of URLs to this new partial function
-        executor.map(scrape_task_with_driver, urls)
-    
+    # Browsers are shared through a pool of warm drivers instead of one launch per URL.
+    blocked_urls = blocked_url_patterns(BLOCK_RESOURCES, BLOCKED_URL_PATTERNS)
+    if blocked_urls:
+        logger.info(f"Blocking {', '.join(BLOCK_RESOURCES) or 'custom'} downloads ({len(blocked_urls)} URL patterns).")
+    pool_options = dict(driver_path=driver_executable_path, max_pages=BROWSER_MAX_PAGES,
+                        capture_network=EXTRACTION_MODE == "network", blocked_urls=blocked_urls)
+    if ISOLATE_PAGES:
+        pool = scrape = IsolatedScraper(scrape_page, max_workers, pool_options,
+                                        timeout_seconds=PAGE_TIMEOUT_SECONDS, max_rss_mb=PAGE_MAX_RSS_MB)
+        rss_ceiling = f"RSS ceiling {PAGE_MAX_RSS_MB:.0f} MB" if pool.max_rss_bytes else "RSS ceiling disabled"
+        logger.info(f"Scraping in {max_workers} supervised worker processes "
+                    f"(budget {PAGE_TIMEOUT_SECONDS:.0f}s, {rss_ceiling} per page).")
+    else:
+        pool = BrowserPool(max_size=max_workers, **pool_options)
+        scrape = partial(scrape_page, pool=pool)
+    if PIPELINE_MODE == "async" or SCRAPE_ORDER != "longest":
+        scrape = history.recording(scrape)  # the longest-first scheduler records the history itself
+
+    controller = None
+    if ADAPTIVE_WORKERS:
+        # Browsers above the current limit are quit once idle
+        controller = ConcurrencyController(ADAPTIVE_MIN_WORKERS, max_workers, expected_seconds=history.estimate,
+                                           interval=ADAPTIVE_INTERVAL, cpu_high=ADAPTIVE_CPU_HIGH,
+                                           min_free_mb=ADAPTIVE_MIN_FREE_MB, on_resize=pool.trim_idle)
+        scrape = controller.wrap(scrape)
+        controller.start()
+    retry_queue = RetryQueue()
+    scrape = retry_queue.wrap(scrape)
+    scrape_metrics.set_run_info(shard=f"{shard_index}/{shard_count}",
+                                urls=len(urls), urls_to_scrape=len(urls_to_scrape), max_workers=max_workers,
+                                extraction_mode=EXTRACTION_MODE, scroll_mode=SCROLL_MODE, pipeline_mode=PIPELINE_MODE,
+                                isolate_pages=ISOLATE_PAGES, adaptive_workers=ADAPTIVE_WORKERS)
+
+    def scrape_all(urls_to_scrape):
+        if PIPELINE_MODE == "async":
+            # Browsers only scrape; JSON writing and uploads run in their own stages
+            logger.info(f"Running async pipeline (write concurrency {WRITE_CONCURRENCY}, "
+                        f"upload concurrency {UPLOAD_CONCURRENCY}, queue size {PIPELINE_QUEUE_SIZE}).")
+            if SCRAPE_ORDER == "longest":
+                urls_to_scrape = order_longest_first(urls_to_scrape, history)
+            stats = run_pipeline(urls_to_scrape, scrape,
+                                 partial(save_and_record, journal=journal), partial(upload_and_record, journal=journal),
+                                 scrape_concurrency=max_workers, write_concurrency=WRITE_CONCURRENCY,
+                                 upload_concurrency=UPLOAD_CONCURRENCY, queue_size=PIPELINE_QUEUE_SIZE)
+            logger.info(f"Pipeline summary: {stats.summary()}")
+        elif SCRAPE_ORDER == "longest":
+            # Longest pages first, stragglers re-run on idle browsers; each page is saved and uploaded once
+            scheduler = LongestFirstScheduler(history, max_workers, STRAGGLER_FACTOR, STRAGGLER_MIN_SECONDS,
+                                              capacity=controller.capacity if controller else None)
+            stats = scheduler.run(urls_to_scrape, scrape, partial(finish_page, journal=journal))
+            logger.info(f"Scheduler summary: {stats.summary()}")
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                scrape_task_with_pool = partial(scrape_ads, journal=journal, scrape=scrape)
+                executor.map(scrape_task_with_pool, urls_to_scrape)
+
+    try:
+        scrape_all(urls_to_scrape)
+        for retry_round in range(1, RETRY_FAILED_ROUNDS + 1):
+            failed_urls = retry_queue.drain()
+            if not failed_urls:
+                break
+            logger.info(f"--- Retry round {retry_round}/{RETRY_FAILED_ROUNDS}: {len(failed_urls)} failed URLs ---")
+            scrape_all(failed_urls)
+        failed_urls = retry_queue.drain()
+        if failed_urls:
+            logger.warning(f"⚠️ {len(failed_urls)} URLs could not be scraped: {', '.join(map(page_label, failed_urls))}")
+        scrape_metrics.set_run_info(failed_urls=len(failed_urls))
+    finally:
+        if controller is not None:
+            controller.stop()
+            logger.info(f"Adaptive concurrency: {controller.summary()}")
+            scrape_metrics.set_run_info(adaptive_peak_workers=controller.peak, adaptive_changes=controller.changes)
+        pool.close()
+        if _media_prefetcher is not None:
+            logger.info("Waiting for the remaining media downloads...")
+            _media_prefetcher.close()
+            _media_prefetcher.store.close()
+            logger.info(f"Media prefetch: {_media_prefetcher.summary()}")
+        if DEDUPE_CREATIVES:
+            logger.info(f"Creative deduplication left out the content of {_creative_registry.ads_deduplicated} ads.")
+        if ISOLATE_PAGES and pool.kills:
+            logger.warning(f"Watchdog killed {pool.kills} page scrapes (time budget or RSS ceiling).")
+        history.save()
+        if journal is not None:
+            logger.info(f"Run journal: {journal.summary(urls)}")
+            journal.close()
+        # Per-URL timings for the logs/ artifact, written even if the run crashed
+        json_path, prom_path = scrape_metrics.write_reports(METRICS_DIR)
+        logger.info(f"Metrics written to {json_path} and {prom_path}")
+
+    shutdown_snapshot_pool()
+
     end_time = time.time()
     total_time = end_time - start_time
     
     # --- Step 4: Completion Summary ---
-    print("\n" + "="*50)
-    print("--- Scraping Complete ---")
-    print("="*50)
-    print(f"All {len(urls)} URLs have been processed.")
-    print(f"Total parallel execution time: {total_time:.2f} seconds (~{total_time / 60:.2f} minutes).")
+    logger.info("--- Scraping Complete ---")
+    logger.info(f"All {len(urls)} URLs have been processed.")
+    logger.info(f"Total parallel execution time: {total_time:.2f} seconds (~{total_time / 60:.2f} minutes).")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape the FB Ad Library pages of all competitors.")
+    parser.add_argument("--shard-index", type=int, default=SHARD_INDEX,
+                        help="0-based shard of the URL list scraped by this runner (env SHARD_INDEX)")
+    parser.add_argument("--shard-count", type=int, default=SHARD_COUNT,
+                        help="Number of runners sharing the URL list (env SHARD_COUNT)")
+    parser.add_argument("--skip-cleanup", action="store_true", default=SKIP_CLEANUP,
+                        help="Don't run the cleanup of today's data (env SKIP_CLEANUP=1)")
+    parser.add_argument("--cleanup-only", action="store_true",
+                        help="Only run the cleanup of today's data, e.g. in a job the shards depend on")
+    parser.add_argument("--merge", nargs="+", metavar="DIR",
+                        help="Merge the ad_data_* page files and scrape histories of finished shards and exit")
+    parser.add_argument("--output", default="merged_ad_data.json", help="Output file of --merge")
+    args = parser.parse_args(argv)
+    if args.shard_count < 1 or not 0 <= args.shard_index < args.shard_count:
+        parser.error(f"--shard-index must be between 0 and {args.shard_count - 1}")
+    if args.shard_count > 1 and not (args.skip_cleanup or args.cleanup_only or args.merge or DELTA_UPLOAD):
+        parser.error("with --shard-count > 1 run the cleanup in a separate --cleanup-only job "
+                     "and start the shards with --skip-cleanup (env SKIP_CLEANUP=1)")
+    return args
+
 
 if __name__ == "__main__":
-    run_parallel_scraping()
+    args = parse_args()
+    setup_logging(LOG_DIR, LOG_LEVEL, json_format=LOG_FORMAT == "json")
+    if args.merge:
+        merge_shard_outputs(args.merge, args.output, history_name=SCRAPE_HISTORY_PATH)
+    elif args.cleanup_only:
+        if not cleanup_existing_data():
+            logger.critical("FATAL: Cleanup of existing data failed.")
+            sys.exit(1)
+    else:
+        run_parallel_scraping(args.shard_index, args.shard_count, args.skip_cleanup)
@@ -0,0 +1,109 @@
+"""
+Shared HTTP client for the Gems API.
+
+All API calls of ad_nova_script.py and transcript_bot.py go through one pooled
+`requests.Session`, so connections to the (ngrok-hosted) API are kept alive
+and reused across calls and threads instead of paying a new TCP/TLS handshake
+every time. This is the only retry layer for API calls, with exponential
+backoff: idempotent requests are retried on connection errors, timeouts and
+5xx responses. A POST is only retried when the API cannot have processed
+it: connection errors and 503 (service unavailable). A 502 or 504 can come
+back after the proxy handed the request to the API, and a read timeout says
+nothing about whether the API stored it, so resending those could insert the
+same ads twice.
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Connections kept open to the API. Every browser worker may be uploading
+# several chunks at once, so the default scales with MAX_WORKERS.
+try:
+    API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", str(4 * int(os.getenv("MAX_WORKERS", "2")))))
+except ValueError:
+    API_POOL_SIZE = 8
+
+# Retries per request, with backoff of API_BACKOFF_FACTOR * (1, 2, 4, ...) seconds between attempts
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "3"))
+API_BACKOFF_FACTOR = float(os.getenv("API_BACKOFF_FACTOR", "1"))
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+# The only status after which a POST is safe to resend: the API did not take the request
+POST_RETRY_STATUS_CODES = (503,)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class _ApiRetry(Retry):
+    """
+    urllib3's Retry with the default (idempotent) allowed_methods, so a POST is
+    never resent after a read error; POST is additionally retried on 503.
+    """
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if method and method.upper() == "POST":
+            return bool(self.total) and status_code in POST_RETRY_STATUS_CODES
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def _build_session(pool_size):
+    retry = _ApiRetry(
+        total=API_MAX_RETRIES,
+        connect=API_MAX_RETRIES,
+        read=API_MAX_RETRIES,
+        status=API_MAX_RETRIES,
+        backoff_factor=API_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        raise_on_status=False,  # hand the last response to raise_for_status()
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Returns the process-wide API session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _build_session(API_POOL_SIZE)
+        return _session
+
+
+def configure(pool_size):
+    """Resizes the connection pool, e.g. once the number of workers is known."""
+    global _session
+    with _session_lock:
+        old_session, _session = _session, _build_session(pool_size)
+    if old_session is not None:
+        old_session.close()
+
+
+def close():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def get(url, **kwargs):
+    return get_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_session().post(url, **kwargs)
+
+
+def put(url, **kwargs):
+    return get_session().put(url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return get_session().delete(url, **kwargs)
@@ -0,0 +1,125 @@
+"""
+Micro-benchmarks for ad_fields.
+
+Times the field parsers on realistic card strings against the inline
+`re.search` / `strptime` code they replaced in the DOM loop, checks both give
+the same results, and times build_ad_record() for a full record:
+
+    python benchmarks/bench_ad_fields.py [--number 20000]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ad_fields  # noqa: E402
+from ad_fields import PLATFORM_MAPPING, CATEGORY_MAPPING  # noqa: E402
+
+STARTED_TEXTS = [
+    "Started running on Mar 5, 2024 · Total active time 12 hrs",
+    "Started running on 14 Feb 2025",
+    "Started running on Jan 21, 2025 · Total active time 3 days",
+]
+PLATFORM_STYLES = [
+    f'mask-image: url("{image}"); mask-position: {position}; mask-size: auto; width: 12px; height: 12px;'
+    for image, position in PLATFORM_MAPPING
+]
+CATEGORY_STYLES = [
+    f'mask-image: url("{image}"); mask-position: {position}; width: 12px; height: 12px;'
+    for image, position in CATEGORY_MAPPING
+]
+LINK_HREF = ("https://l.facebook.com/l.php?u=https%3A%2F%2Fshop.example.com%2Fproducts%2Fsummer"
+             "%3Futm_source%3Dfacebook&h=AT0abcdef")
+RAW_CARD = {
+    "library_id_text": "Library ID: 1234567890123456",
+    "started_text": STARTED_TEXTS[0],
+    "platform_styles": PLATFORM_STYLES[:3],
+    "category_styles": CATEGORY_STYLES[:1],
+    "ads_count_text": "4 ads",
+    "ad_text": "  Summer sale - up to 50% off  ",
+    "link_href": LINK_HREF,
+    "has_video": True,
+    "video_src": "https://video.xx.fbcdn.net/v/t42/clip.mp4?oe=abc",
+    "video_poster": "https://scontent.xx.fbcdn.net/v/t39/poster.jpg?oe=abc",
+    "image_src": None,
+    "has_cta": True,
+    "cta_text": "Shop now",
+    "headline_text": "shop.example.com",
+}
+
+
+# The parsing code as it was written inline in the DOM loop
+def inline_started_running(full_text):
+    started_running = None
+    started_running_match = re.search(r'Started running on (.*?)(?:·|$)', full_text)
+    if started_running_match:
+        started_running_text = started_running_match.group(1).strip()
+        try:
+            started_running = datetime.strptime(started_running_text, "%b %d, %Y").strftime("%Y-%m-%d")
+        except ValueError:
+            started_running = datetime.strptime(started_running_text, "%d %b %Y").strftime("%Y-%m-%d")
+    total_active_time = None
+    active_time_match = re.search(r'Total active time\s+(.+?)(?:$|\s*·)', full_text)
+    if active_time_match:
+        total_active_time = active_time_match.group(1).strip()
+    return started_running, total_active_time
+
+
+def inline_platform(style):
+    mask_image_match = re.search(r'mask-image: url\("([^"]+)"\)', style)
+    mask_pos_match = re.search(r'mask-position: ([^;]+)', style)
+    mask_image = mask_image_match.group(1) if mask_image_match else None
+    mask_position = mask_pos_match.group(1).strip() if mask_pos_match else None
+    return PLATFORM_MAPPING.get((mask_image, mask_position))
+
+
+def check_same_results():
+    for text in STARTED_TEXTS:
+        assert ad_fields.parse_started_running(text) == inline_started_running(text), text
+    for style in PLATFORM_STYLES:
+        assert ad_fields.resolve_platform(style) == inline_platform(style), style
+
+
+def bench(label, func, inputs, number):
+    def run():
+        for value in inputs:
+            func(value)
+    seconds = min(timeit.repeat(run, number=number, repeat=3))
+    per_call_us = seconds / (number * len(inputs)) * 1e6
+    print(f"  {label:<34} {per_call_us:8.2f} us/call")
+    return per_call_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000, help="loops per measurement")
+    args = parser.parse_args()
+
+    check_same_results()
+    print("Results match the inline parsing code.\n")
+
+    print("Started running line")
+    old = bench("inline re.search + strptime", inline_started_running, STARTED_TEXTS, args.number)
+    new = bench("ad_fields.parse_started_running", ad_fields.parse_started_running, STARTED_TEXTS, args.number)
+    print(f"  speedup x{old / new:.1f}\n")
+
+    print("Platform icon style")
+    old = bench("inline re.search + mapping", inline_platform, PLATFORM_STYLES, args.number)
+    new = bench("ad_fields.resolve_platform", ad_fields.resolve_platform, PLATFORM_STYLES, args.number)
+    print(f"  speedup x{old / new:.1f}\n")
+
+    print("Other fields")
+    bench("ad_fields.parse_ads_count", ad_fields.parse_ads_count, ["4 ads", "12"], args.number)
+    bench("ad_fields.unwrap_destination_url", ad_fields.unwrap_destination_url, [LINK_HREF], args.number)
+    bench("ad_fields.build_ad_record", ad_fields.build_ad_record, [RAW_CARD], args.number // 4)
+
+    print(f"\nCache info: parse_started_date {ad_fields.parse_started_date.cache_info()}")
+    print(f"            resolve_platform   {ad_fields.resolve_platform.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Offline benchmark of the ad scraper against recorded Ad Library pages.
+
+Serves HTML fixtures from a local HTTP server and runs the real
+`scrape_page()` of ad_nova_script.py (browser pool, scrolling, extraction)
+against them, once per extraction mode. Reports ads/second, time per stage
+and peak Chrome / Python memory, so extraction changes can be compared and
+regressions caught without touching Facebook:
+
+    python benchmarks/bench_scraper.py                        # synthetic small/medium/huge pages
+    python benchmarks/bench_scraper.py --modes dom,js,snapshot --sizes small,medium
+    python benchmarks/bench_scraper.py --fixtures saved_pages/ --json results.json
+
+Fixtures are either generated (`--sizes`, infinite-scroll pages with the
+current card markup that load more cards as they are scrolled) or saved Ad
+Library pages (`--fixtures DIR`, every *.html file is one scenario; saved
+pages are static, so scrolling only walks down to the end). The "network"
+mode is not supported: fixtures carry no GraphQL traffic.
+
+Scroll behaviour (SCROLL_MODE, SCROLL_JITTER_*, ...) is configured through
+the same environment variables as the scraper. Chrome memory needs psutil.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ad_nova_script  # noqa: E402
+from ad_fields import AD_GROUP_CLASS, PLATFORM_MAPPING, CATEGORY_MAPPING  # noqa: E402
+from browser_pool import BrowserPool, blocked_url_patterns  # noqa: E402
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+FIXTURE_SIZES = {"small": 60, "medium": 600, "huge": 3000}
+MODES = ("dom", "js", "snapshot", "incremental", "prune")
+CARDS_PER_GROUP = 3
+CARDS_PER_LOAD = 30  # cards appended per "page" of results, like the Ad Library does
+
+# Class strings of the card markup, as read by the XPaths in ad_fields.py
+CARD_TEMPLATE_JS = r"""
+const GROUP_CLASS = %(group_class)s;
+const TOTAL = %(total)d, PER_LOAD = %(per_load)d, PER_GROUP = %(per_group)d;
+const PLATFORM_STYLES = %(platform_styles)s, CATEGORY_STYLES = %(category_styles)s;
+let rendered = 0, loading = false;
+
+function icon(style) {
+    return `<div class="xtwfq29" style='${style}'></div>`;
+}
+function card(i) {
+    const id = String(1000000000000000 + i);
+    const platforms = PLATFORM_STYLES.slice(0, 1 + i %% PLATFORM_STYLES.length).map(icon).join("");
+    const category = i %% 7 === 0
+        ? `<span>Categories</span><div class="x1rg5ohu x67bb7w">${icon(CATEGORY_STYLES[i %% CATEGORY_STYLES.length])}</div>` : "";
+    const media = i %% 3 === 0
+        ? `<video src="/media/clip_${i}.mp4" poster="/media/poster_${i}.jpg"></video>`
+        : `<img class="x168nmei" src="/media/image_${i}.jpg">`;
+    const day = 1 + i %% 28;
+    return `<div class="xh8yej3">
+      <div class="x78zum5 xdt5ytf x2lwn1j xeuugli">
+        <div class="x1rg5ohu x67bb7w"><span>Library ID: ${id}</span></div>
+        <div><span>Started running on Mar ${day}, 2025 · Total active time ${i %% 48} hrs</span></div>
+        <div><span>Platforms</span><div>${platforms}</div></div>
+        <div>${category}</div>
+        <div class="x6s0dn4 x78zum5 xsag5q8"><strong>${1 + i %% 9} ads</strong> use this creative and text.</div>
+      </div>
+      <div data-ad-preview="message">Benchmark ad ${i}<br>Up to ${i %% 70}%% off this week only.</div>
+      <a class="x1hl2dhg x1lku1pv" href="https://l.facebook.com/l.php?u=https%%3A%%2F%%2Fshop.example.com%%2Fp%%2F${i}&h=AT0">
+        ${media}
+        <div class="x6s0dn4 x2izyaf x78zum5 x1qughib x15mokao x1ga7v0g xde0f50 x15x8krk xexx8yu xf159sx xwib8y2 xmzvs34">
+          <div class="x1iyjqo2 x2fvf9 x6ikm8r x10wlt62 xt0b8zv"><div class="x6ikm8r x10wlt62 xlyipyv x1mcwxda">shop.example.com</div></div>
+          <div class="x2lah0s"><div class="x8t9es0 x1fvot60 xxio538 x1heor9g xuxw1ft x6ikm8r x10wlt62 xlyipyv x1h4wwuj x1pd3egz xeuugli">Shop now</div></div>
+        </div>
+      </a>
+      <div style="height: 380px"></div>
+    </div>`;
+}
+function loadMore() {
+    const list = document.getElementById("ads");
+    const end = Math.min(TOTAL, rendered + PER_LOAD);
+    let html = "";
+    for (let start = rendered; start < end; start += PER_GROUP) {
+        let cards = "";
+        for (let i = start; i < Math.min(end, start + PER_GROUP); i++) cards += card(i);
+        html += `<div class="${GROUP_CLASS}">${cards}</div>`;
+    }
+    list.insertAdjacentHTML("beforeend", html);
+    rendered = end;
+    loading = false;
+}
+window.addEventListener("scroll", () => {
+    if (loading || rendered >= TOTAL) return;
+    if (window.innerHeight + window.scrollY < document.body.scrollHeight - 1500) return;
+    loading = true;
+    setTimeout(loadMore, %(load_delay_ms)d);  // simulated GraphQL round trip
+});
+loadMore();
+"""
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Ad Library benchmark - {name}</title></head>
+<body>
+<input type="search" placeholder="Search by keyword or advertiser" value="Benchmark {name}">
+<div>~{total} results</div>
+<div id="ads"></div>
+<script>{script}</script>
+</body></html>
+"""
+
+
+def generate_fixture(directory, name, total, load_delay_ms=300):
+    """Writes an infinite-scroll Ad Library page with `total` ads. Returns its file name."""
+    script = CARD_TEMPLATE_JS % {
+        "group_class": json.dumps(AD_GROUP_CLASS),
+        "total": total,
+        "per_load": CARDS_PER_LOAD,
+        "per_group": CARDS_PER_GROUP,
+        "platform_styles": json.dumps([f'mask-image: url("{image}"); mask-position: {position};'
+                                       for image, position in PLATFORM_MAPPING]),
+        "category_styles": json.dumps([f'mask-image: url("{image}"); mask-position: {position};'
+                                       for image, position in CATEGORY_MAPPING]),
+        "load_delay_ms": load_delay_ms,
+    }
+    file_name = f"{name}.html"
+    with open(os.path.join(directory, file_name), "w", encoding="utf-8") as f:
+        f.write(PAGE_TEMPLATE.format(name=name, total=total, script=script))
+    return file_name
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_directory(directory):
+    """Serves `directory` on a free local port in a background thread. Returns the server."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class MemorySampler:
+    """Samples the RSS of the Chrome/chromedriver processes started by this process and keeps the peak."""
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        total = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        self.peak_bytes = max(self.peak_bytes, total)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        if psutil is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+class StageTimer:
+    """Times the scroll stage by wrapping ad_nova_script.scroll_page."""
+
+    def __init__(self):
+        self.scroll_start = self.scroll_end = None
+        self._scroll_page = ad_nova_script.scroll_page
+
+    def _timed_scroll_page(self, *args, **kwargs):
+        self.scroll_start = time.time()
+        try:
+            return self._scroll_page(*args, **kwargs)
+        finally:
+            self.scroll_end = time.time()
+
+    def __enter__(self):
+        ad_nova_script.scroll_page = self._timed_scroll_page
+        return self
+
+    def __exit__(self, *exc):
+        ad_nova_script.scroll_page = self._scroll_page
+
+
+def set_mode(mode):
+    ad_nova_script.EXTRACTION_MODE = mode if mode in ("dom", "js", "snapshot") else "dom"
+    ad_nova_script.INCREMENTAL_EXTRACTION = mode == "incremental"
+    ad_nova_script.PRUNE_EXTRACTED_ADS = mode == "prune"
+
+
+def run_scenario(name, url, pool, mode):
+    set_mode(mode)
+    tracemalloc.reset_peak()
+    with MemorySampler() as memory, StageTimer() as stages:
+        start = time.time()
+        final_output = ad_nova_script.scrape_page(url, pool)
+        end = time.time()
+    _, python_peak = tracemalloc.get_traced_memory()
+
+    if not final_output:
+        return {"scenario": name, "mode": mode, "failed": True}
+    ads = len(final_output["ads_data"])
+    scroll_start = stages.scroll_start or end
+    scroll_end = stages.scroll_end or end
+    return {
+        "scenario": name,
+        "mode": mode,
+        "ads": ads,
+        "expected_ads": final_output["no_of_ads"],
+        "seconds": end - start,
+        "ads_per_second": ads / (end - start),
+        "stages": {
+            "setup": scroll_start - start,    # navigation, page info and the human-like delays
+            "scroll": scroll_end - scroll_start,  # includes live extraction in incremental/prune modes
+            "extract": end - scroll_end,
+        },
+        "peak_chrome_mb": memory.peak_bytes / 1e6 if psutil is not None else None,
+        "peak_python_mb": python_peak / 1e6,
+    }
+
+
+def print_results(results):
+    print(f"\n{'scenario':<14}{'mode':<13}{'ads':>7}{'time s':>9}{'ads/s':>9}"
+          f"{'setup':>8}{'scroll':>8}{'extract':>9}{'chrome MB':>11}{'python MB':>11}")
+    for r in results:
+        if r.get("failed"):
+            print(f"{r['scenario']:<14}{r['mode']:<13}  FAILED")
+            continue
+        chrome = f"{r['peak_chrome_mb']:.0f}" if r["peak_chrome_mb"] is not None else "n/a"
+        s = r["stages"]
+        print(f"{r['scenario']:<14}{r['mode']:<13}{r['ads']:>7}{r['seconds']:>9.1f}{r['ads_per_second']:>9.1f}"
+              f"{s['setup']:>8.1f}{s['scroll']:>8.1f}{s['extract']:>9.1f}{chrome:>11}{r['peak_python_mb']:>11.1f}")
+    if psutil is None:
+        print("\n(pip install psutil to measure Chrome memory)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="directory of saved Ad Library pages (*.html) to use instead of generated ones")
+    parser.add_argument("--sizes", default="small,medium,huge",
+                        help=f"generated fixtures to run ({', '.join(f'{k}={v} ads' for k, v in FIXTURE_SIZES.items())})")
+    parser.add_argument("--modes", default="dom,js", help=f"extraction modes to compare ({', '.join(MODES)})")
+    parser.add_argument("--load-delay-ms", type=int, default=300, help="simulated delay before more ads load")
+    parser.add_argument("--driver-path", help="chromedriver to use (default: webdriver_manager)")
+    parser.add_argument("--block", default="", help="resource types to block, as BLOCK_RESOURCES")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the scraper's random delays")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        parser.error(f"unknown mode(s): {', '.join(unknown)}")
+
+    if args.fixtures:
+        directory = os.path.abspath(args.fixtures)
+        scenarios = {os.path.splitext(f)[0]: f for f in sorted(os.listdir(directory)) if f.endswith(".html")}
+    else:
+        directory = tempfile.mkdtemp(prefix="gems_bench_")
+        scenarios = {}
+        for size in [s.strip() for s in args.sizes.split(",") if s.strip()]:
+            if size not in FIXTURE_SIZES:
+                parser.error(f"unknown size: {size}")
+            scenarios[size] = generate_fixture(directory, size, FIXTURE_SIZES[size], args.load_delay_ms)
+    if not scenarios:
+        parser.error("no fixtures to run")
+
+    driver_path = args.driver_path
+    if not driver_path:
+        from webdriver_manager.chrome import ChromeDriverManager
+        driver_path = ChromeDriverManager().install()
+
+    server = serve_directory(directory)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    blocked_urls = blocked_url_patterns([t.strip() for t in args.block.split(",") if t.strip()])
+    pool = BrowserPool(driver_path, max_size=1, max_pages=1000, blocked_urls=blocked_urls)
+
+    random.seed(args.seed)
+    tracemalloc.start()
+    results = []
+    try:
+        # One warm-up page so the first scenario doesn't pay for Chrome's start
+        pool.release(pool.acquire())
+        for page_id, (name, file_name) in enumerate(scenarios.items(), 900000):
+            url = f"{base_url}/{file_name}?view_all_page_id={page_id}&search_type=page"
+            for mode in modes:
+                print(f"\n=== {name} / {mode} ===")
+                results.append(run_scenario(name, url, pool, mode))
+    finally:
+        pool.close()
+        ad_nova_script.shutdown_snapshot_pool()
+        server.shutdown()
+        tracemalloc.stop()
+        if not args.fixtures:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"\nResults written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+In-browser ad extraction.
+
+Instead of a WebDriver round trip for every field of every ad card, the script
+below walks the ad cards inside the page and returns the raw strings for all of
+them in one `execute_script` call (or one call per batch of ad groups). The
+XPaths are the same ones the WebDriver extraction uses (see ad_fields.py) and
+the raw strings go through the same `build_ad_record`, so both backends produce
+identical `ads_data` records.
+
+Run it against saved Ad Library pages to check the output offline:
+
+    python browser_extract.py saved_page.html [more_pages.html ...]
+"""
+import json
+import logging
+import os
+import sys
+
+from ad_fields import (
+    AD_GROUP_CLASS, AD_CARD_XPATH, MAIN_CONTAINER_XPATH, LIBRARY_ID_XPATH, STARTED_RUNNING_XPATH,
+    PLATFORMS_XPATH, PLATFORM_ICON_XPATH, CATEGORIES_XPATH, CATEGORY_DIV_XPATH, ADS_COUNT_XPATH,
+    AD_TEXT_XPATH, LINK_CONTAINER_XPATH, VIDEO_XPATH, IMAGE_XPATH, ANY_IMAGE_XPATH,
+    CTA_CONTAINER_XPATH, HEADLINE_CONTAINER_XPATH, CTA_DIV_XPATH, CTA_TEXT_XPATH, HEADLINE_XPATH,
+    build_ad_record,
+)
+
+logger = logging.getLogger(__name__)
+
+XPATHS = {
+    "card": AD_CARD_XPATH,
+    "main": MAIN_CONTAINER_XPATH,
+    "libraryId": LIBRARY_ID_XPATH,
+    "started": STARTED_RUNNING_XPATH,
+    "platforms": PLATFORMS_XPATH,
+    "icon": PLATFORM_ICON_XPATH,
+    "categories": CATEGORIES_XPATH,
+    "categoryDiv": CATEGORY_DIV_XPATH,
+    "adsCount": ADS_COUNT_XPATH,
+    "adText": AD_TEXT_XPATH,
+    "link": LINK_CONTAINER_XPATH,
+    "video": VIDEO_XPATH,
+    "image": IMAGE_XPATH,
+    "anyImage": ANY_IMAGE_XPATH,
+    "cta": CTA_CONTAINER_XPATH,
+    "headlineContainer": HEADLINE_CONTAINER_XPATH,
+    "ctaDiv": CTA_DIV_XPATH,
+    "ctaText": CTA_TEXT_XPATH,
+    "headline": HEADLINE_XPATH,
+}
+
+# arguments: group class, XPATHS, first group index, number of groups (0 = all), incremental, prune
+# returns: {groups: <total ad groups on page>, found: <cards in batch>, ads: [raw, ...], pruned: <n>}
+# In incremental mode only the cards not marked as extracted by a previous call are
+# walked, and `found` is the total number of cards on the page. With `prune`, cards
+# extracted earlier that have scrolled out of view are emptied and kept as
+# fixed-height placeholders, so the DOM stops growing with the number of ads.
+EXTRACT_ADS_JS = r"""
+const [groupClass, xp, start, count, incremental, prune] = arguments;
+const SEEN = "data-gems-seen";
+const PRUNED = "data-gems-pruned";
+
+function first(xpath, ctx) {
+    return document.evaluate(xpath, ctx, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+}
+function all(xpath, ctx) {
+    const snapshot = document.evaluate(xpath, ctx, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const nodes = [];
+    for (let i = 0; i < snapshot.snapshotLength; i++) nodes.push(snapshot.snapshotItem(i));
+    return nodes;
+}
+function text(el) {
+    return el ? el.innerText : null;
+}
+
+function extractCard(card) {
+    const main = first(xp.main, card);
+    if (!main) return null;
+    const libraryId = first(xp.libraryId, main);
+    if (!libraryId) return null;
+
+    const raw = {library_id_text: libraryId.innerText};
+    raw.started_text = text(first(xp.started, main));
+
+    const platforms = first(xp.platforms, main);
+    raw.platform_styles = platforms ? all(xp.icon, platforms).map(icon => icon.style.cssText) : [];
+
+    raw.category_styles = [];
+    const categories = first(xp.categories, main);
+    if (categories) {
+        for (const categoryDiv of all(xp.categoryDiv, categories)) {
+            const icon = first(xp.icon, categoryDiv);
+            if (icon) raw.category_styles.push(icon.style.cssText);
+        }
+    }
+
+    raw.ads_count_text = text(first(xp.adsCount, main));
+    raw.ad_text = text(first(xp.adText, card));
+
+    const link = first(xp.link, card);
+    raw.link_href = link ? link.href : null;
+    if (link) {
+        const video = first(xp.video, card);
+        raw.has_video = !!video;
+        if (video) {
+            raw.video_src = video.getAttribute("src") ? video.src : null;
+            raw.video_poster = video.getAttribute("poster") ? video.poster : null;
+        } else {
+            const image = first(xp.image, link) || first(xp.anyImage, link);
+            raw.image_src = image && image.getAttribute("src") ? image.src : null;
+        }
+    }
+
+    raw.has_cta = false;
+    const cta = first(xp.cta, card);
+    const headlineContainer = cta && first(xp.headlineContainer, cta);
+    const ctaDiv = cta && first(xp.ctaDiv, cta);
+    const ctaText = ctaDiv && first(xp.ctaText, ctaDiv);
+    if (headlineContainer && ctaText) {
+        raw.has_cta = true;
+        raw.cta_text = ctaText.innerText;
+        raw.headline_text = text(first(xp.headline, headlineContainer));
+    }
+    return raw;
+}
+
+const groups = document.querySelectorAll('div[class="' + groupClass + '"]');
+if (incremental) {
+    const cardSelector = 'div[class="' + groupClass + '"] > div[class*="xh8yej3"]';
+    let pruned = 0;
+    if (prune) {
+        for (const card of document.querySelectorAll(cardSelector + '[' + SEEN + ']:not([' + PRUNED + '])')) {
+            const rect = card.getBoundingClientRect();
+            if (rect.bottom >= 0) continue;  // still on screen
+            for (const video of card.querySelectorAll("video")) {
+                video.pause();
+                video.removeAttribute("src");
+                video.load();
+            }
+            card.style.height = rect.height + "px";
+            card.replaceChildren();
+            card.setAttribute(PRUNED, "1");
+            pruned++;
+        }
+    }
+    const ads = [];
+    for (const card of document.querySelectorAll(cardSelector + ':not([' + SEEN + '])')) {
+        try {
+            const raw = extractCard(card);
+            if (raw) {
+                card.setAttribute(SEEN, "1");
+                ads.push(raw);
+            }
+        } catch (e) {
+            // Not fully rendered yet - retried on the next call
+        }
+    }
+    return {groups: groups.length, found: document.querySelectorAll(cardSelector).length, ads: ads, pruned: pruned};
+}
+
+const end = count > 0 ? Math.min(groups.length, start + count) : groups.length;
+const ads = [];
+let found = 0;
+for (let i = start; i < end; i++) {
+    const cards = all(xp.card, groups[i]);
+    found += cards.length;
+    for (const card of cards) {
+        try {
+            const raw = extractCard(card);
+            if (raw) ads.push(raw);
+        } catch (e) {
+            // Skip the card, like the WebDriver extraction does on unexpected errors
+        }
+    }
+}
+return {groups: groups.length, found: found, ads: ads};
+"""
+
+
+COUNT_AD_CARDS_JS = """
+return document.querySelectorAll('div[class="' + arguments[0] + '"] > div[class*="xh8yej3"]').length;
+"""
+
+
+def count_ad_cards(driver):
+    """Number of ad cards currently in the DOM, in one cheap call."""
+    return driver.execute_script(COUNT_AD_CARDS_JS, AD_GROUP_CLASS)
+
+
+def extract_ads_js(driver, batch_size=0):
+    """
+    Extracts the ads on the current page in-browser, one execute_script per
+    `batch_size` ad groups (0 = the whole page in a single call).
+    Returns a (ads_data, total_child_ads_found) tuple.
+    """
+    ads_data = {}
+    total_child_ads_found = 0
+    start = 0
+    while True:
+        result = driver.execute_script(EXTRACT_ADS_JS, AD_GROUP_CLASS, XPATHS, start, batch_size, False, False)
+        total_child_ads_found += result["found"]
+        for raw in result["ads"]:
+            ad_data = build_ad_record(raw)
+            if ad_data:
+                ads_data[ad_data["library_id"]] = ad_data
+
+        if batch_size <= 0:
+            break
+        start += batch_size
+        if start >= result["groups"]:
+            break
+
+    logger.info(f"Total <div> elements (ad groups): {result['groups']}, ads found: {total_child_ads_found}, processed: {len(ads_data)}")
+    return ads_data, total_child_ads_found
+
+
+class IncrementalExtractor:
+    """
+    Extracts ads while the page is still scrolling. Every `collect` call only
+    walks the cards rendered since the previous call (extracted cards are marked
+    in the DOM), so the results build up scroll by scroll and survive a crash of
+    the page partway through.
+
+    With `prune=True`, extracted cards that have scrolled out of view are
+    replaced by empty fixed-height placeholders, which keeps the browser's
+    memory and layout cost flat on pages with tens of thousands of ads.
+    """
+
+    def __init__(self, prune=False):
+        self.prune = prune
+        self.ads_data = {}
+        self.seen_library_ids = set()
+        self.total_child_ads_found = 0
+        self.total_pruned = 0
+
+    def collect(self, driver):
+        """Extracts the newly rendered ads. Returns the number of new ads."""
+        result = driver.execute_script(EXTRACT_ADS_JS, AD_GROUP_CLASS, XPATHS, 0, 0, True, self.prune)
+        self.total_child_ads_found = max(self.total_child_ads_found, result["found"])
+        self.total_pruned += result["pruned"]
+        new_ads = 0
+        for raw in result["ads"]:
+            ad_data = build_ad_record(raw)
+            if ad_data and ad_data["library_id"] not in self.seen_library_ids:
+                self.seen_library_ids.add(ad_data["library_id"])
+                self.ads_data[ad_data["library_id"]] = ad_data
+                new_ads += 1
+        if new_ads:
+            pruned_note = f", {self.total_pruned} pruned from the DOM" if self.prune else ""
+            logger.debug(f"Extracted {new_ads} new ads ({len(self.ads_data)}/{self.total_child_ads_found} so far{pruned_note})")
+        return new_ads
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    if len(sys.argv) < 2:
+        print("Usage: python browser_extract.py saved_page.html [more_pages.html ...]")
+        sys.exit(1)
+
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    try:
+        for html_path in sys.argv[1:]:
+            driver.get(f"file://{os.path.abspath(html_path)}")
+            ads_data, total_found = extract_ads_js(driver)
+            print(json.dumps({"file": html_path, "total_ads_found": total_found, "ads_data": ads_data},
+                             indent=4, ensure_ascii=False))
+    finally:
+        driver.quit()
@@ -0,0 +1,203 @@
+"""
+Pool of warm Chrome drivers shared by the scraping threads.
+
+Starting Chrome takes several seconds and every start used to leave a
+`tempfile.mkdtemp()` profile behind. The pool keeps up to `max_size` drivers
+alive, resets their state between URLs, recycles a driver after `max_pages`
+pages or after an error, and deletes the profile directory of every driver it
+quits.
+"""
+import logging
+import shutil
+import tempfile
+import threading
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+from network_capture import enable_performance_logging
+
+logger = logging.getLogger(__name__)
+
+# URL patterns (Network.setBlockedURLs syntax) blocked per resource type. Only the bytes
+# are blocked - the src/poster URLs stay in the DOM for the extraction.
+BLOCKABLE_RESOURCES = {
+    "image": ["*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.svg*"],
+    "media": ["*.mp4*", "*.webm*", "*.m4a*", "*.m4v*", "*.mpd*"],
+    "font": ["*.woff*", "*.ttf*", "*.otf*"],
+}
+
+
+# Timeout of execute_async_script (the WebDriver default). Scroll code raises it while
+# waiting for ads to load; the pool puts it back before a driver takes the next URL.
+SCRIPT_TIMEOUT_SECONDS = 30
+
+
+def blocked_url_patterns(resource_types, extra_patterns=()):
+    """Returns the URL patterns to block for the given resource types plus any extra patterns."""
+    patterns = []
+    for resource_type in resource_types:
+        if resource_type not in BLOCKABLE_RESOURCES:
+            raise ValueError(f"Unknown resource type to block: {resource_type!r} "
+                             f"(expected one of {', '.join(BLOCKABLE_RESOURCES)})")
+        patterns.extend(BLOCKABLE_RESOURCES[resource_type])
+    patterns.extend(extra_patterns)
+    return patterns
+
+
+def create_driver(driver_path, capture_network=False, blocked_urls=()):
+    """
+    Starts a headless Chrome with a fresh temporary profile. Returns (driver, profile_dir).
+    `capture_network` turns on the performance log read by network_capture.py and
+    `blocked_urls` are URL patterns the browser must not download.
+    """
+    profile_dir = tempfile.mkdtemp(prefix="gems_chrome_")
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--log-level=3")
+    options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    options.add_argument(f'--user-data-dir={profile_dir}')
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    if capture_network:
+        enable_performance_logging(options)
+    if any(pattern in blocked_urls for pattern in BLOCKABLE_RESOURCES["media"]):
+        # Don't even start autoplay videos
+        options.add_argument("--autoplay-policy=user-gesture-required")
+
+    try:
+        service = Service(executable_path=driver_path)
+        driver = webdriver.Chrome(service=service, options=options)
+    except Exception:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        raise
+
+    try:
+        if blocked_urls:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(blocked_urls)})
+
+        # Set a timeout for the initial page load to prevent hangs
+        driver.set_page_load_timeout(60)
+        driver.set_script_timeout(SCRIPT_TIMEOUT_SECONDS)
+    except Exception:
+        driver.quit()
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        raise
+    return driver, profile_dir
+
+
+class BrowserPool:
+    """
+    Hands out warm drivers with `acquire()` and takes them back with `release()`.
+    At most `max_size` drivers are alive at any time; `acquire()` blocks while
+    they are all in use.
+    """
+
+    def __init__(self, driver_path, max_size=2, max_pages=10, capture_network=False, blocked_urls=()):
+        self.driver_path = driver_path
+        self.capture_network = capture_network
+        self.blocked_urls = list(blocked_urls)
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self._idle = []
+        self._profiles = {}   # driver -> profile dir
+        self._pages = {}      # driver -> pages scraped with it
+        self._alive = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while not self._closed and not self._idle and self._alive >= self.max_size:
+                self._condition.wait()
+            if self._closed:
+                raise RuntimeError("BrowserPool is closed")
+            if self._idle:
+                return self._idle.pop()
+            self._alive += 1
+
+        # Start the new browser outside the lock, other threads can keep going
+        try:
+            driver, profile_dir = create_driver(self.driver_path, self.capture_network, self.blocked_urls)
+        except Exception:
+            with self._condition:
+                self._alive -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._profiles[driver] = profile_dir
+            self._pages[driver] = 0
+        return driver
+
+    def release(self, driver, failed=False):
+        """Returns a driver to the pool. Failed or worn-out drivers are quit instead."""
+        with self._condition:
+            self._pages[driver] += 1
+            recycle = failed or self._closed or self._pages[driver] >= self.max_pages
+
+        if not recycle:
+            try:
+                self._reset(driver)
+            except Exception as e:
+                logger.warning(f"[POOL] Could not reset browser, recycling it: {e}")
+                recycle = True
+
+        if recycle:
+            self._destroy(driver)
+            with self._condition:
+                self._alive -= 1
+                self._condition.notify()
+        else:
+            with self._condition:
+                self._idle.append(driver)
+                self._condition.notify()
+
+    def trim_idle(self, keep):
+        """Quits idle drivers until at most `keep` drivers are alive, e.g. after lowering the concurrency."""
+        with self._condition:
+            excess = max(0, min(len(self._idle), self._alive - keep))
+            surplus, self._idle = self._idle[:excess], self._idle[excess:]
+            self._alive -= excess
+            self._condition.notify_all()
+        for driver in surplus:
+            self._destroy(driver)
+
+    def close(self):
+        """Quits all idle drivers; drivers still in use are quit when released."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._alive -= len(idle)
+            self._condition.notify_all()
+        for driver in idle:
+            self._destroy(driver)
+
+    def _reset(self, driver):
+        """Clears cookies, cache, storage, extra tabs and timeout changes so the next URL starts clean."""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.set_script_timeout(SCRIPT_TIMEOUT_SECONDS)
+        if self.capture_network:
+            driver.get_log("performance")  # drop entries left over from the previous page
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+        driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": "https://www.facebook.com", "storageTypes": "all"})
+        driver.get("about:blank")
+
+    def _destroy(self, driver):
+        with self._condition:
+            profile_dir = self._profiles.pop(driver, None)
+            self._pages.pop(driver, None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"[POOL] Error quitting browser: {e}")
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
@@ -0,0 +1,199 @@
+"""
+Adaptive number of concurrent browsers.
+
+A fixed MAX_WORKERS is either too low for the runner or so high that Chrome
+thrashes and pages time out. With ADAPTIVE_WORKERS=1 the run starts with
+`min_workers` browsers and a `ConcurrencyController` thread re-evaluates the
+limit every `interval` seconds:
+
+- shrink by one when CPU use is above `cpu_high`, available memory is below
+  `min_free_mb`, or recent pages take more than `slow_factor` x their usual
+  time (from the scrape history), i.e. the browsers are getting in each
+  other's way;
+- grow by one when CPU is below `cpu_low`, there is twice `min_free_mb` of
+  memory free, pages run at their usual speed and every slot is busy.
+
+CPU and memory come from psutil when installed, otherwise from the load
+average and /proc/meminfo. `RetryQueue` collects the URLs whose scrape failed
+so they can be retried once the main pass is done.
+"""
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+def cpu_percent():
+    """System-wide CPU use in percent since the previous call, None if unknown."""
+    if psutil is not None:
+        return psutil.cpu_percent(interval=None)
+    if hasattr(os, "getloadavg"):
+        return 100.0 * os.getloadavg()[0] / (os.cpu_count() or 1)
+    return None
+
+
+def available_memory_mb():
+    """Memory available for new processes in MB, None if unknown."""
+    if psutil is not None:
+        return psutil.virtual_memory().available / 1e6
+    try:
+        with open("/proc/meminfo", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024 / 1e6
+    except OSError:
+        pass
+    return None
+
+
+class ConcurrencyController:
+    """
+    Resizable limit on concurrent scrapes. Wrap the scrape function with
+    `wrap()`; `capacity()` is the current limit. `on_resize(limit)` is called
+    after every change (e.g. to quit idle browsers).
+    """
+
+    def __init__(self, min_workers, max_workers, expected_seconds=None, interval=30.0,
+                 cpu_low=60.0, cpu_high=85.0, min_free_mb=1000.0, slow_factor=1.5, on_resize=None):
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.expected_seconds = expected_seconds
+        self.interval = interval
+        self.cpu_low = cpu_low
+        self.cpu_high = cpu_high
+        self.min_free_mb = min_free_mb
+        self.slow_factor = slow_factor
+        self.on_resize = on_resize
+        self._limit = self.min_workers
+        self._active = 0
+        self._condition = threading.Condition()
+        self._slowdowns = deque(maxlen=5)  # recent page time / usual page time
+        self._stop = threading.Event()
+        self._thread = None
+        self.changes = 0
+        self.peak = self._limit
+        cpu_percent()  # prime psutil's measurement window
+
+    def capacity(self):
+        with self._condition:
+            return self._limit
+
+    def wrap(self, scrape):
+        """Returns `scrape(url)` gated by the current limit, recording each page's time."""
+        def limited_scrape(url):
+            with self._condition:
+                while self._active >= self._limit:
+                    self._condition.wait()
+                self._active += 1
+            # Taken before the scrape, which may update the history
+            expected = self.expected_seconds(url) if self.expected_seconds else None
+            start = time.time()
+            try:
+                return scrape(url)
+            finally:
+                if expected:
+                    self._record(time.time() - start, expected)
+                with self._condition:
+                    self._active -= 1
+                    self._condition.notify()
+        return limited_scrape
+
+    def _record(self, seconds, expected):
+        with self._condition:
+            self._slowdowns.append(seconds / expected)
+
+    def _decide(self):
+        """Returns (+1, 0 or -1, reason) from the current system state."""
+        cpu = cpu_percent()
+        free_mb = available_memory_mb()
+        with self._condition:
+            slowdown = statistics.median(self._slowdowns) if self._slowdowns else None
+            saturated = self._active >= self._limit
+
+        if cpu is not None and cpu > self.cpu_high:
+            return -1, f"CPU at {cpu:.0f}%"
+        if free_mb is not None and free_mb < self.min_free_mb:
+            return -1, f"only {free_mb:.0f} MB memory available"
+        if slowdown is not None and slowdown > self.slow_factor:
+            return -1, f"pages take {slowdown:.1f}x their usual time"
+        if (saturated and (cpu is None or cpu < self.cpu_low)
+                and (free_mb is None or free_mb > 2 * self.min_free_mb)
+                and (slowdown is None or slowdown < 1.2)):
+            return 1, f"CPU at {cpu if cpu is not None else 0:.0f}%, {free_mb or 0:.0f} MB available"
+        return 0, None
+
+    def adjust(self):
+        """Re-evaluates the limit once. Returns the new limit."""
+        step, reason = self._decide()
+        with self._condition:
+            new_limit = min(self.max_workers, max(self.min_workers, self._limit + step))
+            if new_limit == self._limit:
+                return new_limit
+            old_limit, self._limit = self._limit, new_limit
+            self.changes += 1
+            self.peak = max(self.peak, new_limit)
+            if step < 0:
+                self._slowdowns.clear()  # judge the new limit on its own pages
+            self._condition.notify_all()
+        logger.info(f"[ADAPTIVE] {'Growing' if step > 0 else 'Shrinking'} from {old_limit} to {new_limit} "
+                    f"concurrent browsers: {reason}.")
+        if self.on_resize:
+            self.on_resize(new_limit)
+        return new_limit
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.adjust()
+            except Exception as e:
+                logger.warning(f"[ADAPTIVE] Could not adjust the number of browsers: {e}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="concurrency-controller", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def summary(self):
+        return (f"final={self.capacity()}, peak={self.peak}, changes={self.changes} "
+                f"(bounds {self.min_workers}-{self.max_workers})")
+
+
+class RetryQueue:
+    """Collects the URLs whose scrape returned None, unless another attempt of the URL succeeded."""
+
+    def __init__(self):
+        self._failed = []
+        self._succeeded = set()
+        self._lock = threading.Lock()
+
+    def wrap(self, scrape):
+        def scrape_or_queue(url):
+            result = scrape(url)
+            with self._lock:
+                if result is not None:
+                    self._succeeded.add(url)
+                    if url in self._failed:
+                        self._failed.remove(url)
+                elif url not in self._failed and url not in self._succeeded:
+                    self._failed.append(url)
+            return result
+        return scrape_or_queue
+
+    def drain(self):
+        """Returns the failed URLs and empties the queue."""
+        with self._lock:
+            failed, self._failed = self._failed, []
+        return failed
@@ -0,0 +1,96 @@
+"""
+Run-wide deduplication of ad creatives for uploads.
+
+The same creative (text, headline, landing page, media) often runs under many
+library IDs, within one page and across competitors, and every copy used to
+be uploaded in full. With DEDUPE_CREATIVES=1 the content fields of each ad are
+replaced by a `creative_id`, a fingerprint of the ad text, headline,
+destination URL and normalized media URL. The payload carries a `creatives`
+map with the content of the creatives the API has not received yet in this
+run:
+
+    {"ads_data": {"123": {"library_id": "123", "creative_id": "9f2c...", ...}},
+     "creatives": {"9f2c...": {"ad_text": ..., "media_url": ..., ...}}}
+
+A creative counts as sent once a request carrying it was accepted, so a failed
+chunk never leaves the API with a dangling reference. Creative IDs are stable
+across runs. The receiving API has to resolve `creative_id` (see
+dev_api_server.py).
+"""
+import hashlib
+import json
+import threading
+from urllib.parse import urlparse
+
+# Fields moved from the ad records into the shared creative
+CREATIVE_FIELDS = ("ad_text", "headline_text", "destination_url", "media_type", "media_url", "thumbnail_url")
+
+
+def normalize_media_url(url):
+    """
+    Drops the parts of a media URL that change between copies of the same file:
+    the signed query string (oh=, oe=, _nc_*) and the fbcdn edge host.
+    """
+    if not url:
+        return None
+    parsed = urlparse(url)
+    host = "fbcdn" if parsed.netloc.endswith("fbcdn.net") else parsed.netloc
+    return f"{host}{parsed.path}"
+
+
+def creative_fingerprint(ad_data):
+    """Creative ID of an ad record, None for ads without any creative content."""
+    key = [ad_data.get("ad_text"), ad_data.get("headline_text"), ad_data.get("destination_url"),
+           ad_data.get("media_type"), normalize_media_url(ad_data.get("media_url"))]
+    if not any(key):
+        return None
+    return hashlib.sha1(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()[:20]
+
+
+class CreativeRegistry:
+    """
+    Creatives already accepted by the API in this run, safe to share between
+    threads. `ads_deduplicated` counts the ads of accepted uploads whose content
+    was left out.
+    """
+
+    def __init__(self):
+        self._sent = set()
+        self._lock = threading.Lock()
+        self.ads_deduplicated = 0
+
+    def dedupe(self, payload):
+        """
+        Returns (copy of `payload` whose ads reference their creative by ID, with
+        the creatives not sent yet in `creatives`; number of ads whose content
+        was left out because another ad or an earlier upload carries it).
+        """
+        with self._lock:
+            sent = set(self._sent)
+        ads_data, creatives, shared = {}, {}, 0
+        for library_id, ad_data in payload["ads_data"].items():
+            creative_id = creative_fingerprint(ad_data)
+            if creative_id is None:
+                ads_data[library_id] = ad_data
+                continue
+            if creative_id in sent or creative_id in creatives:
+                shared += 1
+            else:
+                creatives[creative_id] = {field: ad_data.get(field) for field in CREATIVE_FIELDS}
+            ads_data[library_id] = {
+                **{field: value for field, value in ad_data.items() if field not in CREATIVE_FIELDS},
+                "creative_id": creative_id,
+            }
+        return {**payload, "ads_data": ads_data, "creatives": creatives}, shared
+
+    def mark_sent(self, payload):
+        """
+        Records the creatives of an accepted payload and counts its ads whose
+        content was left out: every ad referencing a creative, less the one
+        that carries each creative of the payload.
+        """
+        creatives = payload.get("creatives") or {}
+        referencing = sum(1 for ad_data in payload["ads_data"].values() if ad_data.get("creative_id"))
+        with self._lock:
+            self._sent.update(creatives)
+            self.ads_deduplicated += referencing - len(creatives)
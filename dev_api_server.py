@@ -0,0 +1,128 @@
+"""
+Local stand-in for the Gems API, for exercising the scraper without the real backend.
+
+Implements the endpoints used by ad_nova_script.py and transcript_bot.py,
+accepts gzip-compressed request bodies, keeps everything in memory and can
+fail a share of uploads to exercise the retry logic. DEV_API_FAIL_RATE fails
+uploads before storing them (503); DEV_API_LOST_RESPONSE_RATE stores them and
+then answers 504, as a proxy timing out would. A repeated Idempotency-Key gets
+the first response again without storing the upload twice:
+
+    DEV_API_FAIL_RATE=0.1 DEV_API_LOST_RESPONSE_RATE=0.1 uvicorn dev_api_server:app --port 8000
+    API_BASE_URL=http://127.0.0.1:8000 UPLOAD_CHUNK_SIZE=200 UPLOAD_GZIP=1 UPLOAD_RETRIES=2 python ad_nova_script.py
+
+GET /dev/stats shows what was received.
+"""
+import gzip
+import json
+import os
+import random
+import threading
+
+from fastapi import FastAPI, HTTPException, Request
+
+FAIL_RATE = float(os.getenv("DEV_API_FAIL_RATE", "0"))
+LOST_RESPONSE_RATE = float(os.getenv("DEV_API_LOST_RESPONSE_RATE", "0"))
+COMPETITOR_URLS = [u for u in os.getenv("DEV_API_COMPETITOR_URLS", "").split(",") if u]
+
+app = FastAPI(title="Gems API stand-in")
+
+_lock = threading.Lock()
+_ads = {}            # library_id -> ad record
+_creatives = {}      # creative_id -> creative fields (DEDUPE_CREATIVES uploads)
+_pages = {}          # page_link -> page fields of the last upload
+_responses = {}      # Idempotency-Key -> response of the upload stored under it
+_stats = {"requests": 0, "failed_on_purpose": 0, "responses_lost_on_purpose": 0, "repeated_keys": 0,
+          "bytes_received": 0, "gzip_requests": 0}
+_transcripts = {}
+
+
+async def _json_body(request: Request):
+    body = await request.body()
+    with _lock:
+        _stats["requests"] += 1
+        _stats["bytes_received"] += len(body)
+    if request.headers.get("content-encoding") == "gzip":
+        with _lock:
+            _stats["gzip_requests"] += 1
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+
+def _maybe_fail():
+    if FAIL_RATE and random.random() < FAIL_RATE:
+        with _lock:
+            _stats["failed_on_purpose"] += 1
+        raise HTTPException(status_code=503, detail="Injected failure")
+
+
+@app.delete("/api/cleanup-ads")
+def cleanup_ads(delete_date: str):
+    with _lock:
+        deleted = len(_ads)
+        _ads.clear()
+        _pages.clear()
+    return {"message": f"Deleted data for {delete_date}", "deleted_records": deleted}
+
+
+@app.post("/api/ad-details")
+async def ad_details(request: Request):
+    payload = await _json_body(request)
+    key = request.headers.get("idempotency-key")
+    with _lock:
+        if key in _responses:
+            _stats["repeated_keys"] += 1
+            return _responses[key]
+    _maybe_fail()
+    ads_data = payload.get("ads_data") or {}
+    with _lock:
+        # Deduplicated uploads reference their creative by ID; store the ads expanded
+        _creatives.update(payload.get("creatives") or {})
+        for library_id, ad in ads_data.items():
+            if ad.get("creative_id"):
+                if ad["creative_id"] not in _creatives:
+                    raise HTTPException(status_code=422, detail=f"Unknown creative_id {ad['creative_id']}")
+                ads_data[library_id] = {**_creatives[ad["creative_id"]], **ad}
+        _ads.update(ads_data)
+        # Delta uploads list the ads no longer shown on the page
+        for library_id in payload.get("inactive_library_ids") or ():
+            if library_id in _ads:
+                _ads[library_id]["active"] = False
+        _pages[payload.get("page_link")] = {k: v for k, v in payload.items() if k not in ("ads_data", "inactive_library_ids", "creatives")}
+        response = {"status": "success", "message": "Ads stored", "total_processed": len(ads_data)}
+        if key:
+            _responses[key] = response
+        if LOST_RESPONSE_RATE and random.random() < LOST_RESPONSE_RATE:
+            _stats["responses_lost_on_purpose"] += 1
+            raise HTTPException(status_code=504, detail="Injected lost response")
+    return response
+
+
+@app.get("/api/get_competitors_url_git")
+def get_competitors_urls():
+    return [{"page_link": url} for url in COMPETITOR_URLS]
+
+
+@app.get("/api/videos_to_transcribe")
+def videos_to_transcribe():
+    with _lock:
+        return [
+            {"id": i, "media_url": ad["media_url"]}
+            for i, ad in enumerate(_ads.values(), 1)
+            if ad.get("media_type") == "video" and ad.get("media_url") and i not in _transcripts
+        ]
+
+
+@app.put("/api/update_transcript/{video_id}")
+async def update_transcript(video_id: int, request: Request):
+    payload = await _json_body(request)
+    with _lock:
+        _transcripts[video_id] = payload.get("transcript")
+    return {"status": "success"}
+
+
+@app.get("/dev/stats")
+def stats():
+    with _lock:
+        return {**_stats, "ads": len(_ads), "pages": len(_pages), "creatives": len(_creatives),
+                "transcripts": len(_transcripts)}
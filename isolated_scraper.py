@@ -0,0 +1,234 @@
+"""
+Supervised worker processes for scraping, one browser each.
+
+In threads mode a hung Chrome or a runaway DOM stalls its worker thread for
+good: `set_page_load_timeout` only covers the initial `get`, and nothing can
+stop a thread stuck in a WebDriver call. `IsolatedScraper` runs the scraping
+function in `max_workers` long-lived worker processes instead (each keeps its
+own warm BrowserPool of one driver). A page that runs over its wall-clock
+budget, or whose process tree (worker + chromedriver + Chrome) grows past the
+RSS ceiling, gets its worker killed with the whole process group; the next
+page starts a fresh worker. Results come back over a pipe, log records over a
+queue.
+
+The RSS ceiling needs psutil (in requirements.txt); without it the ceiling is
+disabled with a warning and only the time budget is enforced. RSS is summed
+over the tree, so pages shared between Chrome processes are counted more than
+once - leave some margin.
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+import scrape_metrics
+from scrape_logging import child_log_listener, page_context, page_label, setup_child_logging
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(conn, log_queue, log_level, temp_dir, scrape, pool_options):
+    """Worker process: scrapes the URLs received on `conn` until it receives None."""
+    if hasattr(os, "setsid"):
+        # Own process group, so the supervisor can kill chromedriver and Chrome with the worker
+        os.setsid()
+    # Chrome profiles and Chrome's own temp files go where the supervisor can delete them
+    os.environ["TMPDIR"] = temp_dir
+    tempfile.tempdir = temp_dir
+    setup_child_logging(log_queue, log_level)
+
+    from browser_pool import BrowserPool
+
+    pool = BrowserPool(max_size=1, **pool_options)
+    try:
+        while True:
+            url = conn.recv()
+            if url is None:
+                break
+            result = scrape(url, pool)
+            conn.send((result, scrape_metrics.page(url).to_dict()))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        pool.close()
+
+
+class _Worker:
+    def __init__(self, context, log_queue, scrape, pool_options):
+        self.temp_dir = tempfile.mkdtemp(prefix="gems_worker_")
+        self.conn, child_conn = context.Pipe()
+        # Not a daemon: the snapshot parser starts its own process pool inside the worker
+        self.process = context.Process(
+            target=_worker_main, name="scrape-worker",
+            args=(child_conn, log_queue, logging.getLogger().level, self.temp_dir, scrape, pool_options))
+        self.process.start()
+        child_conn.close()
+
+    def rss_bytes(self):
+        """RSS of the worker and all its descendants, None without psutil."""
+        if psutil is None:
+            return None
+        try:
+            root = psutil.Process(self.process.pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def stop(self, timeout=30):
+        """Asks the worker to close its browser and exit; kills it if it doesn't."""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            try:
+                if hasattr(os, "killpg"):
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                else:
+                    self.process.kill()
+            except (ProcessLookupError, PermissionError):
+                self.process.kill()
+            self.process.join(10)
+        self.conn.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+class IsolatedScraper:
+    """
+    Callable `scraper(url)` -> page payload or None, running `scrape(url, pool)`
+    in up to `max_workers` supervised processes. `scrape` must be picklable (a
+    module-level function); `pool_options` are the BrowserPool arguments.
+    timeout_seconds / max_rss_mb of 0 disable the respective limit.
+    """
+
+    def __init__(self, scrape, max_workers, pool_options, timeout_seconds=3600, max_rss_mb=4000, poll_seconds=2):
+        self.scrape = scrape
+        self.max_workers = max_workers
+        self.pool_options = pool_options
+        self.timeout_seconds = timeout_seconds
+        self.max_rss_bytes = max_rss_mb * 1e6 if psutil is not None else 0
+        self.poll_seconds = poll_seconds
+        self.kills = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._log_queue = self._context.Queue()
+        self._log_listener = child_log_listener(self._log_queue)
+        self._log_listener.start()
+        self._idle = []
+        self._alive = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        if max_rss_mb and psutil is None:
+            logger.warning(f"psutil is not installed, so the {max_rss_mb:.0f} MB RSS ceiling is DISABLED; only the "
+                           f"time budget is enforced. Install it with `pip install psutil`.")
+
+    def _acquire(self):
+        with self._condition:
+            while not self._closed and not self._idle and self._alive >= self.max_workers:
+                self._condition.wait()
+            if self._closed:
+                raise RuntimeError("IsolatedScraper is closed")
+            if self._idle:
+                return self._idle.pop()
+            self._alive += 1
+        try:
+            return _Worker(self._context, self._log_queue, self.scrape, self.pool_options)
+        except Exception:
+            with self._condition:
+                self._alive -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, worker, killed=False):
+        if killed:
+            worker.kill()  # before freeing the slot, so the old Chrome is gone when a new one starts
+        with self._condition:
+            retire = killed or self._closed
+            if retire:
+                self._alive -= 1
+            else:
+                self._idle.append(worker)
+            self._condition.notify()
+        if retire and not killed:
+            worker.stop()
+
+    def _breach(self, worker, started):
+        """Returns why `worker` has to be killed, or None."""
+        if not worker.process.is_alive():
+            return f"worker process died (exit code {worker.process.exitcode})"
+        elapsed = time.time() - started
+        if self.timeout_seconds and elapsed > self.timeout_seconds:
+            return f"still running after {elapsed:.0f}s (budget {self.timeout_seconds:.0f}s)"
+        if self.max_rss_bytes:
+            rss = worker.rss_bytes()
+            if rss is not None and rss > self.max_rss_bytes:
+                return f"browser process tree uses {rss / 1e6:.0f} MB (ceiling {self.max_rss_bytes / 1e6:.0f} MB)"
+        return None
+
+    def __call__(self, url):
+        worker = self._acquire()
+        started = time.time()
+        try:
+            worker.conn.send(url)
+            while not worker.conn.poll(self.poll_seconds):
+                reason = self._breach(worker, started)
+                if reason:
+                    break
+            else:
+                result, page_metrics = worker.conn.recv()
+                scrape_metrics.page(url).merge(page_metrics)
+                self._release(worker)
+                return result
+        except (EOFError, OSError) as e:
+            reason = f"lost the connection to the worker ({type(e).__name__})"
+
+        with page_context(page_label(url)):
+            logger.error(f"[WATCHDOG] Killing the scrape of {url}: {reason}. A fresh worker takes the next page.")
+        metrics = scrape_metrics.page(url)
+        metrics.set_status("killed")
+        metrics.add_time("total", time.time() - started)
+        metrics.incr("watchdog_kills")
+        with self._condition:
+            self.kills += 1
+        self._release(worker, killed=True)
+        return None
+
+    def trim_idle(self, keep):
+        """Stops idle workers until at most `keep` workers are alive."""
+        with self._condition:
+            excess = max(0, min(len(self._idle), self._alive - keep))
+            surplus, self._idle = self._idle[:excess], self._idle[excess:]
+            self._alive -= excess
+            self._condition.notify_all()
+        for worker in surplus:
+            worker.stop()
+
+    def close(self):
+        """Stops the idle workers; busy ones are stopped when their page finishes."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._alive -= len(idle)
+            self._condition.notify_all()
+        for worker in idle:
+            worker.stop()
+        self._log_listener.stop()
@@ -0,0 +1,207 @@
+"""
+Local content-addressed store for ad media, filled while the scraper runs.
+
+fbcdn media URLs are signed and expire, and transcript_bot.py used to download
+every video again later, sometimes after the link had died. With
+MEDIA_PREFETCH=1 the scraper hands each scraped page to a `MediaPrefetcher`,
+which downloads its videos on a few background threads (bandwidth-limited)
+while the browsers go on with the next pages. Files are stored by the SHA-256
+of their content:
+
+    media_store/objects/ab/abcdef....mp4
+    media_store/index.sqlite3          normalized media URL -> sha256
+
+The URL key drops the signature and the edge host (see
+creative_registry.normalize_media_url), so the same video seen on several
+pages, in several runs or by the transcription worker is fetched only once.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from creative_registry import normalize_media_url
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+
+
+class MediaStore:
+    """Content-addressed media files plus a SQLite `url -> sha256` index, safe to share between threads."""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS media (
+                    url_key    TEXT PRIMARY KEY,
+                    sha256     TEXT NOT NULL,
+                    size       INTEGER NOT NULL,
+                    extension  TEXT NOT NULL,
+                    fetched_at TEXT NOT NULL
+                )
+            """)
+
+    def _object_path(self, sha256, extension):
+        return os.path.join(self.root, "objects", sha256[:2], sha256 + extension)
+
+    def path_for_url(self, url):
+        """Local path of the media behind `url`, or None if it isn't in the store."""
+        with self._lock:
+            row = self._conn.execute("SELECT sha256, extension FROM media WHERE url_key = ?",
+                                     (normalize_media_url(url),)).fetchone()
+        if row is None:
+            return None
+        path = self._object_path(*row)
+        return path if os.path.exists(path) else None
+
+    def add_stream(self, url, chunks):
+        """Stores the bytes of `chunks` as the content of `url`. Returns the object path."""
+        extension = os.path.splitext(url.split("?")[0])[1][:8] or ".bin"
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            if not size:
+                raise ValueError(f"Empty download for {url}")
+            sha256 = digest.hexdigest()
+            path = self._object_path(sha256, extension)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(tmp_path)  # same content under another URL
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media (url_key, sha256, size, extension, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (normalize_media_url(url), sha256, size, extension, datetime.now().isoformat(timespec="seconds")))
+        return path
+
+    def add_file(self, url, file_path):
+        """Stores an already downloaded file (it is left in place). Returns the object path."""
+        def read_chunks():
+            with open(file_path, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    yield chunk
+        return self.add_stream(url, read_chunks())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class BandwidthLimiter:
+    """Token bucket shared by the download threads; 0 bytes per second means unlimited."""
+
+    def __init__(self, bytes_per_second):
+        self.rate = bytes_per_second
+        self._allowance = bytes_per_second
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._allowance = min(self.rate, self._allowance + (now - self._last) * self.rate) - size
+            self._last = now
+            wait = -self._allowance / self.rate if self._allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class MediaPrefetcher:
+    """
+    Downloads the media of scraped pages into a MediaStore in the background.
+    `submit_page()` returns right away; `close()` waits for the queued downloads.
+    """
+
+    def __init__(self, store, workers=2, max_mbps=0, media_types=("video",), timeout=60):
+        self.store = store
+        self.media_types = media_types
+        self.timeout = timeout
+        self.limiter = BandwidthLimiter(max_mbps * 1_000_000 / 8)
+        self._session = requests.Session()
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=workers))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="media")
+        self._queued = set()
+        self._lock = threading.Lock()
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+
+    def submit_page(self, final_output):
+        """Queues the media of a page's ads that aren't in the store yet."""
+        queued = 0
+        for ad_data in final_output["ads_data"].values():
+            url = ad_data.get("media_url")
+            if not url or ad_data.get("media_type") not in self.media_types:
+                continue
+            key = normalize_media_url(url)
+            with self._lock:
+                if key in self._queued:
+                    continue
+                self._queued.add(key)
+            if self.store.path_for_url(url):
+                with self._lock:
+                    self.skipped += 1
+                continue
+            self._executor.submit(self._download, url)
+            queued += 1
+        if queued:
+            logger.info(f"Queued {queued} media downloads.")
+
+    def _chunks(self, response):
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            self.limiter.consume(len(chunk))
+            with self._lock:
+                self.bytes += len(chunk)
+            yield chunk
+
+    def _download(self, url):
+        try:
+            with self._session.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                self.store.add_stream(url, self._chunks(response))
+            with self._lock:
+                self.downloaded += 1
+        except Exception as e:
+            logger.warning(f"Media prefetch failed for {url.split('?')[0]}: {type(e).__name__}: {e}")
+            with self._lock:
+                self.failed += 1
+                # Another page may carry a fresh link to the same video later in the run
+                self._queued.discard(normalize_media_url(url))
+
+    def summary(self):
+        with self._lock:
+            return (f"downloaded={self.downloaded} ({self.bytes / 1e6:.1f} MB), already stored={self.skipped}, "
+                    f"failed={self.failed}")
+
+    def close(self):
+        """Waits for the queued downloads to finish."""
+        self._executor.shutdown(wait=True)
+        self._session.close()
@@ -0,0 +1,225 @@
+"""
+Ad extraction from the Ad Library's own JSON responses.
+
+The Ad Library renders the first ads from JSON embedded in the page and loads
+the rest through background GraphQL requests while scrolling. With Chrome's
+performance log enabled, `NetworkAdCollector` reads those responses over the
+DevTools protocol and builds the `ads_data` records straight from the JSON,
+without any DOM queries or obfuscated class names.
+
+The JSON handling is a plain function of the response text, so it can be
+checked against recorded responses:
+
+    python network_capture.py recorded_response.json [more_responses.json ...]
+"""
+import base64
+import json
+import logging
+import re
+import sys
+from datetime import datetime
+
+from selenium.common.exceptions import WebDriverException
+
+logger = logging.getLogger(__name__)
+
+# Background requests carrying the ad search results
+GRAPHQL_PATH = "/api/graphql/"
+
+# JSON platform/category names -> names used by the DOM extraction (see ad_fields.py)
+PLATFORM_NAMES = {
+    "FACEBOOK": "Facebook",
+    "INSTAGRAM": "Instagram",
+    "AUDIENCE_NETWORK": "Audience Network",
+    "MESSENGER": "Messenger",
+    "THREADS": "Thread",
+}
+CATEGORY_NAMES = {
+    "EMPLOYMENT": "Employment",
+    "HOUSING": "Housing",
+    "CREDIT": "Financial products and services",
+    "FINANCIAL_PRODUCTS_AND_SERVICES": "Financial products and services",
+}
+
+EMBEDDED_JSON_PATTERN = re.compile(r'<script type="application/json"[^>]*>(.*?)</script>', re.DOTALL)
+
+
+def enable_performance_logging(options):
+    """Turns on Chrome's performance (network) log for a driver about to be created."""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+
+def _first_item(items):
+    return items[0] if items else {}
+
+
+def build_ad_record_from_json(node):
+    """Builds an `ads_data` record from one ad node of the Ad Library JSON."""
+    snapshot = node.get("snapshot") or {}
+    card = _first_item(snapshot.get("cards"))
+
+    ad_data = {"library_id": str(node["ad_archive_id"])}
+
+    # Local date, like the "Started running on" text the DOM extractors parse
+    start_date = node.get("start_date")
+    ad_data["started_running"] = datetime.fromtimestamp(start_date).strftime("%Y-%m-%d") if start_date else None
+    # The page shows "Total active time" as pre-formatted text that the JSON doesn't carry
+    ad_data["total_active_time"] = None
+
+    ad_data["platforms"] = [PLATFORM_NAMES.get(platform) for platform in node.get("publisher_platform") or []]
+    ad_data["categories"] = [
+        CATEGORY_NAMES.get(category, "Unknown")
+        for category in node.get("categories") or [] if category != "UNKNOWN"
+    ]
+
+    # "N ads use this creative and text." is only shown for collated ads
+    collation_count = node.get("collation_count")
+    ad_data["ads_count"] = str(collation_count) if collation_count and collation_count > 1 else None
+
+    body = snapshot.get("body") or {}
+    ad_text = body.get("text") or card.get("body")
+    ad_data["ad_text"] = ad_text.strip() if ad_text else None
+
+    link_url = snapshot.get("link_url") or card.get("link_url")
+    if link_url:
+        ad_data["destination_url"] = link_url
+
+    ad_data["media_type"] = None
+    ad_data["media_url"] = None
+    ad_data["thumbnail_url"] = None
+    video = _first_item(snapshot.get("videos")) or (card if card.get("video_sd_url") or card.get("video_hd_url") else {})
+    image = _first_item(snapshot.get("images")) or card
+    if video.get("video_sd_url") or video.get("video_hd_url"):
+        ad_data["media_type"] = "video"
+        ad_data["media_url"] = video.get("video_sd_url") or video.get("video_hd_url")
+        ad_data["thumbnail_url"] = video.get("video_preview_image_url")
+    elif image.get("resized_image_url") or image.get("original_image_url"):
+        ad_data["media_type"] = "image"
+        ad_data["media_url"] = image.get("resized_image_url") or image.get("original_image_url")
+
+    ad_data["cta_button_text"] = snapshot.get("cta_text") or card.get("cta_text")
+    ad_data["headline_text"] = snapshot.get("title") or card.get("title")
+    return ad_data
+
+
+def _find_ad_nodes(value):
+    """Yields every dict in a decoded JSON document that describes an ad."""
+    if isinstance(value, dict):
+        if "ad_archive_id" in value and "snapshot" in value:
+            yield value
+            return
+        for child in value.values():
+            yield from _find_ad_nodes(child)
+    elif isinstance(value, list):
+        for child in value:
+            yield from _find_ad_nodes(child)
+
+
+def ads_from_payload(text):
+    """
+    Returns the ad records found in a GraphQL response body or embedded JSON blob.
+    Handles the `for (;;);` guard and responses made of several JSON documents.
+    """
+    if text.startswith("for (;;);"):
+        text = text[len("for (;;);"):]
+    if "ad_archive_id" not in text:
+        return []
+    try:
+        documents = [json.loads(text)]
+    except json.JSONDecodeError:
+        documents = []
+        for chunk in text.splitlines():
+            if "ad_archive_id" not in chunk:
+                continue
+            try:
+                documents.append(json.loads(chunk))
+            except json.JSONDecodeError:
+                continue
+
+    records = []
+    for document in documents:
+        for node in _find_ad_nodes(document):
+            try:
+                records.append(build_ad_record_from_json(node))
+            except Exception as e:
+                logger.warning(f"Could not build ad record from JSON node: {e}")
+    return records
+
+
+class NetworkAdCollector:
+    """
+    Collects ads from the responses in the driver's performance log.
+    `collect(driver)` drains the log, so call it regularly while scrolling -
+    Chrome only keeps response bodies around for a limited time.
+    """
+
+    def __init__(self):
+        self.ads_data = {}
+        self.responses_read = 0
+        self._pending_requests = set()
+
+    @property
+    def total_child_ads_found(self):
+        # Collated ads stand for "N ads use this creative and text.", as counted on the page
+        return sum(int(ad_data["ads_count"]) if ad_data.get("ads_count") else 1 for ad_data in self.ads_data.values())
+
+    def add_payload(self, text):
+        new_ads = 0
+        for ad_data in ads_from_payload(text):
+            if ad_data["library_id"] not in self.ads_data:
+                new_ads += 1
+            self.ads_data[ad_data["library_id"]] = ad_data
+        return new_ads
+
+    def collect_initial(self, page_source):
+        """Reads the ads embedded in the page HTML (the first batch is not fetched over XHR)."""
+        new_ads = 0
+        for blob in EMBEDDED_JSON_PATTERN.findall(page_source):
+            if "ad_archive_id" in blob:
+                new_ads += self.add_payload(blob)
+        return new_ads
+
+    def collect(self, driver):
+        """Reads the GraphQL responses logged since the previous call. Returns the number of new ads."""
+        new_ads = 0
+        for entry in driver.get_log("performance"):
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+
+            if method == "Network.responseReceived":
+                if GRAPHQL_PATH in params.get("response", {}).get("url", ""):
+                    self._pending_requests.add(params["requestId"])
+            elif method == "Network.loadingFinished" and params.get("requestId") in self._pending_requests:
+                request_id = params["requestId"]
+                self._pending_requests.discard(request_id)
+                try:
+                    response = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+                except WebDriverException:
+                    continue  # body already evicted
+                body = response.get("body", "")
+                if response.get("base64Encoded"):
+                    body = base64.b64decode(body).decode("utf-8", errors="replace")
+                self.responses_read += 1
+                new_ads += self.add_payload(body)
+
+        if new_ads:
+            logger.debug(f"Captured {new_ads} new ads from network responses ({len(self.ads_data)} so far)")
+        return new_ads
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    if len(sys.argv) < 2:
+        print("Usage: python network_capture.py recorded_response.json [more_responses.json ...]")
+        sys.exit(1)
+
+    collector = NetworkAdCollector()
+    for path in sys.argv[1:]:
+        with open(path, encoding="utf-8") as f:
+            collector.add_payload(f.read())
+    print(json.dumps({"total_ads_found": collector.total_child_ads_found, "ads_data": collector.ads_data},
+                     indent=4, ensure_ascii=False))
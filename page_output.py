@@ -0,0 +1,158 @@
+"""
+Compact output files for scraped pages.
+
+`json.dump(..., indent=4)` spends most of each ad_data_<id>.json on
+whitespace. Pages can also be written as gzipped NDJSON instead: a header line
+`{"page": {...}}` with the page fields, then one ad record per line. The file
+is streamed to `<name>.part` and renamed into place once complete, so a crash
+never leaves a truncated file behind under the final name. The scraper still
+builds each page in memory (uploads, MAX_ADS_PER_PAGE and delta uploads need
+all of its ads) and writes it once extraction is done, so this saves disk
+space and artifact size, not peak memory.
+
+`RunArchive` collects every page of a run in one file
+(ads_data_<date>.ndjson.gz) for the CI artifact. Each page is appended as a
+separate gzip member, which gzip readers treat as one continuous stream, so
+the archive stays readable up to the last complete page. A page scraped again
+after a resume can appear twice; readers keep the last copy.
+"""
+import gzip
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+
+NDJSON_SUFFIX = ".ndjson.gz"
+
+
+def default_archive_path():
+    return f"ads_data_{datetime.now().strftime('%Y-%m-%d')}{NDJSON_SUFFIX}"
+
+
+def _line(record):
+    return (json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _page_lines(final_output):
+    yield _line({"page": {key: value for key, value in final_output.items() if key != "ads_data"}})
+    for ad_data in final_output["ads_data"].values():
+        yield _line(ad_data)
+
+
+class PageWriter:
+    """
+    Streams one page to `path` as gzipped NDJSON. Write the page fields with
+    the constructor, then `append()` the ads; `close()` moves the file into
+    place. Used as a context manager, an exception discards the partial file.
+    write_page() feeds it from a finished page payload.
+    """
+
+    def __init__(self, path, page_fields, compresslevel=6):
+        self.path = path
+        self._part_path = path + ".part"
+        self._file = gzip.open(self._part_path, "wb", compresslevel=compresslevel)
+        self._file.write(_line({"page": page_fields}))
+        self.ads = 0
+
+    def append(self, ad_data):
+        self._file.write(_line(ad_data))
+        self.ads += 1
+
+    def close(self):
+        self._file.close()
+        os.replace(self._part_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._part_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_page(path, final_output):
+    """Writes a page payload to `path` as gzipped NDJSON."""
+    with PageWriter(path, {key: value for key, value in final_output.items() if key != "ads_data"}) as writer:
+        for ad_data in final_output["ads_data"].values():
+            writer.append(ad_data)
+
+
+def _read_pages(lines):
+    page = None
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if "page" in record and "library_id" not in record:
+            if page is not None:
+                yield page
+            page = {**record["page"], "ads_data": {}}
+        elif page is not None:
+            page["ads_data"][record["library_id"]] = record
+    if page is not None:
+        yield page
+
+
+def read_pages(path):
+    """Yields the page payloads of a page file or a run archive, in file order."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        yield from _read_pages(f)
+
+
+def read_archive(path):
+    """
+    Returns the pages of a run archive, keeping the last copy of a page appended more
+    than once. The gzip members are read one by one, so an archive cut short by a
+    crashed run still gives every page before the incomplete one.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    pages = {}
+    while data:
+        decompressor = zlib.decompressobj(31)
+        try:
+            member = decompressor.decompress(data)
+        except zlib.error:
+            break
+        if not decompressor.eof:
+            break
+        data = decompressor.unused_data
+        for page in _read_pages(member.decode("utf-8").splitlines()):
+            pages[page.get("page_link")] = page
+    return list(pages.values())
+
+
+def read_page(path):
+    """Returns the page payload of a page file written by write_page()."""
+    for page in read_pages(path):
+        return page
+    raise ValueError(f"No page in {path}")
+
+
+class RunArchive:
+    """Appends the pages of a run to one gzipped NDJSON file, safe to share between threads."""
+
+    def __init__(self, path, compresslevel=6):
+        self.path = path
+        self.compresslevel = compresslevel
+        self.pages = 0
+        self._lock = threading.Lock()
+
+    def append(self, final_output):
+        # Compress outside the lock; only the append of the finished member is serialized
+        compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 31)  # 31: gzip container
+        member = [compressor.compress(line) for line in _page_lines(final_output)]
+        member.append(compressor.flush())
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.writelines(member)
+                f.flush()
+                os.fsync(f.fileno())
+            self.pages += 1
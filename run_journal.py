@@ -0,0 +1,124 @@
+"""
+Run journal for checkpointing and resuming long scraping runs.
+
+Every state change of a URL (pending -> scraped -> uploaded) is appended as one
+JSON line and flushed to disk right away, so a run that crashes or times out
+leaves a record of how far it got. A restarted run reads the journal back and:
+
+- skips URLs that were already uploaded,
+- re-uploads URLs that were scraped but not uploaded, from their saved page file,
+- scrapes only the URLs that are still pending,
+- does not repeat the destructive cleanup if it already ran.
+
+The journal is per date (like the cleanup), so tomorrow's run starts fresh;
+another run on the same day resumes until the journal file is deleted.
+"""
+import json
+import os
+import threading
+from datetime import datetime
+
+from page_output import NDJSON_SUFFIX, read_page
+
+PENDING = "pending"
+SCRAPED = "scraped"
+UPLOADED = "uploaded"
+
+_CLEANUP = "__cleanup__"
+
+
+def default_journal_path():
+    return f"run_journal_{datetime.now().strftime('%Y-%m-%d')}.jsonl"
+
+
+class RunJournal:
+    """Append-only JSON-lines journal of the URL states of one day's run, safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}  # url -> last journal entry
+        if os.path.exists(path):
+            self._load()
+        self.resumed = bool(self._entries)  # an earlier attempt of this run left a journal
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # line cut short by a crash
+                self._entries[entry["url"]] = entry
+
+    def _append(self, entry):
+        entry["time"] = datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            self._entries[entry["url"]] = entry
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    @property
+    def cleanup_done(self):
+        return _CLEANUP in self._entries
+
+    def record_cleanup(self):
+        self._append({"url": _CLEANUP, "state": "done"})
+
+    def state(self, url):
+        entry = self._entries.get(url)
+        return entry["state"] if entry else None
+
+    def start(self, urls):
+        """Registers the run's URLs; URLs already in the journal keep their state."""
+        for url in urls:
+            if url not in self._entries:
+                self._append({"url": url, "state": PENDING})
+
+    def urls_in_state(self, urls, state):
+        return [url for url in urls if self.state(url) == state]
+
+    def mark_scraped(self, final_output, output_file):
+        """
+        Records a scraped page and where its ads were written. Pages without a JSON
+        file (zero-results pages, failed writes) keep their payload in the journal.
+        """
+        entry = {"url": final_output["page_link"], "state": SCRAPED, "file": output_file,
+                 "ads": len(final_output["ads_data"])}
+        if output_file is None:
+            entry["payload"] = final_output
+        self._append(entry)
+
+    def mark_uploaded(self, url):
+        self._append({"url": url, "state": UPLOADED})
+
+    def load_payload(self, url):
+        """Returns the saved page payload of a scraped URL, or None if it can't be read."""
+        entry = self._entries.get(url) or {}
+        if entry.get("payload") is not None:
+            return entry["payload"]
+        if not entry.get("file"):
+            return None
+        try:
+            if entry["file"].endswith(NDJSON_SUFFIX):
+                return read_page(entry["file"])
+            with open(entry["file"], encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, EOFError, ValueError):
+            return None
+
+    def reset(self, url):
+        """Sends a URL back to pending, e.g. when its saved payload is lost."""
+        self._append({"url": url, "state": PENDING})
+
+    def summary(self, urls):
+        counts = {PENDING: 0, SCRAPED: 0, UPLOADED: 0}
+        for url in urls:
+            counts[self.state(url) or PENDING] += 1
+        return ", ".join(f"{state}={count}" for state, count in counts.items())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,159 @@
+"""
+Logging setup for scraping runs.
+
+The scraping threads log through a `QueueHandler`: emitting a record only puts
+it on a queue, and a `QueueListener` thread does the formatting and the
+console/file I/O, so slow CI log capture no longer stalls the extraction loop.
+
+Every record carries the page being scraped (`page` field, set with
+`page_context()` / `set_page()`), so the lines of concurrent workers can be
+told apart and filtered. LOG_FORMAT=json writes one JSON object per line.
+`ProgressLogger` turns per-item progress into at most one line every few seconds.
+Worker processes send their records back with `setup_child_logging()`, and the
+parent re-logs them through its own handlers with `child_log_listener()`.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - [%(page)s] %(message)s"
+
+# Chatty third-party loggers, only their warnings are kept
+QUIET_LOGGERS = ("selenium", "urllib3", "WDM", "asyncio")
+
+_current_page = contextvars.ContextVar("current_page", default="-")
+_listener = None
+
+
+def page_label(url):
+    """Short label of an Ad Library URL for log lines: the page id, the search keyword or the URL."""
+    query_params = parse_qs(urlparse(url).query)
+    if query_params.get("view_all_page_id"):
+        return query_params["view_all_page_id"][0]
+    if query_params.get("q"):
+        return f"q={query_params['q'][0]}"
+    return url
+
+
+def set_page(page):
+    """Tags the log records of the current thread with `page`. Returns a token for reset_page()."""
+    return _current_page.set(page)
+
+
+def reset_page(token):
+    _current_page.reset(token)
+
+
+@contextmanager
+def page_context(page):
+    token = set_page(page)
+    try:
+        yield
+    finally:
+        reset_page(token)
+
+
+class PageContextFilter(logging.Filter):
+    """Adds the current page to the record. Runs on the QueueHandler, i.e. in the thread that logs."""
+
+    def filter(self, record):
+        if not hasattr(record, "page"):  # records of worker processes already have it
+            record.page = _current_page.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "page": getattr(record, "page", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ProgressLogger:
+    """Logs progress lines at most once every `interval` seconds (the last one can be forced)."""
+
+    def __init__(self, logger, interval=10.0):
+        self.logger = logger
+        self.interval = interval
+        self._last = 0.0
+
+    def update(self, message, force=False):
+        now = time.monotonic()
+        if force or now - self._last >= self.interval:
+            self._last = now
+            self.logger.info(message)
+
+
+def setup_logging(log_dir="logs", level="INFO", json_format=False, name="scraper"):
+    """
+    Routes all logging through a queue to a console handler and logs/<name>_<timestamp>.log.
+    Returns the log file path. Calling it again does nothing.
+    """
+    global _listener
+    if _listener is not None:
+        return None
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = os.path.join(log_dir, f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(), logging.FileHandler(log_file, encoding="utf-8")]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(PageContextFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers[:] = [queue_handler]
+    for logger_name in QUIET_LOGGERS:
+        logging.getLogger(logger_name).setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return log_file
+
+
+class _Relog(logging.Handler):
+    def emit(self, record):
+        logging.getLogger(record.name).handle(record)
+
+
+def setup_child_logging(log_queue, level="INFO"):
+    """Sends all records of a worker process, tagged with their page, to `log_queue` (a multiprocessing queue)."""
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(PageContextFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers[:] = [queue_handler]
+    for logger_name in QUIET_LOGGERS:
+        logging.getLogger(logger_name).setLevel(logging.WARNING)
+
+
+def child_log_listener(log_queue):
+    """Returns a (not yet started) listener that logs the records of worker processes in this process."""
+    return logging.handlers.QueueListener(log_queue, _Relog())
+
+
+def shutdown_logging():
+    """Flushes the queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,205 @@
+"""
+Per-URL and per-run metrics of scraping runs.
+
+Every scraped URL gets a `PageMetrics` record (navigation, scroll and
+extraction time, scroll count, ads found vs processed, upload latency and
+bytes, time per field group in DOM extraction). At the end of a run
+`write_reports()` writes them to `logs/` as
+
+- scrape_metrics_<timestamp>.json: run summary plus one entry per URL,
+- gems_scrape_metrics.prom: Prometheus textfile (node_exporter textfile collector format).
+
+The records are shared by the scraping, writing and upload threads, so
+every update takes a lock.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+METRIC_PREFIX = "gems_scrape"
+
+
+class FieldTimer:
+    """Accumulates the time spent on each field group while walking the ad cards."""
+
+    def __init__(self):
+        self.totals = {}
+        self._last = time.perf_counter()
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    def lap(self, group):
+        """Adds the time since the previous lap (or start) to `group`."""
+        now = time.perf_counter()
+        self.totals[group] = self.totals.get(group, 0.0) + now - self._last
+        self._last = now
+
+
+class PageMetrics:
+    def __init__(self, url):
+        self.url = url
+        self.page_id = parse_qs(urlparse(url).query).get("view_all_page_id", [None])[0]
+        self.status = "started"
+        self.started_at = time.time()
+        self.timings = {}        # stage -> seconds
+        self.field_timings = {}  # field group -> seconds
+        self.counters = {}       # scroll_count, ads_found, ads_processed, upload_bytes, ...
+        self._lock = threading.Lock()
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_field_times(self, field_times):
+        with self._lock:
+            for group, seconds in field_times.items():
+                self.field_timings[group] = self.field_timings.get(group, 0.0) + seconds
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        with self._lock:
+            self.counters[name] = value
+
+    def set_status(self, status):
+        with self._lock:
+            self.status = status
+
+    def merge(self, record):
+        """Adds a `to_dict()` record of the same page, e.g. one sent back by a worker process."""
+        with self._lock:
+            self.status = record["status"]
+            for stage, seconds in record["timings"].items():
+                self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+            for group, seconds in record["field_timings"].items():
+                self.field_timings[group] = self.field_timings.get(group, 0.0) + seconds
+            self.counters.update(record["counters"])
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "url": self.url,
+                "page_id": self.page_id,
+                "status": self.status,
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+                "timings": {stage: round(seconds, 3) for stage, seconds in self.timings.items()},
+                "field_timings": {group: round(seconds, 3) for group, seconds in self.field_timings.items()},
+                "counters": dict(self.counters),
+            }
+
+
+class RunMetrics:
+    def __init__(self):
+        self.started_at = time.time()
+        self.info = {}
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def page(self, url):
+        """Returns the metrics record of `url`, creating it on first use."""
+        with self._lock:
+            if url not in self._pages:
+                self._pages[url] = PageMetrics(url)
+            return self._pages[url]
+
+    def pages(self):
+        with self._lock:
+            return [page.to_dict() for page in self._pages.values()]
+
+    def summary(self, pages=None):
+        pages = self.pages() if pages is None else pages
+        statuses, timings, field_timings, counters = {}, {}, {}, {}
+        for page in pages:
+            statuses[page["status"]] = statuses.get(page["status"], 0) + 1
+            for target, values in ((timings, page["timings"]), (field_timings, page["field_timings"]),
+                                   (counters, page["counters"])):
+                for name, value in values.items():
+                    target[name] = target.get(name, 0) + value
+        duration = time.time() - self.started_at
+        ads = counters.get("ads_processed", 0)
+        return {
+            **self.info,
+            "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "duration_seconds": round(duration, 1),
+            "pages": len(pages),
+            "pages_by_status": statuses,
+            "ads_per_second": round(ads / duration, 2) if duration else None,
+            "timings": {name: round(value, 3) for name, value in timings.items()},
+            "field_timings": {name: round(value, 3) for name, value in field_timings.items()},
+            "counters": counters,
+        }
+
+
+_run = RunMetrics()
+
+
+def page(url):
+    return _run.page(url)
+
+
+def set_run_info(**info):
+    _run.info.update(info)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_prometheus(summary, pages):
+    lines = []
+
+    def metric(name, help_text, samples, metric_type="gauge"):
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} {metric_type}")
+        for labels, value in samples:
+            label_text = ",".join(f'{key}="{_label(val)}"' for key, val in labels.items())
+            lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text
+                         else f"{METRIC_PREFIX}_{name} {value}")
+
+    metric("last_run_timestamp_seconds", "Start time of the last scraping run.", [({}, round(_run.started_at))])
+    metric("run_duration_seconds", "Duration of the last scraping run.", [({}, summary["duration_seconds"])])
+    metric("pages", "Pages of the last run by status.",
+           [({"status": status}, count) for status, count in summary["pages_by_status"].items()])
+    metric("field_seconds", "Time spent per field group in DOM extraction, whole run.",
+           [({"field": field}, seconds) for field, seconds in summary["field_timings"].items()])
+    metric("stage_seconds", "Time spent per stage and page.",
+           [({"page": p["page_id"] or p["url"], "stage": stage}, seconds)
+            for p in pages for stage, seconds in p["timings"].items()])
+    counter_names = sorted({name for p in pages for name in p["counters"]})
+    for name in counter_names:
+        metric(name, f"{name.replace('_', ' ').capitalize()} per page.",
+               [({"page": p["page_id"] or p["url"]}, p["counters"][name]) for p in pages if name in p["counters"]])
+    return "\n".join(lines) + "\n"
+
+
+def write_reports(log_dir="logs"):
+    """Writes the JSON summary and the Prometheus textfile. Returns (json_path, prom_path)."""
+    os.makedirs(log_dir, exist_ok=True)
+    pages = _run.pages()
+    summary = _run.summary(pages)
+
+    json_path = os.path.join(log_dir, f"scrape_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "pages": pages}, f, indent=4, ensure_ascii=False)
+
+    # Write then rename, so the textfile collector never reads a half-written file
+    prom_path = os.path.join(log_dir, f"{METRIC_PREFIX}_metrics.prom")
+    with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(format_prometheus(summary, pages))
+    os.replace(prom_path + ".tmp", prom_path)
+    return json_path, prom_path
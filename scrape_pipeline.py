@@ -0,0 +1,116 @@
+"""
+Asyncio orchestration of a scraping run.
+
+With the thread-per-URL model a worker's browser sits idle while its JSON file
+is written and its 60 s POST is in flight. Here the run is split into three
+stages connected by bounded queues:
+
+    scrape (browsers) -> write (JSON files) -> upload (API)
+
+Each stage has its own concurrency limit, so the browsers keep scraping the
+next URLs while earlier pages are being written and uploaded. The bounded
+queues stop scraping from running far ahead of slow uploads. The stage
+functions are plain blocking callables; they run on a dedicated thread pool.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class PipelineStats:
+    def __init__(self):
+        self.scraped = 0
+        self.scrape_failed = 0
+        self.written = 0
+        self.uploaded = 0
+        self.upload_failed = 0
+        self.stage_seconds = {"scrape": 0.0, "write": 0.0, "upload": 0.0}
+
+    def summary(self):
+        busy = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in self.stage_seconds.items())
+        return (f"scraped={self.scraped} (failed={self.scrape_failed}), written={self.written}, "
+                f"uploaded={self.uploaded} (failed={self.upload_failed}); busy time: {busy}")
+
+
+async def _run_stage(name, executor, stats, func, item):
+    """Runs one blocking stage call on the pool. Returns (ok, result)."""
+    loop = asyncio.get_running_loop()
+    start = time.time()
+    try:
+        return True, await loop.run_in_executor(executor, func, item)
+    except Exception as e:
+        logger.error(f"[PIPELINE] {name} stage failed: {type(e).__name__}: {e}")
+        return False, None
+    finally:
+        stats.stage_seconds[name] += time.time() - start
+
+
+async def _pipeline(urls, scrape, write, upload, scrape_concurrency, write_concurrency,
+                    upload_concurrency, queue_size):
+    stats = PipelineStats()
+    executor = ThreadPoolExecutor(max_workers=scrape_concurrency + write_concurrency + upload_concurrency,
+                                  thread_name_prefix="pipeline")
+    url_queue = asyncio.Queue()
+    write_queue = asyncio.Queue(maxsize=queue_size)
+    upload_queue = asyncio.Queue(maxsize=queue_size)
+    for url in urls:
+        url_queue.put_nowait(url)
+
+    async def scrape_worker():
+        while not url_queue.empty():
+            url = url_queue.get_nowait()
+            ok, result = await _run_stage("scrape", executor, stats, scrape, url)
+            if not ok or result is None:
+                stats.scrape_failed += 1
+                continue
+            stats.scraped += 1
+            await write_queue.put(result)
+
+    async def write_worker():
+        while (result := await write_queue.get()) is not _DONE:
+            ok, _ = await _run_stage("write", executor, stats, write, result)
+            stats.written += ok
+            # Upload even if the local copy could not be written
+            await upload_queue.put(result)
+
+    async def upload_worker():
+        while (result := await upload_queue.get()) is not _DONE:
+            ok, uploaded = await _run_stage("upload", executor, stats, upload, result)
+            if ok and uploaded:
+                stats.uploaded += 1
+            else:
+                stats.upload_failed += 1
+
+    try:
+        scrapers = [asyncio.create_task(scrape_worker()) for _ in range(scrape_concurrency)]
+        writers = [asyncio.create_task(write_worker()) for _ in range(write_concurrency)]
+        uploaders = [asyncio.create_task(upload_worker()) for _ in range(upload_concurrency)]
+
+        # Shut the stages down in order, each once the previous one has drained
+        await asyncio.gather(*scrapers)
+        for _ in writers:
+            await write_queue.put(_DONE)
+        await asyncio.gather(*writers)
+        for _ in uploaders:
+            await upload_queue.put(_DONE)
+        await asyncio.gather(*uploaders)
+    finally:
+        executor.shutdown(wait=True)
+    return stats
+
+
+def run_pipeline(urls, scrape, write, upload, scrape_concurrency=2, write_concurrency=1,
+                 upload_concurrency=2, queue_size=4):
+    """
+    Runs scrape -> write -> upload over `urls` with per-stage concurrency limits.
+    `scrape(url)` returns a page payload (None = failed), `write(payload)` and
+    `upload(payload)` consume it; `upload` returns a false value if the upload
+    failed. Returns the run's PipelineStats.
+    """
+    return asyncio.run(_pipeline(urls, scrape, write, upload, scrape_concurrency, write_concurrency,
+                                 upload_concurrency, queue_size))
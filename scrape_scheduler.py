@@ -0,0 +1,202 @@
+"""
+History-aware scheduling of the URLs of a scraping run.
+
+With a fixed number of browsers, the run ends when the last page is done. If
+a 20K-ad advertiser starts last, the other browsers sit idle for hours. The
+scheduler orders the URLs longest-first (LPT), using the scrape duration and
+`no_of_ads` of earlier runs kept in a local history file. Optionally, once the
+queue is empty, a browser that would otherwise be idle re-runs a straggler,
+i.e. a page running far beyond its estimate (hung browser, throttled session).
+The first attempt to finish wins; the result of the other attempt is
+discarded, so every page is saved and uploaded once.
+"""
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Estimate for pages never scraped before, when the history has nothing to go by
+DEFAULT_ESTIMATE_SECONDS = 300.0
+# Weight of the latest run in a page's duration estimate
+EWMA_ALPHA = 0.5
+
+
+class ScrapeHistory:
+    """JSON file of `url -> {seconds, no_of_ads, runs, updated}` from earlier runs, safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pages = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self._pages = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Could not read scrape history {path}, starting a new one: {e}")
+
+    def _fallback_estimate(self):
+        durations = [page["seconds"] for page in self._pages.values() if page.get("seconds")]
+        return statistics.median(durations) if durations else DEFAULT_ESTIMATE_SECONDS
+
+    def _seconds_per_ad(self):
+        rates = [page["seconds"] / page["no_of_ads"] for page in self._pages.values()
+                 if page.get("seconds") and page.get("no_of_ads")]
+        return statistics.median(rates) if rates else None
+
+    def estimate(self, url):
+        """Expected scrape duration of `url` in seconds."""
+        with self._lock:
+            page = self._pages.get(url) or {}
+            if page.get("seconds"):
+                return page["seconds"]
+            seconds_per_ad = self._seconds_per_ad()
+            if page.get("no_of_ads") and seconds_per_ad:
+                return page["no_of_ads"] * seconds_per_ad
+            return self._fallback_estimate()
+
+    def expected_ads(self, url):
+        """`no_of_ads` of the last successful scrape of `url`, None if unknown."""
+        with self._lock:
+            return (self._pages.get(url) or {}).get("no_of_ads")
+
+    def record(self, url, seconds, no_of_ads):
+        with self._lock:
+            page = self._pages.setdefault(url, {"runs": 0})
+            previous = page.get("seconds")
+            page["seconds"] = round(seconds if not previous else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * previous, 1)
+            if no_of_ads is not None:
+                page["no_of_ads"] = no_of_ads
+            page["runs"] += 1
+            page["updated"] = datetime.now().isoformat(timespec="seconds")
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self._pages, indent=2, ensure_ascii=False)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(self.path + ".tmp", self.path)
+
+    def recording(self, scrape):
+        """Wraps `scrape(url)` so every successful scrape is recorded in the history."""
+        def scrape_and_record(url):
+            start = time.time()
+            result = scrape(url)
+            if result is not None:
+                self.record(url, time.time() - start, result.get("no_of_ads"))
+            return result
+        return scrape_and_record
+
+
+def order_longest_first(urls, history):
+    """Sorts `urls` by estimated duration, longest first (ties keep the API order)."""
+    return sorted(urls, key=history.estimate, reverse=True)
+
+
+class SchedulerStats:
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.speculative_attempts = 0
+        self.speculative_wins = 0
+
+    def summary(self):
+        return (f"completed={self.completed}, failed={self.failed}, "
+                f"straggler re-runs={self.speculative_attempts} (won {self.speculative_wins})")
+
+
+class LongestFirstScheduler:
+    """
+    Runs `scrape(url)` on `max_workers` threads in longest-first order and
+    calls `finish(result)` once per URL with the first successful result.
+    A running page becomes a straggler once it exceeds both
+    `straggler_factor` x its estimate and its estimate + `straggler_min_seconds`;
+    straggler_factor=0 (default) disables re-runs. `capacity()`, when given, returns the
+    number of pages to run at once (at most `max_workers`) and can change during the run.
+    """
+
+    def __init__(self, history, max_workers, straggler_factor=0.0, straggler_min_seconds=600, poll_seconds=5,
+                 capacity=None):
+        self.history = history
+        self.max_workers = max_workers
+        self.capacity = capacity
+        self.straggler_factor = straggler_factor
+        self.straggler_min_seconds = straggler_min_seconds
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._done = set()
+
+    def _attempt(self, url, scrape, finish, speculative):
+        start = time.time()
+        result = scrape(url)
+        if result is None:
+            return False
+        with self._lock:
+            if url in self._done:
+                logger.info(f"Discarding the slower scrape of {url}; the other attempt already finished.")
+                return False
+            self._done.add(url)
+        self.history.record(url, time.time() - start, result.get("no_of_ads"))
+        if speculative:
+            logger.info(f"Straggler re-run of {url} finished first.")
+        finish(result)
+        return True
+
+    def _pick_straggler(self, running, rerun):
+        now = time.time()
+        worst, worst_overrun = None, 1.0
+        for url, started, _ in running.values():
+            if url in rerun or url in self._done:
+                continue
+            estimate = self.history.estimate(url)
+            limit = max(self.straggler_factor * estimate, estimate + self.straggler_min_seconds)
+            overrun = (now - started) / limit
+            if overrun > worst_overrun:
+                worst, worst_overrun = url, overrun
+        return worst
+
+    def run(self, urls, scrape, finish):
+        """Scrapes all `urls`. Returns the run's SchedulerStats."""
+        stats = SchedulerStats()
+        queue = deque(order_longest_first(urls, self.history))
+        running = {}  # future -> (url, start time, speculative)
+        rerun = set()
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scrape") as executor:
+            def submit(url, speculative=False):
+                future = executor.submit(self._attempt, url, scrape, finish, speculative)
+                running[future] = (url, time.time(), speculative)
+
+            while queue or running:
+                slots = min(self.max_workers, self.capacity()) if self.capacity else self.max_workers
+                while queue and len(running) < slots:
+                    submit(queue.popleft())
+                if not queue and len(running) < slots and self.straggler_factor > 0:
+                    straggler = self._pick_straggler(running, rerun)
+                    if straggler:
+                        logger.warning(f"{straggler} is running far beyond its estimate of "
+                                       f"{self.history.estimate(straggler):.0f}s; re-running it on an idle browser.")
+                        rerun.add(straggler)
+                        stats.speculative_attempts += 1
+                        submit(straggler, speculative=True)
+
+                finished, _ = wait(running, timeout=self.poll_seconds, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    url, _, speculative = running.pop(future)
+                    try:
+                        won = future.result()
+                    except Exception as e:
+                        logger.error(f"Scrape of {url} failed: {type(e).__name__}: {e}")
+                        won = False
+                    if won:
+                        stats.completed += 1
+                        stats.speculative_wins += speculative
+                    elif url not in self._done and not any(u == url for u, _, _ in running.values()):
+                        stats.failed += 1
+        return stats
@@ -0,0 +1,90 @@
+"""
+Event-driven waiting for the scroll loop.
+
+The fixed scroll loop sleeps 0.7 s after every scroll, probes the end-of-list
+XPaths with 0.5 s waits and adds a 0.5-1.5 s random delay, so most of the wall
+time on big pages is spent sleeping. `ScrollController` injects a
+MutationObserver into the page and moves on as soon as the newly loaded ads
+have landed (the page grew and the DOM has been quiet for `settle_ms`),
+keeping a small random jitter between scrolls. It also keeps track of how long
+was spent waiting for content versus deliberately idling.
+"""
+import random
+import time
+
+from selenium.webdriver.common.by import By
+
+INSTALL_OBSERVER_JS = """
+if (!window.__gemsScroll) {
+    const state = window.__gemsScroll = {lastMutation: performance.now()};
+    new MutationObserver(() => { state.lastMutation = performance.now(); })
+        .observe(document.body, {childList: true, subtree: true});
+}
+"""
+
+# arguments: baseline scrollHeight, timeout ms, settle ms, callback
+WAIT_FOR_CONTENT_JS = """
+const [baseline, timeoutMs, settleMs] = arguments;
+const done = arguments[arguments.length - 1];
+const state = window.__gemsScroll;
+const start = performance.now();
+(function poll() {
+    const now = performance.now();
+    const grown = document.body.scrollHeight > baseline;
+    if (grown && now - state.lastMutation >= settleMs) return done({loaded: true, elapsed: now - start});
+    if (now - start >= timeoutMs) return done({loaded: grown, elapsed: now - start});
+    setTimeout(poll, 50);
+})();
+"""
+
+
+class ScrollController:
+    """Replaces the fixed sleeps of the scroll loop with waits on the page's own mutations."""
+
+    def __init__(self, load_timeout=5.0, settle_ms=200, jitter_min=0.2, jitter_max=0.6):
+        self.load_timeout = load_timeout
+        self.settle_ms = settle_ms
+        self.jitter_min = jitter_min
+        self.jitter_max = max(jitter_min, jitter_max)
+        self.loading_seconds = 0.0   # scroll -> new ads rendered
+        self.waiting_seconds = 0.0   # timeouts without new ads + jitter between scrolls
+        self.loads = 0
+        self.timeouts = 0
+
+    def install(self, driver):
+        """Injects the MutationObserver (again after every navigation)."""
+        driver.execute_script(INSTALL_OBSERVER_JS)
+
+    def wait_for_content(self, driver, baseline_height):
+        """
+        Blocks until the page has grown past `baseline_height` and settled, or the timeout hits.
+        Raises the driver's script timeout; BrowserPool resets it when the driver is released.
+        """
+        driver.set_script_timeout(self.load_timeout + 5)
+        result = driver.execute_async_script(WAIT_FOR_CONTENT_JS, baseline_height,
+                                             int(self.load_timeout * 1000), self.settle_ms)
+        elapsed = result["elapsed"] / 1000
+        if result["loaded"]:
+            self.loads += 1
+            self.loading_seconds += elapsed
+        else:
+            self.timeouts += 1
+            self.waiting_seconds += elapsed
+        return result["loaded"]
+
+    def end_marker_present(self, driver, xpaths):
+        """Instant check for the end-of-list marker (no polling waits)."""
+        return any(driver.find_elements(By.XPATH, xpath) for xpath in xpaths)
+
+    def jitter(self):
+        """Human-like delay between scrolls, never below the configured floor."""
+        return random.uniform(self.jitter_min, self.jitter_max)
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+            self.waiting_seconds += seconds
+
+    def summary(self):
+        return (f"loading {self.loading_seconds:.2f}s over {self.loads} loads, "
+                f"waiting {self.waiting_seconds:.2f}s ({self.timeouts} timeouts without new ads)")
@@ -0,0 +1,132 @@
+"""
+Deterministic sharding of the competitor URLs across runners.
+
+Every runner of a job matrix fetches the same URL list and keeps only its own
+shard, so the daily run can be spread over several machines:
+
+    SHARD_INDEX=0 SHARD_COUNT=3 python ad_nova_script.py      # or --shard-index 0 --shard-count 3
+
+The partition is balanced by expected ad count (`no_of_ads` from the scrape
+history; pages never seen count as the median): URLs are assigned biggest
+first to the shard with the smallest total so far. Ties are broken by URL, so
+every shard computes the same partition as long as they all read the same URL
+list and the same history file. With SHARD_BALANCE=hash the partition only
+depends on the URL (crc32), for runners that don't share a history file.
+
+`merge_shard_outputs()` combines the shards' results after the matrix has
+finished: their run archives (ads_data_<date>_shard<i>of<n>.ndjson.gz, the
+workflow artifact), any ad_data_<page_id> page files (.json or .ndjson.gz) and
+their scrape histories.
+"""
+import glob
+import json
+import logging
+import os
+import statistics
+import zlib
+
+from page_output import NDJSON_SUFFIX, read_archive, read_page
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EXPECTED_ADS = 100
+
+
+def _shard_by_hash(urls, shard_count):
+    return [zlib.crc32(url.encode("utf-8")) % shard_count for url in urls]
+
+
+def _shard_by_weight(urls, shard_count, expected_ads):
+    known = [ads for ads in map(expected_ads, urls) if ads]
+    fallback = statistics.median(known) if known else DEFAULT_EXPECTED_ADS
+    weights = {url: expected_ads(url) or fallback for url in urls}
+
+    loads = [0] * shard_count
+    assignment = {}
+    for url in sorted(set(urls), key=lambda u: (-weights[u], u)):
+        shard = min(range(shard_count), key=lambda i: (loads[i], i))
+        assignment[url] = shard
+        loads[shard] += weights[url]
+    return [assignment[url] for url in urls]
+
+
+def shard_urls(urls, shard_index, shard_count, expected_ads=None, balance="ads"):
+    """
+    Returns the URLs of shard `shard_index` (0-based) out of `shard_count`, in their original order.
+    `expected_ads(url)` gives the expected ad count of a URL (None if unknown).
+    """
+    if shard_count < 1 or not 0 <= shard_index < shard_count:
+        raise ValueError(f"Invalid shard {shard_index} of {shard_count}")
+    if shard_count == 1:
+        return list(urls)
+    if balance == "hash" or expected_ads is None:
+        shards = _shard_by_hash(urls, shard_count)
+    elif balance == "ads":
+        shards = _shard_by_weight(urls, shard_count, expected_ads)
+    else:
+        raise ValueError(f"Unknown shard balance {balance!r} (expected 'ads' or 'hash')")
+    return [url for url, shard in zip(urls, shards) if shard == shard_index]
+
+
+def _read_page_file(path):
+    if path.endswith(NDJSON_SUFFIX):
+        return read_page(path)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def merge_shard_outputs(directories, output_path="merged_ad_data.json", history_name="scrape_history.json"):
+    """
+    Combines the run archives (ads_data_*.ndjson.gz) and ad_data_*.json / .ndjson.gz page
+    files found in `directories` (e.g. the downloaded artifacts of every shard) into
+    `output_path`, and merges the scrape histories found there into `history_name`.
+    Returns the number of pages merged.
+    """
+    pages = {}
+    for directory in directories:
+        sources = [(path, read_archive) for path in
+                   glob.glob(os.path.join(directory, "**", f"ads_data_*{NDJSON_SUFFIX}"), recursive=True)]
+        sources += [(path, lambda path: [_read_page_file(path)]) for path in
+                    glob.glob(os.path.join(directory, "**", "ad_data_*.json"), recursive=True)
+                    + glob.glob(os.path.join(directory, "**", f"ad_data_*{NDJSON_SUFFIX}"), recursive=True)]
+        for path, read in sorted(sources):
+            try:
+                payloads = read(path)
+            except (OSError, EOFError, ValueError) as e:
+                logger.warning(f"Skipping unreadable page file {path}: {e}")
+                continue
+            for payload in payloads:
+                key = payload.get("page_link") or path
+                if key in pages:
+                    logger.warning(f"{key} was found more than once; keeping the larger result.")
+                    if len(payload.get("ads_data") or {}) <= len(pages[key].get("ads_data") or {}):
+                        continue
+                pages[key] = payload
+
+    merged = {
+        "total_pages": len(pages),
+        "total_ads": sum(len(payload.get("ads_data") or {}) for payload in pages.values()),
+        "pages": list(pages.values()),
+    }
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f, indent=4, ensure_ascii=False)
+    logger.info(f"Merged {merged['total_pages']} pages ({merged['total_ads']} ads) into {output_path}")
+
+    # Latest entry per URL, so tomorrow's shards balance on today's numbers
+    history = {}
+    for directory in directories:
+        for path in glob.glob(os.path.join(directory, "**", os.path.basename(history_name)), recursive=True):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Skipping unreadable history {path}: {e}")
+                continue
+            for url, entry in entries.items():
+                if url not in history or entry.get("updated", "") > history[url].get("updated", ""):
+                    history[url] = entry
+    if history:
+        with open(history_name, "w", encoding="utf-8") as f:
+            json.dump(history, f, indent=2, ensure_ascii=False)
+        logger.info(f"Merged the scrape history of {len(history)} URLs into {history_name}")
+    return len(pages)
@@ -0,0 +1,140 @@
+"""
+Offline ad extraction from a saved page snapshot.
+
+`scrape_ads` can grab `driver.page_source` once scrolling is done, quit the
+browser and hand the HTML to `parse_snapshot`, which replays the WebDriver
+XPaths with lxml. It is a plain function of the HTML, so it runs in a
+process pool and can be pointed at stored snapshots:
+
+    python snapshot_parser.py saved_page.html [more_pages.html ...]
+"""
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import html as lxml_html
+
+from ad_fields import (
+    AD_GROUP_CLASS, AD_CARD_XPATH, MAIN_CONTAINER_XPATH, LIBRARY_ID_XPATH, STARTED_RUNNING_XPATH,
+    PLATFORMS_XPATH, PLATFORM_ICON_XPATH, CATEGORIES_XPATH, CATEGORY_DIV_XPATH, ADS_COUNT_XPATH,
+    AD_TEXT_XPATH, LINK_CONTAINER_XPATH, VIDEO_XPATH, IMAGE_XPATH, ANY_IMAGE_XPATH,
+    CTA_CONTAINER_XPATH, HEADLINE_CONTAINER_XPATH, CTA_DIV_XPATH, CTA_TEXT_XPATH, HEADLINE_XPATH,
+    build_ad_record,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _first(context, xpath):
+    found = context.xpath(xpath)
+    return found[0] if found else None
+
+
+def _text(element):
+    """Approximates WebDriver's `.text`: text content with <br> turned into line breaks."""
+    if element is None:
+        return None
+    # Text nodes and <br> elements in document order, without touching the tree
+    return "".join("\n" if getattr(node, "tag", None) == "br" else node
+                   for node in element.xpath("descendant-or-self::text() | .//br"))
+
+
+def _extract_card(card):
+    """Collects the raw strings of one ad card (same keys as the in-browser extraction)."""
+    main = _first(card, MAIN_CONTAINER_XPATH)
+    if main is None:
+        return None
+    library_id = _first(main, LIBRARY_ID_XPATH)
+    if library_id is None:
+        return None
+
+    raw = {"library_id_text": _text(library_id)}
+    raw["started_text"] = _text(_first(main, STARTED_RUNNING_XPATH))
+
+    platforms = _first(main, PLATFORMS_XPATH)
+    raw["platform_styles"] = [icon.get("style") for icon in platforms.xpath(PLATFORM_ICON_XPATH)] if platforms is not None else []
+
+    raw["category_styles"] = []
+    categories = _first(main, CATEGORIES_XPATH)
+    if categories is not None:
+        for category_div in categories.xpath(CATEGORY_DIV_XPATH):
+            icon = _first(category_div, PLATFORM_ICON_XPATH)
+            if icon is not None:
+                raw["category_styles"].append(icon.get("style"))
+
+    raw["ads_count_text"] = _text(_first(main, ADS_COUNT_XPATH))
+    raw["ad_text"] = _text(_first(card, AD_TEXT_XPATH))
+
+    link = _first(card, LINK_CONTAINER_XPATH)
+    raw["link_href"] = link.get("href") if link is not None else None
+    if link is not None:
+        video = _first(card, VIDEO_XPATH)
+        raw["has_video"] = video is not None
+        if video is not None:
+            raw["video_src"] = video.get("src")
+            raw["video_poster"] = video.get("poster")
+        else:
+            image = _first(link, IMAGE_XPATH)
+            if image is None:
+                image = _first(link, ANY_IMAGE_XPATH)
+            raw["image_src"] = image.get("src") if image is not None else None
+
+    raw["has_cta"] = False
+    cta = _first(card, CTA_CONTAINER_XPATH)
+    if cta is not None:
+        headline_container = _first(cta, HEADLINE_CONTAINER_XPATH)
+        cta_div = _first(cta, CTA_DIV_XPATH)
+        cta_text = _first(cta_div, CTA_TEXT_XPATH) if cta_div is not None else None
+        if headline_container is not None and cta_text is not None:
+            raw["has_cta"] = True
+            raw["cta_text"] = _text(cta_text)
+            raw["headline_text"] = _text(_first(headline_container, HEADLINE_XPATH))
+    return raw
+
+
+def parse_snapshot(page_source):
+    """
+    Extracts the ads from the HTML of a fully scrolled Ad Library page.
+    Returns a (ads_data, total_child_ads_found) tuple.
+    """
+    tree = lxml_html.fromstring(page_source)
+    ads_data = {}
+    total_child_ads_found = 0
+    for group in tree.xpath(f'//div[@class="{AD_GROUP_CLASS}"]'):
+        cards = group.xpath(AD_CARD_XPATH)
+        total_child_ads_found += len(cards)
+        for card in cards:
+            try:
+                raw = _extract_card(card)
+                ad_data = build_ad_record(raw) if raw else None
+            except Exception as e:
+                logger.warning(f"Unexpected error processing ad in snapshot: {str(e)}")
+                continue
+            if ad_data:
+                ads_data[ad_data["library_id"]] = ad_data
+    return ads_data, total_child_ads_found
+
+
+def _parse_file(path):
+    with open(path, encoding="utf-8") as f:
+        page_source = f.read()
+    start = time.time()
+    ads_data, total_found = parse_snapshot(page_source)
+    return path, total_found, ads_data, time.time() - start
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    if len(sys.argv) < 2:
+        print("Usage: python snapshot_parser.py saved_page.html [more_pages.html ...]")
+        sys.exit(1)
+
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for path, total_found, ads_data, elapsed in executor.map(_parse_file, sys.argv[1:]):
+            print(json.dumps({"file": path, "total_ads_found": total_found, "total_ads_processed": len(ads_data),
+                              "parse_seconds": round(elapsed, 3), "ads_data": ads_data}, indent=4, ensure_ascii=False))
+    print(f"Parsed {len(sys.argv) - 1} snapshot(s) in {time.time() - start_time:.2f} seconds.", file=sys.stderr)
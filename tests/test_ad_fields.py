@@ -0,0 +1,88 @@
+from ad_fields import build_ad_record, limit_ads, parse_started_running, unwrap_destination_url
+
+FACEBOOK_STYLE = 'mask-image: url("https://static.xx.fbcdn.net/rsrc.php/v4/yW/r/TP7nCDju1B-.png"); mask-position: 0px -1171px;'
+HOUSING_STYLE = 'mask-image: url("https://static.xx.fbcdn.net/rsrc.php/v4/y3/r/r35dp7ubbrO.png"); mask-position: 0px -544px;'
+
+
+def raw_card(**overrides):
+    raw = {
+        "library_id_text": "Library ID: 123456",
+        "started_text": "Started running on Mar 5, 2025 · Total active time 12 hrs",
+        "platform_styles": [FACEBOOK_STYLE],
+        "category_styles": [HOUSING_STYLE],
+        "ads_count_text": "3 ads use this creative and text.",
+        "ad_text": "  Spring sale\n",
+        "link_href": "https://l.facebook.com/l.php?u=https%3A%2F%2Fshop.example.com%2Fp%2F1&h=AT0",
+        "has_video": True,
+        "video_src": "https://video.xx.fbcdn.net/v/clip.mp4",
+        "video_poster": "https://scontent.xx.fbcdn.net/v/poster.jpg",
+        "has_cta": True,
+        "cta_text": "Shop now ",
+        "headline_text": "shop.example.com",
+    }
+    raw.update(overrides)
+    return raw
+
+
+def test_build_ad_record_video_card():
+    assert build_ad_record(raw_card()) == {
+        "library_id": "123456",
+        "started_running": "2025-03-05",
+        "total_active_time": "12 hrs",
+        "platforms": ["Facebook"],
+        "categories": ["Housing"],
+        "ads_count": "3",
+        "ad_text": "Spring sale",
+        "destination_url": "https://shop.example.com/p/1",
+        "media_type": "video",
+        "media_url": "https://video.xx.fbcdn.net/v/clip.mp4",
+        "thumbnail_url": "https://scontent.xx.fbcdn.net/v/poster.jpg",
+        "cta_button_text": "Shop now",
+        "headline_text": "shop.example.com",
+    }
+
+
+def test_build_ad_record_image_card_without_cta():
+    ad_data = build_ad_record(raw_card(has_video=False, image_src="https://scontent.xx.fbcdn.net/v/image.jpg",
+                                       has_cta=False, category_styles=["mask-image: url(\"x\"); mask-position: 1px 1px;"]))
+    assert ad_data["media_type"] == "image"
+    assert ad_data["media_url"] == "https://scontent.xx.fbcdn.net/v/image.jpg"
+    assert ad_data["thumbnail_url"] is None
+    assert ad_data["categories"] == ["Unknown"]
+    assert ad_data["cta_button_text"] is None and ad_data["headline_text"] is None
+
+
+def test_build_ad_record_without_library_id():
+    assert build_ad_record(raw_card(library_id_text=None)) is None
+
+
+def test_build_ad_record_unparsable_date():
+    ad_data = build_ad_record(raw_card(started_text="Started running on someday"))
+    assert ad_data["started_running"] is None and ad_data["total_active_time"] is None
+
+
+def test_parse_started_running_formats():
+    assert parse_started_running("Started running on 7 Apr 2025") == ("2025-04-07", None)
+    assert parse_started_running("Started running on Apr 7, 2025 · Total active time 3 days") == ("2025-04-07", "3 days")
+
+
+def test_unwrap_destination_url():
+    assert unwrap_destination_url("https://l.facebook.com/l.php?u=https%3A%2F%2Fa.example%2Fx%3Fy%3D1&h=AT") == "https://a.example/x?y=1"
+    assert unwrap_destination_url("https://a.example/direct") == "https://a.example/direct"
+
+
+def test_limit_ads_keeps_page_order():
+    ads_data = {str(i): {"library_id": str(i)} for i in range(5)}
+    assert list(limit_ads(ads_data, 3)) == ["0", "1", "2"]
+    assert limit_ads(ads_data, 0) is ads_data
+
+
+def test_limit_ads_newest_on_page_larger_than_cap():
+    dates = ["2025-01-10", None, "2025-03-01", "2024-12-31", "2025-02-14", "2025-03-01"]
+    ads_data = {str(i): {"library_id": str(i), "started_running": date} for i, date in enumerate(dates)}
+
+    newest = limit_ads(ads_data, 3, newest=True)
+    # Most recent first, ties in page order; undated ads only fill up what's left
+    assert list(newest) == ["2", "5", "4"]
+    assert list(limit_ads(ads_data, 5, newest=True)) == ["2", "5", "4", "0", "3"]
+    assert list(limit_ads(ads_data, 6, newest=True)) == list(ads_data)
@@ -0,0 +1,28 @@
+from ad_index import AdIndex, content_hash
+
+
+def ad(library_id, **fields):
+    ad_data = {"library_id": library_id, "ad_text": f"Ad {library_id}", "thumbnail_url": None,
+               "total_active_time": None, "cta_button_text": None,
+               "media_url": f"https://video.xx.fbcdn.net/v/{library_id}.mp4?oh=first"}
+    ad_data.update(fields)
+    return ad_data
+
+
+def test_content_hash_ignores_media_signature_and_blanked_none():
+    assert content_hash(ad("1")) == content_hash(ad("1", media_url="https://video.xx.fbcdn.net/v/1.mp4?oh=second"))
+    assert content_hash(ad("1")) == content_hash(ad("1", thumbnail_url="", total_active_time="", cta_button_text=""))
+    assert content_hash(ad("1")) != content_hash(ad("1", ad_text="Other text"))
+
+
+def test_diff_after_commit(tmp_path):
+    index = AdIndex(str(tmp_path / "index.sqlite3"))
+    first = {"1": ad("1"), "2": ad("2")}
+    assert index.diff("page", first) == (["1", "2"], [], [])
+    index.commit("page", first)
+
+    second = {"1": ad("1", media_url="https://video.xx.fbcdn.net/v/1.mp4?oh=other"), "3": ad("3"),
+              "2": ad("2", ad_text="Edited")}
+    assert index.diff("page", second) == (["3"], ["2"], [])
+    assert index.diff("page", {"1": ad("1")}) == ([], [], ["2"])
+    index.close()
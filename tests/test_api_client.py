@@ -0,0 +1,81 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+import requests  # noqa: E402
+
+import api_client  # noqa: E402
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    """Answers each request with the next status of `server.statuses` (200 once they run out)."""
+
+    def _respond(self):
+        self.server.requests.append(self.command)
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        if status == "hang":
+            time.sleep(1)
+            status = 200
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    do_GET = do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(api_client, "API_BACKOFF_FACTOR", 0)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FlakyHandler)
+    httpd.requests, httpd.statuses = [], []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(httpd):
+    return f"http://127.0.0.1:{httpd.server_address[1]}/api/ad-details"
+
+
+def test_post_retried_on_service_unavailable(server):
+    server.statuses = [503, 503]
+    session = api_client._build_session(2)
+    assert session.post(url(server), json={}).status_code == 200
+    assert server.requests == ["POST"] * 3
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_post_not_retried_once_the_api_may_have_it(server, status):
+    server.statuses = [status]
+    session = api_client._build_session(2)
+    assert session.post(url(server), json={}).status_code == status
+    assert server.requests == ["POST"]
+
+
+def test_post_not_retried_on_read_timeout(server):
+    session = api_client._build_session(2)
+    server.statuses = ["hang"]
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        session.post(url(server), json={}, timeout=0.2)
+    time.sleep(1)
+    assert server.requests == ["POST"]
+
+
+def test_get_retried_on_server_error(server):
+    server.statuses = [500]
+    session = api_client._build_session(2)
+    assert session.get(url(server)).status_code == 200
+    assert server.requests == ["GET"] * 2
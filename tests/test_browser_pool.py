@@ -0,0 +1,42 @@
+import pytest
+
+pytest.importorskip("selenium")
+
+import browser_pool  # noqa: E402
+from browser_pool import BrowserPool  # noqa: E402
+
+
+class FakeDriver:
+    def __init__(self):
+        self.window_handles = ["main"]
+        self.switch_to = self
+        self.script_timeout = browser_pool.SCRIPT_TIMEOUT_SECONDS
+        self.quit_called = False
+
+    def window(self, handle):
+        pass
+
+    def set_script_timeout(self, seconds):
+        self.script_timeout = seconds
+
+    def execute_cdp_cmd(self, cmd, params):
+        pass
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_released_driver_gets_default_script_timeout_back(monkeypatch):
+    monkeypatch.setattr(browser_pool, "create_driver", lambda *args: (FakeDriver(), None))
+    pool = BrowserPool("chromedriver", max_size=1)
+    driver = pool.acquire()
+    driver.set_script_timeout(12)  # e.g. ScrollController.wait_for_content
+    pool.release(driver)
+
+    assert pool.acquire() is driver
+    assert driver.script_timeout == browser_pool.SCRIPT_TIMEOUT_SECONDS
+    pool.release(driver, failed=True)
+    assert driver.quit_called
@@ -0,0 +1,22 @@
+from creative_registry import CreativeRegistry
+
+
+def page(*texts):
+    return {"page_link": "https://www.facebook.com/ads/library/?view_all_page_id=1",
+            "ads_data": {str(i): {"library_id": str(i), "ad_text": text} for i, text in enumerate(texts)}}
+
+
+def test_deduplicated_ads_counted_once_the_upload_is_accepted():
+    registry = CreativeRegistry()
+    first, shared = registry.dedupe(page("Sale", "Sale", "New"))
+    assert shared == 1 and len(first["creatives"]) == 2
+    # A failed upload leaves nothing counted and the creatives unsent
+    retry, shared = registry.dedupe(page("Sale", "Sale", "New"))
+    assert registry.ads_deduplicated == 0 and len(retry["creatives"]) == 2
+
+    registry.mark_sent(retry)
+    assert registry.ads_deduplicated == 1
+    second, shared = registry.dedupe(page("Sale", "New"))
+    assert shared == 2 and second["creatives"] == {}
+    registry.mark_sent(second)
+    assert registry.ads_deduplicated == 3
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("requests")
+
+from media_store import MediaPrefetcher, MediaStore  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.body is None:
+            raise OSError("403 link expired")
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+
+class FakeSession:
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.requested = []
+
+    def get(self, url, stream, timeout):
+        self.requested.append(url)
+        return FakeResponse(self.bodies.pop(0))
+
+    def close(self):
+        pass
+
+
+def page(url):
+    return {"ads_data": {"1": {"library_id": "1", "media_type": "video", "media_url": url},
+                         "2": {"library_id": "2", "media_type": "image", "media_url": "https://x.fbcdn.net/i.jpg"}}}
+
+
+def test_failed_download_is_retried_with_a_later_link(tmp_path):
+    store = MediaStore(str(tmp_path / "media_store"))
+    prefetcher = MediaPrefetcher(store, workers=1)
+    prefetcher._session = FakeSession([None, b"video bytes"])
+
+    prefetcher.submit_page(page("https://video.xx.fbcdn.net/v/clip.mp4?oh=expired"))
+    prefetcher._executor.shutdown(wait=True)  # let the first download fail
+    prefetcher._executor = type(prefetcher._executor)(max_workers=1)
+    prefetcher.submit_page(page("https://video.yy.fbcdn.net/v/clip.mp4?oh=fresh"))
+    prefetcher.submit_page(page("https://video.zz.fbcdn.net/v/clip.mp4?oh=again"))
+    prefetcher.close()
+
+    assert (prefetcher.failed, prefetcher.downloaded) == (1, 1)
+    assert len(prefetcher._session.requested) == 2
+    with open(store.path_for_url("https://video.xx.fbcdn.net/v/clip.mp4"), "rb") as f:
+        assert f.read() == b"video bytes"
+    store.close()
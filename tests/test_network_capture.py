@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+pytest.importorskip("selenium")
+
+from network_capture import NetworkAdCollector, ads_from_payload  # noqa: E402
+
+
+def test_ads_from_graphql_response(read_fixture):
+    records = {ad_data["library_id"]: ad_data for ad_data in ads_from_payload(read_fixture("graphql_response.json"))}
+    assert list(records) == ["2000000000000001", "2000000000000002"]
+
+    assert records["2000000000000001"] == {
+        "library_id": "2000000000000001",
+        "started_running": "2025-03-05",
+        "total_active_time": None,
+        "platforms": ["Facebook", "Instagram"],
+        "categories": ["Housing"],
+        "ads_count": "4",
+        "ad_text": "Find your new home",
+        "destination_url": "https://homes.example.com/",
+        "media_type": "video",
+        "media_url": "https://video.xx.fbcdn.net/v/home.mp4?oh=1",
+        "thumbnail_url": "https://scontent.xx.fbcdn.net/v/home.jpg?oh=1",
+        "cta_button_text": "Learn more",
+        "headline_text": "homes.example.com",
+    }
+
+    carousel = records["2000000000000002"]
+    assert carousel["started_running"] is None
+    assert carousel["platforms"] == ["Messenger"]
+    assert carousel["ads_count"] is None
+    assert carousel["ad_text"] == "Carousel card"
+    assert carousel["destination_url"] == "https://shop.example.com/c"
+    assert carousel["media_type"] == "image"
+    assert carousel["cta_button_text"] == "Shop now"
+    assert carousel["headline_text"] == "Card title"
+
+
+def test_ads_from_payload_ndjson_and_unrelated_responses(read_fixture):
+    document = json.loads(read_fixture("graphql_response.json")[len("for (;;);"):])
+    lines = "\n".join([json.dumps({"data": {"viewer": None}}), json.dumps(document), "{not json ad_archive_id"])
+    assert len(ads_from_payload(lines)) == 2
+    assert ads_from_payload('{"data": {"viewer": null}}') == []
+
+
+def test_collector_reads_embedded_json(read_fixture):
+    blob = read_fixture("graphql_response.json")[len("for (;;);"):]
+    page_source = f'<html><script type="application/json" data-sjs>{blob}</script></html>'
+    collector = NetworkAdCollector()
+    assert collector.collect_initial(page_source) == 2
+    assert collector.add_payload(read_fixture("graphql_response.json")) == 0
+    assert collector.total_child_ads_found == 5
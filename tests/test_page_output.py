@@ -0,0 +1,34 @@
+import gzip
+import os
+
+from page_output import RunArchive, read_page, read_pages, write_page
+
+
+def page(page_id, ads):
+    return {
+        "page_link": f"https://www.facebook.com/ads/library/?view_all_page_id={page_id}",
+        "page_id": page_id,
+        "no_of_ads": len(ads),
+        "ads_data": {str(i): {"library_id": str(i), "ad_text": f"Ad {i} – €"} for i in ads},
+    }
+
+
+def test_write_page_round_trip(tmp_path):
+    path = str(tmp_path / "ad_data_1.ndjson.gz")
+    final_output = page("1", range(3))
+    write_page(path, final_output)
+
+    assert read_page(path) == final_output
+    assert not os.path.exists(path + ".part")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        assert len(f.readlines()) == 4  # header + one line per ad
+
+
+def test_run_archive_keeps_every_page(tmp_path):
+    archive = RunArchive(str(tmp_path / "ads_data.ndjson.gz"))
+    pages = [page("1", range(2)), page("2", []), page("1", range(3))]
+    for final_output in pages:
+        archive.append(final_output)
+
+    assert archive.pages == 3
+    assert list(read_pages(archive.path)) == pages
@@ -0,0 +1,29 @@
+from run_journal import PENDING, SCRAPED, UPLOADED, RunJournal
+
+
+def page(url):
+    return {"page_link": url, "ads_data": {"1": {"library_id": "1"}}}
+
+
+def test_journal_resumes_where_the_previous_attempt_stopped(tmp_path):
+    path = str(tmp_path / "run_journal.jsonl")
+    urls = ["a", "b", "c"]
+
+    journal = RunJournal(path)
+    assert not journal.resumed
+    journal.start(urls)
+    journal.record_cleanup()
+    journal.mark_scraped(page("a"), None)
+    journal.mark_uploaded("a")
+    journal.mark_scraped(page("b"), None)
+    journal.close()
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"url": "c", "sta')  # line cut short by a crash
+
+    resumed = RunJournal(path)
+    assert resumed.resumed and resumed.cleanup_done
+    assert [resumed.state(url) for url in urls] == [UPLOADED, SCRAPED, PENDING]
+    assert resumed.load_payload("b") == page("b")
+    assert resumed.summary(urls) == "pending=1, scraped=1, uploaded=1"
+    resumed.close()
@@ -0,0 +1,26 @@
+from scrape_pipeline import run_pipeline
+
+
+def test_pipeline_counts_each_stage():
+    written, uploaded = [], []
+
+    def scrape(url):
+        return None if url == "scrape-fails" else {"page_link": url}
+
+    def write(page):
+        written.append(page["page_link"])
+
+    def upload(page):
+        url = page["page_link"]
+        if url == "upload-raises":
+            raise RuntimeError("API down")
+        uploaded.append(url)
+        return url != "upload-rejected"
+
+    urls = ["ok-1", "scrape-fails", "upload-rejected", "upload-raises", "ok-2"]
+    stats = run_pipeline(urls, scrape, write, upload, scrape_concurrency=2, upload_concurrency=2)
+
+    assert (stats.scraped, stats.scrape_failed) == (4, 1)
+    assert stats.written == 4 and sorted(written) == ["ok-1", "ok-2", "upload-raises", "upload-rejected"]
+    assert (stats.uploaded, stats.upload_failed) == (2, 2)
+    assert sorted(uploaded) == ["ok-1", "ok-2", "upload-rejected"]
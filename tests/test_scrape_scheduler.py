@@ -0,0 +1,36 @@
+import threading
+
+from scrape_scheduler import LongestFirstScheduler, ScrapeHistory
+
+
+def test_recording_saves_successful_scrapes(tmp_path):
+    history = ScrapeHistory(str(tmp_path / "history.json"))
+    scrape = history.recording(lambda url: None if url == "failed" else {"no_of_ads": 7})
+    scrape("ok")
+    scrape("failed")
+    history.save()
+
+    reloaded = ScrapeHistory(history.path)
+    assert reloaded.expected_ads("ok") == 7
+    assert reloaded.expected_ads("failed") is None
+
+
+def test_scheduler_runs_longest_first_and_records_history(tmp_path):
+    history = ScrapeHistory(str(tmp_path / "history.json"))
+    history.record("big", 500, 5000)
+    history.record("small", 5, 50)
+    started, finished = [], []
+    lock = threading.Lock()
+
+    def scrape(url):
+        with lock:
+            started.append(url)
+        return {"page_link": url, "no_of_ads": 1}
+
+    stats = LongestFirstScheduler(history, max_workers=1, poll_seconds=0.01).run(
+        ["small", "new", "big"], scrape, lambda result: finished.append(result["page_link"]))
+
+    assert started == ["big", "new", "small"]  # "new" gets the median estimate
+    assert sorted(finished) == ["big", "new", "small"]
+    assert (stats.completed, stats.failed, stats.speculative_attempts) == (3, 0, 0)
+    assert history.expected_ads("new") == 1
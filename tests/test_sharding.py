@@ -0,0 +1,52 @@
+import gzip
+import json
+import os
+
+from page_output import RunArchive, write_page
+from sharding import merge_shard_outputs, shard_urls
+
+
+def page(page_id, ads):
+    return {"page_link": f"https://www.facebook.com/ads/library/?view_all_page_id={page_id}", "page_id": page_id,
+            "no_of_ads": len(ads), "ads_data": {str(i): {"library_id": str(i)} for i in ads}}
+
+
+def test_shards_partition_the_urls_by_expected_ads():
+    urls = [f"url-{i}" for i in range(10)]
+    expected = {"url-3": 5000, "url-7": 4000}.get
+    shards = [shard_urls(urls, i, 3, expected) for i in range(3)]
+
+    assert sorted(url for shard in shards for url in shard) == sorted(urls)
+    assert shards == [shard_urls(urls, i, 3, expected) for i in range(3)]
+    assert ["url-3" in shard for shard in shards].count(True) == 1
+    assert not any("url-3" in shard and "url-7" in shard for shard in shards)
+
+
+def test_merge_reads_the_shard_run_archives_and_histories(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shard0, shard1 = tmp_path / "shard0", tmp_path / "shard1"
+    os.makedirs(shard0)
+    os.makedirs(shard1 / "nested")
+
+    archive0 = RunArchive(str(shard0 / "ads_data_2025-03-05_shard0of2.ndjson.gz"))
+    archive0.append(page("1", [1]))
+    archive0.append(page("1", [1, 2]))  # scraped again after a resume: the last copy counts
+    archive1 = RunArchive(str(shard1 / "nested" / "ads_data_2025-03-05_shard1of2.ndjson.gz"))
+    archive1.append(page("2", [3]))
+    archive1.append(page("3", [4, 5, 6]))
+    with open(archive1.path, "ab") as f:
+        f.write(gzip.compress(b'{"page": {"page_link": "cut"}}\n')[:-10])  # crash mid-page
+    write_page(str(shard1 / "ad_data_4.ndjson.gz"), page("4", []))
+
+    with open(shard0 / "scrape_history.json", "w") as f:
+        json.dump({"a": {"seconds": 10, "updated": "2025-03-05T10:00:00"}}, f)
+    with open(shard1 / "scrape_history.json", "w") as f:
+        json.dump({"a": {"seconds": 20, "updated": "2025-03-05T12:00:00"}, "b": {"seconds": 5}}, f)
+
+    assert merge_shard_outputs([str(shard0), str(shard1)], "merged.json", "scrape_history.json") == 4
+    with open("merged.json") as f:
+        merged = json.load(f)
+    assert {p["page_id"]: len(p["ads_data"]) for p in merged["pages"]} == {"1": 2, "2": 1, "3": 3, "4": 0}
+    assert merged["total_ads"] == 6
+    with open("scrape_history.json") as f:
+        assert json.load(f) == {"a": {"seconds": 20, "updated": "2025-03-05T12:00:00"}, "b": {"seconds": 5}}
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("lxml")
+
+from lxml import html  # noqa: E402
+
+from snapshot_parser import _text, parse_snapshot  # noqa: E402
+
+
+def test_parse_snapshot_saved_page(read_fixture):
+    ads_data, total_child_ads_found = parse_snapshot(read_fixture("ad_library_page.html"))
+
+    # The card without a Library ID is counted but not extracted
+    assert total_child_ads_found == 3
+    assert list(ads_data) == ["1000000000000001", "1000000000000002"]
+
+    video_ad = ads_data["1000000000000001"]
+    assert video_ad["started_running"] == "2025-03-05"
+    assert video_ad["total_active_time"] == "12 hrs"
+    assert video_ad["platforms"] == ["Facebook", "Instagram"]
+    assert video_ad["categories"] == ["Housing"]
+    assert video_ad["ads_count"] == "3"
+    assert video_ad["ad_text"] == "Spring sale\nUp to 40% off this week only."
+    assert video_ad["destination_url"] == "https://shop.example.com/p/1"
+    assert video_ad["media_type"] == "video"
+    assert video_ad["media_url"] == "https://video.xx.fbcdn.net/v/clip_1.mp4?oh=abc"
+    assert video_ad["thumbnail_url"] == "https://scontent.xx.fbcdn.net/v/poster_1.jpg?oh=abc"
+    assert video_ad["cta_button_text"] == "Shop now"
+    assert video_ad["headline_text"] == "shop.example.com"
+
+    image_ad = ads_data["1000000000000002"]
+    assert image_ad["started_running"] == "2025-04-07"
+    assert image_ad["total_active_time"] is None
+    assert image_ad["categories"] == []
+    assert image_ad["ads_count"] is None
+    assert image_ad["media_type"] == "image"
+    assert image_ad["media_url"] == "https://scontent.xx.fbcdn.net/v/image_2.jpg?oh=def"
+    assert image_ad["cta_button_text"] is None
+
+
+def test_text_keeps_line_breaks_without_changing_the_tree():
+    element = html.fromstring("<div>Line one<br>Line <b>two</b><br/>three</div>")
+    assert _text(element) == _text(element) == "Line one\nLine two\nthree"
@@ -0,0 +1,102 @@
+import gzip
+import json
+
+import pytest
+
+for module in ("selenium", "requests", "dotenv", "webdriver_manager", "lxml"):
+    pytest.importorskip(module)
+
+import ad_nova_script  # noqa: E402
+
+
+def payload(ads):
+    return {"page_link": "https://www.facebook.com/ads/library/?view_all_page_id=1", "page_id": "1",
+            "no_of_ads": ads, "ads_data": {str(i): {"library_id": str(i)} for i in range(ads)}}
+
+
+def test_split_payload_chunks_keep_page_fields():
+    chunks = ad_nova_script.split_payload(payload(5), 2)
+    assert [list(chunk["ads_data"]) for chunk in chunks] == [["0", "1"], ["2", "3"], ["4"]]
+    assert all(chunk["page_id"] == "1" and chunk["no_of_ads"] == 5 for chunk in chunks)
+
+
+def test_split_payload_small_or_disabled():
+    original = payload(3)
+    assert ad_nova_script.split_payload(original, 3) == [original]
+    assert ad_nova_script.split_payload(original, 0) == [original]
+
+
+def test_gzip_body_round_trip(monkeypatch):
+    sent = {}
+
+    def fake_post(url, **kwargs):
+        sent.update(kwargs)
+
+    monkeypatch.setattr(ad_nova_script, "UPLOAD_GZIP", True)
+    monkeypatch.setattr(ad_nova_script.api_client, "post", fake_post)
+    original = payload(2)
+    original["ads_data"]["0"]["ad_text"] = "Ünïcode ✓"
+    ad_nova_script._post_json("http://api.invalid/upload", original, timeout=5)
+
+    assert sent["headers"]["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(sent["data"]).decode("utf-8")) == original
+
+
+def test_same_page_scraped_twice_uploads_no_delta(tmp_path, monkeypatch, read_fixture):
+    pytest.importorskip("lxml")
+    from ad_index import AdIndex
+
+    uploaded = []
+
+    def fake_send_chunk(api_url, chunk, label):
+        uploaded.append(chunk)
+        return True
+
+    monkeypatch.setattr(ad_nova_script, "_ad_index", AdIndex(str(tmp_path / "index.sqlite3")))
+    monkeypatch.setattr(ad_nova_script, "_send_chunk", fake_send_chunk)
+    monkeypatch.setattr(ad_nova_script, "DEDUPE_CREATIVES", False)
+
+    def scrape():
+        ads_data, total = ad_nova_script.parse_snapshot(read_fixture("ad_library_page.html"))
+        return {"competitor_name": "Example", "page_link": payload(0)["page_link"], "page_id": "1",
+                "no_of_ads": len(ads_data), "total_ads_found": total, "ads_data": ads_data}
+
+    first = scrape()
+    assert ad_nova_script.upload_page_delta(first)
+    assert len(uploaded) == 1 and len(uploaded[0]["ads_data"]) == 2
+    # The upload is sanitized, the scraped records are not
+    assert uploaded[0]["ads_data"]["1000000000000002"]["cta_button_text"] == ""
+    assert first["ads_data"]["1000000000000002"]["cta_button_text"] is None
+
+    assert ad_nova_script.upload_page_delta(scrape())
+    assert len(uploaded) == 1
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.request = type("Request", (), {"body": b"{}"})()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise ad_nova_script.requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+    def json(self):
+        return {"status": "success" if self.status_code == 200 else "error"}
+
+
+@pytest.mark.parametrize("retries, sent", [(0, 1), (2, 2)])
+def test_chunk_resent_with_the_same_idempotency_key(monkeypatch, retries, sent):
+    statuses, keys = [504, 200], []
+
+    def fake_post(url, **kwargs):
+        keys.append(kwargs["headers"]["Idempotency-Key"])
+        return FakeResponse(statuses.pop(0))
+
+    monkeypatch.setattr(ad_nova_script, "UPLOAD_RETRIES", retries)
+    monkeypatch.setattr(ad_nova_script, "DEDUPE_CREATIVES", False)
+    monkeypatch.setattr(ad_nova_script.api_client, "API_BACKOFF_FACTOR", 0)
+    monkeypatch.setattr(ad_nova_script.api_client, "post", fake_post)
+    assert ad_nova_script._send_chunk("http://api.invalid/upload", payload(2), "") == bool(retries)
+    assert len(keys) == sent and len(set(keys)) == 1
+    assert keys[0] != ad_nova_script.idempotency_key(payload(3))
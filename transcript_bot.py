@@ -10,6 +10,9 @@ import requests
 import whisper
 from dotenv import load_dotenv
 
+import api_client
+from media_store import MediaStore
+
 # ============== CONFIGURATION =====================
 load_dotenv()
 
@@ -19,6 +22,11 @@ API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
 # Set the Whisper model size ("tiny", "base", "small", "medium", "large")
 WHISPER_MODEL = "base"
 
+# Content-addressed media store filled by the scraper (MEDIA_PREFETCH=1). If the directory
+# exists, videos found there aren't downloaded again and videos downloaded here are added
+# to it; it is never created here. Empty to disable.
+MEDIA_STORE_DIR = os.getenv("MEDIA_STORE_DIR", "media_store")
+
 # Auto-detect or set the path to the ffmpeg executable
 if os.name == 'nt': # Windows
     FFMPEG_PATH = r"C:\ProgramData\chocolatey\bin"
@@ -48,7 +56,7 @@ def get_videos_to_transcribe():
     url = f"{API_BASE_URL}/api/videos_to_transcribe"
     try:
         logger.info(f"Requesting videos from: {url}")
-        response = requests.get(url, timeout=30)
+        response = api_client.get(url, timeout=30)
         response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -59,9 +67,9 @@ def update_video_transcript(video_id: int, transcript: str):
     """Submits the completed transcript back to the API."""
     url = f"{API_BASE_URL}/api/update_transcript/{video_id}"
     payload = {"transcript": transcript}
-    print("payload", payload)
+    logger.debug(f"payload {payload}")
     try:
-        response = requests.put(url, json=payload, timeout=30)
+        response = api_client.put(url, json=payload, timeout=30)
         response.raise_for_status()
         logger.info(f"Successfully updated transcript for video ID: {video_id}")
         return True
@@ -129,8 +137,12 @@ def main():
     model = whisper.load_model(WHISPER_MODEL)
     logger.info("Whisper model loaded successfully.")
 
+    store = MediaStore(MEDIA_STORE_DIR) if MEDIA_STORE_DIR and os.path.isdir(MEDIA_STORE_DIR) else None
+    if store:
+        logger.info(f"Using the media store {MEDIA_STORE_DIR}")
     processed_count = 0
     failed_count = 0
+    store_hits = 0
 
     # 3. Process each video
     for i, video_data in enumerate(videos):
@@ -144,7 +156,17 @@ def main():
         logger.info(f"--- Processing video {i+1}/{total_videos} (ID: {video_id}) ---")
 
         with tempfile.TemporaryDirectory() as tmpdir:
-            video_path = download_video(media_url, tmpdir)
+            video_path = store.path_for_url(media_url) if store else None
+            if video_path:
+                logger.info(f"Using prefetched video {video_path}")
+                store_hits += 1
+            else:
+                video_path = download_video(media_url, tmpdir)
+                if video_path and store:
+                    try:
+                        video_path = store.add_file(media_url, video_path)
+                    except Exception as e:
+                        logger.warning(f"Could not add {video_path} to the media store: {e}")
             if video_path:
                 transcript = transcribe_video(video_path, model)
                 if update_video_transcript(video_id, transcript):
@@ -157,7 +179,10 @@ def main():
                 failed_count += 1
     
     logger.info("==== TRANSCRIPT WORKER END ====")
-    logger.info(f"Summary: Processed={processed_count}, Failed={failed_count}, Total={total_videos}")
+    logger.info(f"Summary: Processed={processed_count}, Failed={failed_count}, Total={total_videos}, "
+                f"From media store={store_hits}")
+    if store:
+        store.close()
 
 
 if __name__ == "__main__":